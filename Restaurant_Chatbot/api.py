@@ -0,0 +1,107 @@
+"""HTTP API for the chatbot: every session in one process on a shared ChatEngine.
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+POST /sessions starts a session, POST /sessions/{id}/messages answers one message (or streams
+the answer as plain text with ?stream=true), GET /sessions/{id}/messages pages through the
+transcript and DELETE /sessions/{id} ends it.
+
+Session ids are issued by the server, together with a token that every other call on the session
+must send as "Authorization: Bearer <token>". Unknown sessions and wrong tokens both get a 404, so
+the API does not reveal which session ids exist.
+
+Sessions start anonymous and identify the customer from the contact details given in the chat.
+Nothing here authenticates callers, so the API does not accept a customer id; a host that does
+authenticate customers can bind one in-process with ChatEngine.session(customer_id=...).
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from chat_engine import ChatEngine
+from conversation_store import PAGE_SIZE
+
+SESSION_ID = Path(..., pattern=r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class SessionOut(BaseModel):
+    session_id: str
+    token: str
+
+
+class MessageIn(BaseModel):
+    message: str = Field(..., min_length=1, max_length=2000)
+
+
+class MessageOut(BaseModel):
+    session_id: str
+    reply: str
+
+
+class TurnOut(BaseModel):
+    id: int
+    role: str
+    content: str
+    created_at: str
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One engine per worker process: database pool, catalog, LLM client and caches are shared by all sessions
+    app.state.engine = ChatEngine()
+    yield
+    # Sessions still in memory resume after a restart, like the ones that went idle
+    await asyncio.to_thread(app.state.engine.save_sessions)
+
+
+app = FastAPI(title="The Culinary Hub Chatbot", lifespan=lifespan)
+
+
+def _engine(request: Request) -> ChatEngine:
+    return request.app.state.engine
+
+
+async def _authorized_session(request: Request, session_id: str = SESSION_ID,
+                              authorization: Optional[str] = Header(None)) -> str:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not await asyncio.to_thread(_engine(request).authorize, session_id, token):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session_id
+
+
+@app.post("/sessions", response_model=SessionOut)
+async def start_session(request: Request):
+    chatbot, token = await asyncio.to_thread(_engine(request).open_session)
+    return SessionOut(session_id=chatbot.session_state.session_id, token=token)
+
+
+@app.post("/sessions/{session_id}/messages", response_model=MessageOut)
+async def send_message(request: Request, body: MessageIn, session_id: str = Depends(_authorized_session),
+                       stream: bool = Query(False)):
+    engine = _engine(request)
+    if stream:
+        return StreamingResponse(engine.astream(session_id, body.message), media_type="text/plain; charset=utf-8")
+    return MessageOut(session_id=session_id, reply=await engine.achat(session_id, body.message))
+
+
+@app.get("/sessions/{session_id}/messages", response_model=List[TurnOut])
+async def get_messages(request: Request, session_id: str = Depends(_authorized_session),
+                       limit: int = Query(PAGE_SIZE, ge=1, le=200), before_id: Optional[int] = None):
+    turns = await _engine(request).history(session_id, limit, before_id)
+    return [TurnOut(id=id, role=role, content=content, created_at=str(created_at))
+            for id, role, content, created_at in turns]
+
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def end_session(request: Request, session_id: str = Depends(_authorized_session)):
+    if not await asyncio.to_thread(_engine(request).end_session, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+
+@app.get("/metrics")
+async def metrics(request: Request):
+    return _engine(request).metrics()
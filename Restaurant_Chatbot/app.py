@@ -1,74 +1,68 @@
-import streamlit as st
-from chatbot_agent import RestaurantChatbot # Import the chatbot agent
-
-# --- Streamlit Session State Initialization ---
-# Initialize session state variables if they don't exist
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+import os
 
-# Customer-related information (will be populated from DB, or defaults)
-if "customer_id" not in st.session_state:
-    st.session_state.customer_id = None # Set by chatbot on first interaction
-if "customer_name" not in st.session_state:
-    st.session_state.customer_name = None
-if "customer_phone" not in st.session_state:
-    st.session_state.customer_phone = None
-if "customer_email" not in st.session_state:
-    st.session_state.customer_email = None
+import streamlit as st
+from chat_engine import ChatEngine # Shared chatbot engine; conversation state lives there, not in st.session_state
+from conversation_store import PAGE_SIZE
 
-# Order-related information
-if "current_order_id" not in st.session_state:
-    st.session_state.current_order_id = None
-if "current_order_items" not in st.session_state:
-    st.session_state.current_order_items = [] # Stores items for current pending order
+st.set_page_config(page_title="The Culinary Hub Chatbot")
 
-# Reservation-related information
-if "reservation_details" not in st.session_state: # Stores extracted reservation details
-    st.session_state.reservation_details = None
 
-# Flags for specific conversational steps (managed within chatbot_agent)
-if "awaiting_order_confirmation" not in st.session_state:
-    st.session_state.awaiting_order_confirmation = False
-if "awaiting_reservation_confirmation" not in st.session_state:
-    st.session_state.awaiting_reservation_confirmation = False
+# --- Chat Engine ---
+# One engine per server process, shared by every browser session (database, menu, LLM client and caches)
+@st.cache_resource
+def get_engine():
+    return ChatEngine()
 
-# Overall conversation state to manage flow
-if "conversation_state" not in st.session_state:
-    st.session_state.conversation_state = "INITIAL" # Possible states: INITIAL, AWAITING_USER_NAME, AWAITING_USER_PHONE, AWAITING_USER_EMAIL, READY_FOR_TASK, AWAITING_ORDER_DETAILS, AWAITING_RESERVATION_DETAILS, AWAITING_ORDER_CONFIRMATION, AWAITING_RESERVATION_CONFIRMATION, CONCLUDING
 
-# To store the original intent if contact info collection interrupts a task
-if "current_intent_after_contact" not in st.session_state:
-    st.session_state.current_intent_after_contact = None
+try:
+    engine = get_engine()
+except ValueError as e:
+    st.error(f"Error initializing chatbot: {e}. Please ensure GROQ_API_KEY is set in your environment variables.")
+    st.stop()
 
-# Initialize the chatbot only once, passing the session_state
-if "chatbot" not in st.session_state:
-    try:
-        st.session_state.chatbot = RestaurantChatbot(st.session_state)
-    except ValueError as e:
-        st.error(f"Error initializing chatbot: {e}. Please ensure GROQ_API_KEY is set in your environment variables.")
-        st.stop()
+# --- Streamlit Session State Initialization ---
+# The engine keeps the conversation under this id, and anyone holding it can read the transcript (contact
+# details included). By default it stays in the browser session, so a page reload starts a new chat. With
+# CHAT_RESUME_FROM_URL=1 it is also kept in the URL as ?sid= so a reload or restart resumes the chat, at the
+# cost of the id ending up in browser history, shared links and proxy logs.
+RESUME_FROM_URL = os.environ.get("CHAT_RESUME_FROM_URL", "").lower() in ("1", "true", "yes")
+if "session_id" not in st.session_state:
+    # Only ids the engine issued are resumed; anything else in the URL starts a new session
+    sid = st.query_params.get("sid") if RESUME_FROM_URL else None
+    st.session_state.session_id = sid if sid and engine.known(sid) else engine.session().session_state.session_id
+    if RESUME_FROM_URL:
+        st.query_params["sid"] = st.session_state.session_id
+    elif "sid" in st.query_params:
+        del st.query_params["sid"]
+if "history_pages" not in st.session_state:
+    st.session_state.history_pages = 1 # Pages of earlier messages shown above the latest turn
 
 
-st.set_page_config(page_title="The Culinary Hub Chatbot")
 st.title("🍽️ The Culinary Hub Chatbot")
 st.caption("Ask me about our menu, offers, make an order or reservation, and more!")
 
-# Display chat history
-for message in st.session_state.chat_history:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
+# Display chat history, newest page only; earlier pages are read from the store on request
+conversation = engine.session(st.session_state.session_id).conversation
+history = conversation.recent(PAGE_SIZE * st.session_state.history_pages)
+if len(conversation) > len(history):
+    if st.button(f"Show earlier messages ({len(conversation) - len(history)} more)"):
+        st.session_state.history_pages += 1
+        st.rerun()
+for _, role, content, _ in history:
+    with st.chat_message(role):
+        st.markdown(content)
 
 # User input
 if user_prompt := st.chat_input("Ask me anything..."):
-    # Add user message to chat history
-    st.session_state.chat_history.append({"role": "user", "content": user_prompt})
+    # The engine saves both sides of the exchange to the conversation store
     with st.chat_message("user"):
         st.markdown(user_prompt)
 
-    # Get chatbot response
+    # Get chatbot response, rendering LLM tokens as they arrive
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            # The chatbot.process_user_input now handles all logic and state updates
-            response = st.session_state.chatbot.process_user_input(user_prompt)
-            st.markdown(response)
-            st.session_state.chat_history.append({"role": "assistant", "content": response})
\ No newline at end of file
+        response = ""
+        resp_container = st.empty()
+        # The engine handles all logic and state updates for this session
+        for delta in engine.stream(st.session_state.session_id, user_prompt):
+            response += delta
+            resp_container.markdown(response)
\ No newline at end of file
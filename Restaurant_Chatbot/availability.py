@@ -0,0 +1,202 @@
+import bisect
+import datetime
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# How long a party keeps its table, by party size (largest size covered, minutes)
+SEATING_MINUTES = ((2, 90), (4, 120), (6, 150))
+LARGE_PARTY_MINUTES = 180
+SLOT_MINUTES = 30
+
+_DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+# "Mon-Sat: 10:00-22:00" or "Sun: 11:00-21:00"
+_HOURS_PATTERN = re.compile(
+    r'(?P<first>mon|tue|wed|thu|fri|sat|sun)[a-z]*(?:\s*-\s*(?P<last>mon|tue|wed|thu|fri|sat|sun)[a-z]*)?\s*:?\s*'
+    r'(?P<open>\d{1,2}:\d{2})\s*-\s*(?P<close>\d{1,2}:\d{2})', re.IGNORECASE)
+
+
+def seating_minutes(party_size: int) -> int:
+    for largest, minutes in SEATING_MINUTES:
+        if party_size <= largest:
+            return minutes
+    return LARGE_PARTY_MINUTES
+
+
+def to_minutes(time_str: str) -> int:
+    hours, minutes = time_str.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def to_time_str(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_opening_hours(text: Optional[str]) -> Dict[int, Tuple[int, int]]:
+    """'Mon-Sat: 10:00-22:00, Sun: 11:00-21:00' -> {weekday: (open minute, close minute)}."""
+    hours = {}
+    for match in _HOURS_PATTERN.finditer(text or ""):
+        first = _DAYS.index(match.group("first").lower()[:3])
+        last = _DAYS.index(match.group("last").lower()[:3]) if match.group("last") else first
+        span = (to_minutes(match.group("open")), to_minutes(match.group("close")))
+        for offset in range((last - first) % 7 + 1):
+            hours[(first + offset) % 7] = span
+    return hours
+
+
+class DayAvailability:
+    """Every table's bookings for one date, as sorted intervals that can be probed with bisect.
+
+    A booking holds its table from its start time for seating_minutes(party_size), so a 19:00
+    booking for four also blocks 19:30, 20:00 and 20:30. Overlap checks are O(log bookings) per
+    table, which makes scanning a whole evening of slots cheap. A party may sit down at any time
+    the restaurant is open, even if its seating runs past closing time. Tables sharing a
+    combine_group can be pushed together for one party, as TableAssigner does when booking.
+    """
+
+    def __init__(self, date: str, tables: List[Tuple], bookings: List[Tuple],
+                 hours: Optional[Tuple[int, int]], slot_minutes: int = SLOT_MINUTES, assigner=None):
+        self.date = date
+        self.hours = hours
+        self.slot_minutes = slot_minutes
+        if assigner is None:
+            # Imported here because table_assignment depends on this module
+            from table_assignment import TableAssigner
+            assigner = TableAssigner(tables)
+        self.assigner = assigner
+        # Smallest tables first, so the first free table is also the best fit
+        self.tables = sorted(tables, key=lambda table: (table[2], table[0]))
+        intervals: Dict[int, List[Tuple[int, int]]] = {table[0]: [] for table in self.tables}
+        for _, table_id, reservation_time, party_size in bookings:
+            if table_id in intervals:
+                start = to_minutes(reservation_time)
+                intervals[table_id].append((start, start + seating_minutes(party_size)))
+        self._starts: Dict[int, List[int]] = {}
+        self._max_ends: Dict[int, List[int]] = {}  # Running max of end times, for overlapping legacy rows
+        for table_id, table_intervals in intervals.items():
+            table_intervals.sort()
+            self._starts[table_id] = [start for start, _ in table_intervals]
+            max_ends, latest = [], 0
+            for _, end in table_intervals:
+                latest = max(latest, end)
+                max_ends.append(latest)
+            self._max_ends[table_id] = max_ends
+
+    def is_open(self, start: int) -> bool:
+        if self.hours is None:
+            return True  # Unknown hours: do not second-guess the request
+        opens, closes = self.hours
+        return opens <= start < closes
+
+    def is_table_free(self, table_id: int, start: int, duration: int) -> bool:
+        starts = self._starts.get(table_id)
+        if starts is None:
+            return False
+        # Bookings starting before we would leave; the latest-ending of them must end by our start
+        before_end = bisect.bisect_left(starts, start + duration)
+        return before_end == 0 or self._max_ends[table_id][before_end - 1] <= start
+
+    def free_tables(self, party_size: int, start: int) -> List[Tuple]:
+        """(id, table_number, capacity) of every table that can seat the party at `start`, best fit first."""
+        if not self.is_open(start):
+            return []
+        duration = seating_minutes(party_size)
+        return [table[:3] for table in self.tables
+                if table[2] >= party_size and self.is_table_free(table[0], start, duration)]
+
+    def free_seatings(self, party_size: int, start: int) -> List[Tuple[int, ...]]:
+        """Table ids of every single or combined seating free for the party at `start`, best fit first."""
+        return list(self._free_seatings(party_size, start))
+
+    def can_seat(self, party_size: int, start: int) -> bool:
+        return next(self._free_seatings(party_size, start), None) is not None
+
+    def _free_seatings(self, party_size: int, start: int) -> Iterator[Tuple[int, ...]]:
+        if not self.is_open(start):
+            return
+        duration = seating_minutes(party_size)
+        for _, tables in self.assigner.options(party_size):
+            if all(self.is_table_free(table_id, start, duration) for table_id in tables):
+                yield tables
+
+    def slots(self, after: Optional[int] = None) -> List[int]:
+        if self.hours is None:
+            opens, closes = 0, 24 * 60
+        else:
+            opens, closes = self.hours
+        first = opens if after is None else max(opens, after)
+        # Round up to the slot grid, which starts at opening time
+        first = opens + -(-(first - opens) // self.slot_minutes) * self.slot_minutes
+        return list(range(first, closes, self.slot_minutes))
+
+    def free_slots(self, party_size: int, after: Optional[int] = None) -> List[int]:
+        return [start for start in self.slots(after) if self.can_seat(party_size, start)]
+
+
+class AvailabilityEngine:
+    """Answers reservation availability questions from one query per day instead of one per slot."""
+
+    def __init__(self, db, slot_minutes: int = SLOT_MINUTES):
+        self.db = db
+        self.slot_minutes = slot_minutes
+        self._opening_hours: Optional[Dict[int, Tuple[int, int]]] = None
+        self._assigner = None
+        self._layout: Optional[Tuple] = None
+
+    @property
+    def opening_hours(self) -> Dict[int, Tuple[int, int]]:
+        if self._opening_hours is None:
+            info = self.db.get_restaurant_info()
+            self._opening_hours = parse_opening_hours(info[3] if info else None)
+        return self._opening_hours
+
+    def hours_for(self, date: str) -> Optional[Tuple[int, int]]:
+        """(open minute, close minute) on `date`, (0, 0) if closed, None if the hours are unknown."""
+        weekday = datetime.date.fromisoformat(date).weekday()
+        # Without parseable opening hours, every time of day is bookable (the old behaviour)
+        hours = self.opening_hours.get(weekday) if self.opening_hours else None
+        if self.opening_hours and hours is None:
+            hours = (0, 0)  # Closed that day
+        return hours
+
+    def day(self, date: str) -> DayAvailability:
+        layout = tuple(self.db.get_table_layout())
+        if layout != self._layout:
+            # Imported here because table_assignment depends on this module
+            from table_assignment import TableAssigner
+            self._assigner = TableAssigner(layout)
+            self._layout = layout
+        return DayAvailability(date, list(layout), self.db.get_reservations_for_date(date),
+                               self.hours_for(date), self.slot_minutes, self._assigner)
+
+    def find_table(self, party_size: int, date: str, time: str) -> Optional[Tuple]:
+        """Best-fitting free (id, table_number, capacity) for the booking, or None."""
+        tables = self.day(date).free_tables(party_size, to_minutes(time))
+        return tables[0] if tables else None
+
+    def is_table_free(self, table_id: int, party_size: int, date: str, time: str) -> bool:
+        return self.day(date).is_table_free(table_id, to_minutes(time), seating_minutes(party_size))
+
+    def free_slots(self, party_size: int, date: str, after: Optional[str] = None) -> List[str]:
+        """Every start time on `date` (from `after` on) with a table or combined tables for the party."""
+        day = self.day(date)
+        return [to_time_str(start) for start in day.free_slots(party_size, to_minutes(after) if after else None)]
+
+    def earliest_slot(self, party_size: int, date: str, after: Optional[str] = None,
+                      days: int = 7) -> Optional[Tuple[str, str]]:
+        """(date, time) of the first free slot on or after date/after, looking `days` days ahead."""
+        start_date = datetime.date.fromisoformat(date)
+        for offset in range(days):
+            day_str = (start_date + datetime.timedelta(days=offset)).isoformat()
+            day = self.day(day_str)
+            for start in day.slots(to_minutes(after) if after and offset == 0 else None):
+                if day.can_seat(party_size, start):
+                    return day_str, to_time_str(start)
+        return None
+
+    def alternatives(self, party_size: int, date: str, time: str, window_minutes: int = 60) -> List[str]:
+        """Free start times within +/- window_minutes of `time`, closest first."""
+        requested = to_minutes(time)
+        day = self.day(date)
+        starts = [start for start in day.slots(max(0, requested - window_minutes))
+                  if start <= requested + window_minutes and start != requested and day.can_seat(party_size, start)]
+        return [to_time_str(start) for start in sorted(starts, key=lambda start: (abs(start - requested), start))]
@@ -0,0 +1,83 @@
+"""Free-slot search for one evening: get_available_tables per slot vs. AvailabilityEngine.
+
+Fills a temporary database with --tables tables and --days days of bookings, then asks for every
+free slot of a day for a party of four both ways.
+
+    python benchmarks/bench_availability.py --tables 60 --days 365
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from availability import AvailabilityEngine, to_minutes  # noqa: E402
+from database import ConnectionPool, RestaurantDatabase  # noqa: E402
+
+SLOTS = ["%02d:%02d" % (hour, minute) for hour in range(11, 22) for minute in (0, 30)]
+
+
+def load(db, tables, days):
+    rng = random.Random(9)
+    start = datetime.date(2030, 1, 1)
+    with db.transaction() as cur:
+        cur.executemany("INSERT INTO restaurant_tables (table_number, capacity) VALUES (?, ?)",
+                        [(f"Bench {i}", rng.choice((2, 4, 4, 6, 8))) for i in range(tables)])
+    table_ids = [row[0] for row in db.get_tables()]
+    rows = []
+    for day in range(days):
+        date = (start + datetime.timedelta(days=day)).isoformat()
+        for table_id in table_ids:
+            # Two or three seatings per table per day, on the hour
+            for slot in rng.sample(range(11, 21, 2), rng.randint(2, 3)):
+                rows.append((1, table_id, date, f"{slot:02d}:00", rng.randint(1, 4)))
+    with db.transaction() as cur:
+        cur.executemany("INSERT INTO reservations (customer_id, table_id, reservation_date, reservation_time,"
+                        " party_size) VALUES (?, ?, ?, ?, ?)", rows)
+    return start.isoformat(), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=60)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        db = RestaurantDatabase(pool.db_name, pool=pool)
+        date, bookings = load(db, args.tables, args.days)
+        engine = AvailabilityEngine(db)
+
+        def per_slot_sql():
+            return [slot for slot in SLOTS if db.get_available_tables(4, date, slot)]
+
+        def one_query():
+            return engine.free_slots(4, date)
+
+        timings = {}
+        for label, fn in (("get_available_tables per slot", per_slot_sql), ("AvailabilityEngine.free_slots", one_query)):
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                result = fn()
+            timings[label] = ((time.perf_counter() - start) / args.repeat * 1000, len(result))
+        alternatives_ms = time.perf_counter()
+        for _ in range(args.repeat):
+            engine.alternatives(4, date, "19:00")
+        alternatives_ms = (time.perf_counter() - alternatives_ms) / args.repeat * 1000
+        pool.close_all()
+
+    print(f"{args.tables} tables, {bookings} bookings over {args.days} days; free slots for 4 on {date}")
+    for label, (ms, count) in timings.items():
+        print(f"{label:<34}{ms:9.2f} ms  ({count} slots)")
+    print(f"{'AvailabilityEngine.alternatives':<34}{alternatives_ms:9.2f} ms")
+    print("(per-slot SQL only blocks exact start times, so it reports slots that overlap longer seatings)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Latency of writing one N-line order: per-line round-trips vs. add_order_items.
+
+"per line" is the old place_order_flow: get_menu_item_by_name, then a SELECT, INSERT/UPDATE,
+SUM() refresh and commit for every line. "add_order_item" is one commit per line on the current
+schema, and "add_order_items" writes the whole order with one executemany upsert and one commit.
+
+    python benchmarks/bench_bulk_order.py --lines 20 --orders 50 [--legacy-profile]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_order_totals import TRIGGERS, legacy_add_line  # noqa: E402
+from database import LEGACY_STORAGE_PROFILE, ConnectionPool, RestaurantDatabase  # noqa: E402
+
+
+def per_line_legacy(db, order_id, names):
+    for name in names:
+        row = db.get_menu_item_by_name(name)
+        legacy_add_line(db, order_id, row[0], 1, row[4])
+
+
+def per_line(db, order_id, items):
+    for menu_item_id, price in items:
+        db.add_order_item(order_id, menu_item_id, 1, price)
+
+
+def bulk(db, order_id, items):
+    db.add_order_items(order_id, [(menu_item_id, 1, price) for menu_item_id, price in items])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=50)
+    parser.add_argument("--legacy-profile", action="store_true", help="rollback journal with synchronous=FULL")
+    args = parser.parse_args()
+    profile = LEGACY_STORAGE_PROFILE if args.legacy_profile else None
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, write, legacy in (("per line (old flow)", per_line_legacy, True),
+                                     ("add_order_item per line", per_line, False),
+                                     ("add_order_items", bulk, False)):
+            pool = ConnectionPool(os.path.join(tmp, f"{write.__name__}.db"), profile=profile)
+            db = RestaurantDatabase(pool.db_name, pool=pool)
+            with db.transaction() as cur:
+                cur.executemany("INSERT INTO menu (name, description, category, price) VALUES (?, ?, ?, ?)",
+                                [(f"Bench dish {i}", "", "Bench", 5 + i * 0.25) for i in range(args.lines)])
+                if legacy:
+                    for trigger in TRIGGERS:
+                        cur.execute(f"DROP TRIGGER {trigger}")
+            rows = db.cursor.execute("SELECT id, name, price FROM menu WHERE category = 'Bench' ORDER BY id").fetchall()
+            items = [row[1] for row in rows] if legacy else [(row[0], row[2]) for row in rows]
+            timings = []
+            for _ in range(args.orders):
+                order_id = db.create_order(1)
+                start = time.perf_counter()
+                write(db, order_id, items)
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = timings
+            pool.close_all()
+
+    print(f"{args.orders} orders x {args.lines} lines ({'legacy' if args.legacy_profile else 'default'} storage profile)")
+    baseline = statistics.median(next(iter(results.values())))
+    for label, timings in results.items():
+        median = statistics.median(timings)
+        print(f"{label:<26} median {median:8.3f} ms/order  ({baseline / median:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
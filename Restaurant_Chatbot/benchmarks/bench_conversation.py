@@ -0,0 +1,78 @@
+"""Per-session memory over a long chat: unbounded chat_history list vs. ConversationStore.
+
+Appends --turns exchanges of a menu-sized reply and reports the Python memory each approach holds
+per session, plus the cost of appending a turn and of reading the newest page of history.
+
+    python benchmarks/bench_conversation.py --turns 2000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from conversation_store import PAGE_SIZE, ConversationStore  # noqa: E402
+from database import ConnectionPool, RestaurantDatabase  # noqa: E402
+
+REPLY = "Here is our current menu:\n" + "- Margherita Pizza: $12.99 - Classic pizza with tomato sauce.\n" * 12
+
+
+def held_bytes(build, turns):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    holder = build(turns)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held, holder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        db = RestaurantDatabase(pool.db_name, pool=pool)
+
+        def chat_history(turns):
+            history = []
+            for i in range(turns):
+                history.append({"role": "user", "content": f"show me the menu #{i}"})
+                history.append({"role": "assistant", "content": REPLY + str(i)})
+            return history
+
+        def store(turns):
+            conversation = ConversationStore(db, "bench")
+            for i in range(turns):
+                conversation.append(f"show me the menu #{i}", REPLY + str(i))
+            return conversation
+
+        print(f"{args.turns} exchanges per session")
+        for label, build in (("chat_history list", chat_history), ("ConversationStore", store)):
+            for turns in (args.turns // 4, args.turns):
+                held, _ = held_bytes(build, turns)
+                print(f"{label:<20}{turns:6d} exchanges  {held / 1024:9.1f} KiB held")
+
+        conversation = ConversationStore(db, "bench")
+        start = time.perf_counter()
+        for i in range(200):
+            conversation.append("one more", REPLY)
+        append_ms = (time.perf_counter() - start) / 200 * 1000
+        start = time.perf_counter()
+        for _ in range(200):
+            conversation.recent(PAGE_SIZE)
+        page_ms = (time.perf_counter() - start) / 200 * 1000
+        start = time.perf_counter()
+        ConversationStore(db, "bench")
+        resume_ms = (time.perf_counter() - start) * 1000
+        print(f"append one exchange {append_ms:.3f} ms, newest page of {PAGE_SIZE} {page_ms:.3f} ms, "
+              f"resume after restart {resume_ms:.3f} ms ({len(conversation)} messages stored)")
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
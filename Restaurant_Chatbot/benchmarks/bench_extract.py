@@ -0,0 +1,78 @@
+"""Single-turn latency and bulk throughput of extract_details vs. the original extractors.
+
+The legacy side runs what a turn used to need for the same information: extract_reservation_details
+plus validate_phone_number and validate_email, each with its own inline patterns.
+
+    python benchmarks/bench_extract.py --rounds 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from legacy import (legacy_extract_reservation_details, legacy_validate_email,  # noqa: E402
+                    legacy_validate_phone_number)
+from utils import extract_details  # noqa: E402
+
+
+def load_utterances():
+    with open(os.path.join(HERE, "utterances.txt"), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def legacy_extract(text):
+    details = legacy_extract_reservation_details(text)
+    details["phone"] = legacy_validate_phone_number(text)
+    details["email"] = legacy_validate_email(text)
+    return details
+
+
+def turn_latencies_us(extract, utterances, rounds):
+    latencies = []
+    for _ in range(rounds):
+        for text in utterances:
+            start = time.perf_counter()
+            extract(text)
+            latencies.append((time.perf_counter() - start) * 1e6)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def throughput(extract, utterances, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in utterances:
+            extract(text)
+    return rounds * len(utterances) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--show-diff", action="store_true", help="list utterances the two extract differently")
+    args = parser.parse_args()
+
+    utterances = load_utterances()
+    print(f"{len(utterances)} utterances x {args.rounds} rounds")
+    print(f"{'':<20}{'p50 us':>10}{'p99 us':>10}{'utterances/s':>16}")
+    results = {}
+    for label, extract in (("legacy", legacy_extract), ("extract_details", extract_details)):
+        p50, p99 = turn_latencies_us(extract, utterances, args.rounds)
+        results[label] = rate = throughput(extract, utterances, args.rounds)
+        print(f"{label:<20}{p50:10.2f}{p99:10.2f}{rate:16.0f}")
+    print(f"throughput ratio: {results['extract_details'] / results['legacy']:.1f}x")
+
+    changed = [(text, legacy_extract(text), extract_details(text)) for text in utterances]
+    changed = [row for row in changed if row[1] != row[2]]
+    print(f"{len(changed)} utterances extracted differently")
+    if args.show_diff:
+        for text, old, new in changed:
+            print(f"  {text!r}:\n    {old}\n    {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Lookup latency on large history tables, before and after the index migration.
+
+Loads synthetic reservations and order items into a fresh database with the secondary
+indexes dropped, times the hot lookups, applies the migrations and times them again.
+
+    python benchmarks/bench_indexes.py --reservations 1000000 --order-items 5000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import RestaurantDatabase, ConnectionPool, MIGRATIONS  # noqa: E402
+
+TABLES = 200
+CUSTOMERS = 50000
+SLOTS = ["%02d:%02d" % (hour, minute) for hour in range(11, 23) for minute in (0, 30)]
+
+
+def drop_indexes(db):
+    for name, in db.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall():
+        db.conn.execute(f"DROP INDEX {name}")
+    db.conn.execute("PRAGMA user_version = 0")
+    db.conn.commit()
+
+
+def load(db, reservations, order_items, batch=100000):
+    rng = random.Random(7)
+    with db.transaction() as cur:
+        cur.executemany("INSERT INTO restaurant_tables (table_number, capacity) VALUES (?, ?)",
+                        [(f"Bench {i}", rng.choice((2, 4, 6, 8))) for i in range(TABLES)])
+        cur.executemany("INSERT INTO customers (name, phone, email) VALUES (?, ?, ?)",
+                        [(f"Customer {i}", f"555{i:07d}", f"c{i}@example.com") for i in range(CUSTOMERS)])
+    table_ids = [row[0] for row in db.conn.execute("SELECT id FROM restaurant_tables")]
+
+    # Walk the (table, day, time) grid so every generated booking holds a distinct slot
+    def reservation_rows(start, stop):
+        for i in range(start, stop):
+            table_id = table_ids[i % len(table_ids)]
+            slot = i // len(table_ids)
+            day = 1 + slot // len(SLOTS)
+            yield (rng.randint(1, CUSTOMERS), table_id, f"+{day} days", SLOTS[slot % len(SLOTS)],
+                   rng.randint(1, 8))
+
+    for start in range(0, reservations, batch):
+        with db.transaction() as cur:
+            cur.executemany("INSERT INTO reservations (customer_id, table_id, reservation_date, reservation_time,"
+                            " party_size) VALUES (?, ?, date('2020-01-01', ?), ?, ?)",
+                            reservation_rows(start, min(start + batch, reservations)))
+
+    orders = max(1, order_items // 5)
+    with db.transaction() as cur:
+        cur.executemany("INSERT INTO orders (customer_id, total_amount) VALUES (?, 0)",
+                        ((rng.randint(1, CUSTOMERS),) for _ in range(orders)))
+    for start in range(0, order_items, batch):
+        with db.transaction() as cur:
+            cur.executemany("INSERT INTO order_items (order_id, menu_item_id, quantity, price_at_order)"
+                            " VALUES (?, ?, ?, ?)",
+                            ((i // 5 + 1, i % 5 + 1, rng.randint(1, 3), 9.99)
+                             for i in range(start, min(start + batch, order_items))))
+
+
+def time_lookups(db, repeat):
+    rng = random.Random(11)
+    dates = [row[0] for row in db.conn.execute(
+        "SELECT DISTINCT reservation_date FROM reservations LIMIT 365")]
+    order_count = db.conn.execute("SELECT MAX(id) FROM orders").fetchone()[0]
+    lookups = {
+        "get_available_tables": lambda: db.get_available_tables(4, rng.choice(dates), rng.choice(SLOTS)),
+        "get_customer_reservations": lambda: db.get_customer_reservations(rng.randint(1, CUSTOMERS)),
+        "get_order_items": lambda: db.get_order_items(rng.randint(1, order_count)),
+        "order item lookup (add_order_item)": lambda: db.conn.execute(
+            "SELECT quantity FROM order_items WHERE order_id = ? AND menu_item_id = ?",
+            (rng.randint(1, order_count), 3)).fetchone(),
+        "customer lookup (add_customer)": lambda: db.conn.execute(
+            "SELECT id FROM customers WHERE name = ? ORDER BY id DESC LIMIT 1",
+            (f"Customer {rng.randint(0, CUSTOMERS - 1)}",)).fetchone(),
+    }
+    results = {}
+    for label, lookup in lookups.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            lookup()
+        results[label] = (time.perf_counter() - start) / repeat * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reservations", type=int, default=1000000)
+    parser.add_argument("--order-items", type=int, default=5000000)
+    parser.add_argument("--repeat", type=int, default=20, help="calls per lookup")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"))
+        db = RestaurantDatabase(pool.db_name, pool=pool)
+        drop_indexes(db)
+
+        start = time.perf_counter()
+        load(db, args.reservations, args.order_items)
+        print(f"Loaded {args.reservations} reservations and {args.order_items} order items "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        before = time_lookups(db, args.repeat)
+        start = time.perf_counter()
+        db.migrate()
+        print(f"Migrated to version {MIGRATIONS[-1][0]} in {time.perf_counter() - start:.1f}s")
+        db.conn.execute("ANALYZE")
+        after = time_lookups(db, args.repeat)
+
+        print(f"\n{'lookup':<38}{'before ms':>12}{'after ms':>12}")
+        for label in before:
+            print(f"{label:<38}{before[label]:12.3f}{after[label]:12.3f}")
+        pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
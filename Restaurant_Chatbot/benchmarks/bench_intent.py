@@ -0,0 +1,70 @@
+"""Micro-benchmark: compiled IntentClassifier vs. the original substring cascade.
+
+    python benchmarks/bench_intent.py --rounds 200
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from legacy import legacy_analyze_intent  # noqa: E402
+from utils import INTENT_CLASSIFIER, analyze_intent, classify_many  # noqa: E402
+
+
+# Neutral preamble that contains none of the keywords, to show how each version scales with length
+FILLER = "we are planning a quiet anniversary dinner for next week and would love your advice, "
+
+
+def load_utterances():
+    with open(os.path.join(HERE, "utterances.txt"), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def per_call_us(classify, utterances, rounds, cold=False):
+    session_state = {}
+    elapsed = 0.0
+    for _ in range(rounds):
+        if cold:
+            INTENT_CLASSIFIER._match_short.cache_clear()  # Every utterance is seen for the first time
+        start = time.perf_counter()
+        for text in utterances:
+            classify(text, session_state)
+        elapsed += time.perf_counter() - start
+    return elapsed / (rounds * len(utterances)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--show-diff", action="store_true", help="list utterances the two classify differently")
+    args = parser.parse_args()
+
+    utterances = load_utterances()
+    print(f"{len(utterances)} utterances x {args.rounds} rounds")
+    for label, texts in (("short", utterances), ("long", [FILLER * 3 + text for text in utterances])):
+        legacy = per_call_us(legacy_analyze_intent, texts, args.rounds)
+        compiled = per_call_us(analyze_intent, texts, args.rounds)
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            classify_many(texts)
+        batch = (time.perf_counter() - start) / (args.rounds * len(texts)) * 1e6
+        print(f"[{label}] legacy analyze_intent     {legacy:8.2f} us/utterance")
+        print(f"[{label}] compiled analyze_intent   {compiled:8.2f} us/utterance  ({legacy / compiled:.1f}x)")
+        if label == "short":
+            cold = per_call_us(analyze_intent, texts, args.rounds, cold=True)
+            print(f"[{label}] uncached analyze_intent   {cold:8.2f} us/utterance  ({legacy / cold:.1f}x)")
+        print(f"[{label}] classify_many             {batch:8.2f} us/utterance")
+
+    changed = [(text, legacy_analyze_intent(text, {}), analyze_intent(text, {})) for text in utterances]
+    changed = [row for row in changed if row[1] != row[2]]
+    print(f"{len(changed)} utterances classified differently")
+    if args.show_diff:
+        for text, old, new in changed:
+            print(f"  {text!r}: {old} -> {new}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Load test: scripted multi-turn conversations through RestaurantChatbot.process_user_input.
+
+Runs --sessions simulated customers over --processes worker processes of --threads threads each,
+against a throwaway SQLite file and a stub in place of ChatGroq (--llm-ms stands in for the
+model's reply time). Every session collects contact details and then orders, books a table,
+asks about the menu or makes small talk. Reports p50/p95/p99 turn latency, SQL statements per
+turn and throughput, overall and per scenario, and writes them as JSON with --output.
+--baseline compares against an earlier JSON file and exits with status 1 on a regression.
+
+    python benchmarks/bench_load.py --sessions 400 --processes 2 --threads 8 --output load.json
+    python benchmarks/bench_load.py --sessions 400 --processes 2 --threads 8 --baseline load.json
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from langchain_core.language_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatResult  # noqa: E402
+
+from chat_engine import ChatEngine, SessionState  # noqa: E402
+from database import RestaurantDatabase  # noqa: E402
+
+NAMES = ("Alice", "Bob", "Carmen", "Deepak", "Erin", "Farid", "Grace", "Hiro", "Ines", "Jonas")
+SCENARIOS = ("order", "reservation", "menu", "small_talk")
+# Metrics compared with --baseline: (key, True if higher is better)
+COMPARED = (("p50_ms", False), ("p95_ms", False), ("p99_ms", False), ("sql_per_turn", False),
+            ("turns_per_s", True))
+
+
+class StubChatGroq(BaseChatModel):
+    """Stands in for ChatGroq: a canned reply after `latency` seconds, no network."""
+
+    model_name: str = "llama3-8b-8192"
+    temperature: float = 0.2
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-groq"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        question = messages[-1].content
+        reply = f"Thanks for asking about that. At The Culinary Hub we are happy to help with: {question}"
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=reply))])
+
+
+def script(scenario: str, session: int) -> List[str]:
+    """The customer's messages for one session; phone numbers are unique per session."""
+    name = NAMES[session % len(NAMES)]
+    phone = f"555-{session // 10000 % 1000:03d}-{session % 10000:04d}"
+    turns = ["hello", name, phone]
+    turns.append(f"{name.lower()}{session}@example.com" if session % 2 else "no thanks")
+    if scenario == "order":
+        turns += ["show me the menu", "I want to order 2 margherita pizzas and a caesar salad",
+                  "I want to order 1 chicken alfredo", "confirm"]
+    elif scenario == "reservation":
+        day = datetime.date.today() + datetime.timedelta(days=1 + session % 28)
+        hour = 5 + session % 4
+        turns += [f"book a table for {2 + session % 5} people on {day:%B} {day.day} at {hour}pm", "yes",
+                  "what are your hours"]
+    elif scenario == "menu":
+        turns += ["what offers do you have", "show me dishes under $15",
+                  "tell me about the chicken alfredo", "where are you located"]
+    else:
+        turns += ["is there parking near the restaurant?", f"can I bring my dog number {session % 50}?",
+                  "thanks, goodbye"]
+    return turns
+
+
+class _Counter(threading.local):
+    statements = 0
+
+
+def _run_worker(args) -> List[Dict[str, Any]]:
+    """Runs sessions [first, last) on one engine with `threads` threads; one record per turn."""
+    workdir, first, last, threads, llm_ms = args
+    os.chdir(workdir)  # RestaurantChatbot opens restaurant.db in the working directory
+    engine = ChatEngine(StubChatGroq(latency=llm_ms / 1000))
+    counter = _Counter()
+    traced = set()
+
+    def count(statement):
+        # Statements run by triggers are reported as "-- TRIGGER ..." and are not counted
+        if not statement.startswith("--"):
+            counter.statements += 1
+
+    def run_session(session):
+        conn = engine.db.conn
+        if id(conn) not in traced:  # One connection per thread, traced once
+            conn.set_trace_callback(count)
+            traced.add(id(conn))
+        scenario = SCENARIOS[session % len(SCENARIOS)]
+        chatbot = engine.chatbot(SessionState(f"load-{os.getpid()}-{session}"))
+        records = []
+        for position, text in enumerate(script(scenario, session)):
+            statements = counter.statements
+            start = time.perf_counter()
+            try:
+                chatbot.process_user_input(text)
+                error = None
+            except Exception as e:  # A failed turn is recorded, not fatal to the run
+                error = f"{type(e).__name__}: {e}"
+            records.append({"scenario": scenario, "turn": position, "ms": (time.perf_counter() - start) * 1000,
+                            "sql": counter.statements - statements, "error": error})
+        return records
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(run_session, range(first, last)))
+    engine.db.pool.close_all()
+    return [record for records in results for record in records]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(records: List[Dict[str, Any]], seconds: float) -> Dict[str, Any]:
+    latencies = sorted(record["ms"] for record in records)
+    sql = sorted(record["sql"] for record in records)
+    return {"turns": len(records), "errors": sum(1 for record in records if record["error"]),
+            "p50_ms": round(percentile(latencies, 0.50), 3), "p95_ms": round(percentile(latencies, 0.95), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3), "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+            "sql_per_turn": round(sum(sql) / len(sql), 2) if sql else 0.0,
+            "sql_p95": percentile(sql, 0.95), "turns_per_s": round(len(records) / seconds, 1) if seconds else 0.0}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for scope, summary in [("overall", result["overall"])] + sorted(result["scenarios"].items()):
+        before = baseline["overall"] if scope == "overall" else baseline.get("scenarios", {}).get(scope)
+        if not before:
+            continue
+        for key, higher_is_better in COMPARED:
+            old, new = before.get(key), summary.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{scope} {key}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="stub LLM reply time")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed slowdown before failing, 0.3 = 30%%")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Create and seed the database once, before the workers open it
+        RestaurantDatabase(os.path.join(tmp, "restaurant.db")).pool.close_all()
+        bounds = [args.sessions * i // args.processes for i in range(args.processes + 1)]
+        jobs = [(tmp, bounds[i], bounds[i + 1], args.threads, args.llm_ms) for i in range(args.processes)]
+        start = time.perf_counter()
+        if args.processes == 1:
+            chunks = [_run_worker(jobs[0])]
+        else:
+            with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+                chunks = pool.map(_run_worker, jobs)
+        seconds = time.perf_counter() - start
+    records = [record for chunk in chunks for record in chunk]
+
+    result = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "config": {"sessions": args.sessions, "processes": args.processes, "threads": args.threads,
+                   "llm_ms": args.llm_ms},
+        "seconds": round(seconds, 3),
+        "overall": summarize(records, seconds),
+        "scenarios": {scenario: summarize([record for record in records if record["scenario"] == scenario], seconds)
+                      for scenario in SCENARIOS},
+    }
+    errors = sorted({record["error"] for record in records if record["error"]})
+
+    print(f"{args.sessions} sessions, {args.processes} process(es) x {args.threads} threads, "
+          f"stub LLM {args.llm_ms} ms, {seconds:.2f} s")
+    print(f"{'':<13}{'turns':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL/turn':>10}{'turns/s':>9}{'errors':>8}")
+    for scope, summary in [("overall", result["overall"])] + list(result["scenarios"].items()):
+        print(f"{scope:<13}{summary['turns']:7d}{summary['p50_ms']:9.2f}{summary['p95_ms']:9.2f}"
+              f"{summary['p99_ms']:9.2f}{summary['sql_per_turn']:10.2f}{summary['turns_per_s']:9.1f}"
+              f"{summary['errors']:8d}")
+    for error in errors[:5]:
+        print("error:", error)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("regression:", regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
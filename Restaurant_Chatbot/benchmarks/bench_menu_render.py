@@ -0,0 +1,67 @@
+"""show_menu / filter_menu_items / show_offers rendering on a large menu: += strings vs. RenderedMenu.
+
+    python benchmarks/bench_menu_render.py --items 5000 --offers 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from legacy import legacy_render_filtered, legacy_render_menu, legacy_render_offers  # noqa: E402
+from menu_catalog import CatalogSnapshot, filter_rows  # noqa: E402
+from menu_renderer import RenderedMenu  # noqa: E402
+
+CATEGORIES = ["Pizza", "Pasta", "Burger", "Salad", "Dessert", "Drinks", "Sides", "Mains", "Soup", "Vegetarian"]
+
+
+def make_snapshot(items, offers):
+    rng = random.Random(5)
+    rows = [(i, f"Dish {i}", f"House speciality number {i} with seasonal garnish.", rng.choice(CATEGORIES),
+             round(rng.uniform(3, 40), 2), "flour, salt, oil", "Calories: 500", "Made fresh daily.")
+            for i in range(1, items + 1)]
+    offer_rows = [(f"Offer {i}", f"Deal number {i}", rng.choice((0, 0.1, 0.5)), "16:00", "18:00", i % 3 == 0)
+                  for i in range(offers)]
+    return CatalogSnapshot(1, rows, offer_rows)
+
+
+def best_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--offers", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    snapshot = make_snapshot(args.items, args.offers)
+    criteria = {"max_price": 15.0}
+    build = best_ms(lambda: RenderedMenu(snapshot), args.repeat)
+    rendered = RenderedMenu(snapshot)
+    assert rendered.menu == legacy_render_menu(snapshot.items)
+    assert rendered.filtered(criteria) == legacy_render_filtered(filter_rows(snapshot.items, criteria))
+
+    rows = [
+        ("show_menu", lambda: legacy_render_menu(snapshot.items), lambda: rendered.menu),
+        ("filter_menu_items (under $15)", lambda: legacy_render_filtered(filter_rows(snapshot.items, criteria)),
+         lambda: rendered.filtered(criteria)),
+        ("show_offers", lambda: legacy_render_offers(snapshot.offers), rendered.offers),
+    ]
+    print(f"{args.items} menu items, {args.offers} offers; RenderedMenu built in {build:.1f} ms per catalog version")
+    print(f"{'':<32}{'legacy ms':>12}{'cached ms':>12}{'speedup':>10}")
+    for label, legacy, cached in rows:
+        legacy_ms, cached_ms = best_ms(legacy, args.repeat), best_ms(cached, args.repeat)
+        print(f"{label:<32}{legacy_ms:12.3f}{cached_ms:12.4f}{legacy_ms / max(cached_ms, 1e-6):9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Per-turn cost of extract_order_items as the menu grows: NameTrie scan vs. the original name loop.
+
+Menus are the demo menu padded with generated dish names; the trie is built once per menu, the
+way MenuCatalog builds it once per catalog version.
+
+    python benchmarks/bench_order_items.py --sizes 7 1000 5000 --rounds 20
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from legacy import legacy_extract_order_items  # noqa: E402
+from search_index import NameTrie  # noqa: E402
+from utils import extract_order_items  # noqa: E402
+
+DEMO_MENU = ["Margherita Pizza", "Chicken Alfredo", "Veggie Burger", "Caesar Salad", "Chocolate Lava Cake",
+             "Iced Tea", "Espresso"]
+STYLES = ["Smoked", "Spicy", "Crispy", "Braised", "Grilled", "Roasted", "Pickled", "Charred", "Glazed", "Stuffed"]
+BASES = ["Tofu", "Duck", "Lamb", "Cod", "Prawn", "Paneer", "Mushroom", "Pork Belly", "Aubergine", "Halloumi"]
+DISHES = ["Bao", "Tacos", "Risotto", "Ramen", "Flatbread", "Skewers", "Curry", "Bowl", "Gnocchi", "Pie"]
+ORDERS = [
+    "I want to order 2 margherita pizza and one iced tea",
+    "get me three espresso",
+    "I'd like to order a veggie burger and 2 iced tea",
+    "order one caesar salad and a chocolate lava cake",
+    "buy 2 x margherita pizza",
+    "can I get 1 chicken alfredo",
+]
+
+
+def make_menu(size):
+    rng = random.Random(size)
+    names = list(DEMO_MENU)
+    while len(names) < size:
+        names.append(f"{rng.choice(STYLES)} {rng.choice(BASES)} {rng.choice(DISHES)} No. {len(names)}")
+    return [(i + 1, name) for i, name in enumerate(names[:max(size, len(DEMO_MENU))])]
+
+
+def per_turn_us(extract, menu, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in ORDERS:
+            extract(text, menu)
+    return (time.perf_counter() - start) / (rounds * len(ORDERS)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[7, 1000, 5000])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'menu items':>10}{'build ms':>10}{'legacy us/turn':>16}{'trie us/turn':>14}{'speedup':>9}")
+    for size in args.sizes:
+        menu = make_menu(size)
+        start = time.perf_counter()
+        name_trie = NameTrie.from_names((name, name) for _, name in menu)
+        build_ms = (time.perf_counter() - start) * 1000
+        legacy = per_turn_us(legacy_extract_order_items, menu, args.rounds)
+        trie = per_turn_us(extract_order_items, name_trie, args.rounds)
+        print(f"{size:>10}{build_ms:10.1f}{legacy:16.1f}{trie:14.1f}{legacy / trie:8.1f}x")
+
+    menu = make_menu(len(DEMO_MENU))
+    print("\nExtracted on the demo menu (legacy -> trie):")
+    for text in ORDERS:
+        print(f"  {text!r}: {legacy_extract_order_items(text, menu)} -> {extract_order_items(text, menu)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Group-order cost: full SUM() refresh per line plus a re-read vs. trigger deltas and a SessionOrder.
+
+Builds --orders orders of --lines lines each, one line per turn, and renders the summary after every
+turn the way place_order_flow does.
+
+    python benchmarks/bench_order_totals.py --lines 40 --orders 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import ConnectionPool, RestaurantDatabase  # noqa: E402
+from orders import SessionOrder  # noqa: E402
+
+TRIGGERS = ("trg_order_items_insert_total", "trg_order_items_update_total", "trg_order_items_delete_total")
+
+
+def legacy_add_line(db, order_id, menu_item_id, quantity, price):
+    with db.transaction():
+        db.cursor.execute("SELECT quantity FROM order_items WHERE order_id = ? AND menu_item_id = ?",
+                          (order_id, menu_item_id))
+        existing = db.cursor.fetchone()
+        if existing:
+            db.cursor.execute("UPDATE order_items SET quantity = ? WHERE order_id = ? AND menu_item_id = ?",
+                              (existing[0] + quantity, order_id, menu_item_id))
+        else:
+            db.cursor.execute("INSERT INTO order_items (order_id, menu_item_id, quantity, price_at_order) VALUES (?, ?, ?, ?)",
+                              (order_id, menu_item_id, quantity, price))
+        db.cursor.execute(
+            "UPDATE orders SET total_amount = (SELECT SUM(quantity * price_at_order) FROM order_items WHERE order_id = ?) WHERE id = ?",
+            (order_id, order_id))
+
+
+def legacy_summary(db, order_id):
+    summary, total = "Your current order:\n", 0
+    for _, name, qty, price in db.get_order_items(order_id):
+        summary += f"- {qty}x {name} (${qty * price:.2f})\n"
+        total += qty * price
+    return summary + f"Total: ${total:.2f}\n"
+
+
+def run(db, menu, lines, orders, legacy):
+    start = time.perf_counter()
+    for _ in range(orders):
+        order_id = db.create_order(1)
+        order = SessionOrder(order_id)
+        for line in range(lines):
+            menu_item_id, name, price = menu[line % len(menu)]
+            if legacy:
+                legacy_add_line(db, order_id, menu_item_id, 1, price)
+                legacy_summary(db, order_id)
+            else:
+                db.add_order_item(order_id, menu_item_id, 1, price)
+                order.add(menu_item_id, name, 1, price)
+                order.summary()
+    return (time.perf_counter() - start) / (orders * lines) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lines", type=int, default=40)
+    parser.add_argument("--orders", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, legacy in (("SUM() refresh + re-read", True), ("trigger delta + SessionOrder", False)):
+            pool = ConnectionPool(os.path.join(tmp, f"{legacy}.db"))
+            db = RestaurantDatabase(pool.db_name, pool=pool)
+            with db.transaction() as cur:
+                cur.executemany("INSERT INTO menu (name, description, category, price) VALUES (?, ?, ?, ?)",
+                                [(f"Bench dish {i}", "", "Bench", 5 + i * 0.25) for i in range(args.lines)])
+                if legacy:
+                    for trigger in TRIGGERS:
+                        cur.execute(f"DROP TRIGGER {trigger}")
+            menu = [row[:2] + (row[4],) for row in db.cursor.execute(
+                "SELECT id, name, description, category, price FROM menu WHERE category = 'Bench' ORDER BY id")]
+            results[label] = run(db, menu, args.lines, args.orders, legacy)
+            pool.close_all()
+
+    print(f"{args.orders} orders x {args.lines} lines, summary rendered after every line")
+    baseline = next(iter(results.values()))
+    for label, us in results.items():
+        print(f"{label:<30}{us:9.1f} us/line  ({baseline / us:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Prompt size per LLM call: the original template vs. PromptBuilder.
+
+Replays a conversation whose window holds long menu and offer replies, then builds the prompt for
+each off-script question both ways. Tokens use prompt_builder.count_tokens for both.
+
+    python benchmarks/bench_prompt.py --history-tokens 400
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder  # noqa: E402
+
+from chatbot_agent import SYSTEM_PROMPT  # noqa: E402
+from database import RestaurantDatabase  # noqa: E402
+from menu_catalog import get_catalog  # noqa: E402
+from prompt_builder import PromptBuilder, count_tokens  # noqa: E402
+
+QUESTIONS = [
+    "is the chicken alfredo spicy?",
+    "what time do you close on sunday?",
+    "do you have any desserts without nuts?",
+    "is there parking near the restaurant?",
+    "can I bring my dog?",
+    "which pizza would you recommend for a kid?",
+    "do you have a happy hour deal on drinks?",
+    "is the veggie burger vegan?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history-tokens", type=int, default=400)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    db = RestaurantDatabase()
+    catalog = get_catalog(db)
+
+    rendered = catalog.rendered()
+    window = deque(maxlen=10)
+    for question, reply in (("show me the menu", rendered.menu), ("what offers do you have", rendered.offers()),
+                            ("do you have pasta", rendered.category("pasta")), ("thanks", "You're welcome!"),
+                            ("anything under $10", rendered.filtered({"max_price": 10.0}) or "")):
+        window.extend((("user", question), ("assistant", reply)))
+
+    template = ChatPromptTemplate.from_messages([SystemMessage(content=SYSTEM_PROMPT),
+                                                 MessagesPlaceholder(variable_name="chat_history"),
+                                                 HumanMessagePromptTemplate.from_template("{input}")])
+    history = [HumanMessage(content=c) if r == "user" else AIMessage(content=c) for r, c in window]
+    builder = PromptBuilder(SYSTEM_PROMPT, catalog, db, history_tokens=args.history_tokens)
+
+    def tokens(messages):
+        return sum(count_tokens(message.content) for message in messages)
+
+    old = [tokens(template.format_messages(chat_history=history, input=q)) for q in QUESTIONS]
+    new = [builder.build(q, window)[1] for q in QUESTIONS]
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for q in QUESTIONS:
+            template.format_messages(chat_history=history, input=q)
+    old_us = (time.perf_counter() - start) / (args.rounds * len(QUESTIONS)) * 1e6
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        for q in QUESTIONS:
+            builder.build(q, window)
+    new_us = (time.perf_counter() - start) / (args.rounds * len(QUESTIONS)) * 1e6
+
+    print(f"{'question':<44}{'template':>9}{'builder':>9}  facts dropped")
+    for q, before, stats in zip(QUESTIONS, old, new):
+        print(f"{q:<44}{before:9d}{stats.total:9d}  {stats.facts:5d} {stats.dropped:7d}")
+    average = statistics.mean(stats.total for stats in new)
+    print(f"average prompt tokens: template {statistics.mean(old):.0f}, builder {average:.0f} "
+          f"({1 - average / statistics.mean(old):.0%} smaller); system prompt {count_tokens(SYSTEM_PROMPT)} -> "
+          f"{builder.system_tokens} tokens")
+    print(f"assembly time: template {old_us:.1f} us, builder {new_us:.1f} us per prompt")
+
+
+if __name__ == "__main__":
+    main()
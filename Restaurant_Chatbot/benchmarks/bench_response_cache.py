@@ -0,0 +1,60 @@
+"""Hit rate and lookup latency of ResponseCache on a stream of repeated off-script questions.
+
+Customers ask from a small pool of questions, each in a few phrasings. A miss stands for one LLM
+call of --llm-ms; the report shows how many calls (and roughly how many tokens) the cache saved.
+
+    python benchmarks/bench_response_cache.py --questions 5000 --llm-ms 800
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from response_cache import ResponseCache  # noqa: E402
+
+PHRASINGS = [
+    ["do you have parking?", "is there parking available?", "any parking nearby?", "Do you have parking"],
+    ["is there wifi here", "do you have wi-fi?", "is there wi fi"],
+    ["can I bring my dog", "can i bring my dogs?", "are dogs allowed"],
+    ["do you take credit cards", "do you take credit card?"],
+    ["is the restaurant wheelchair accessible", "is the restaurant wheelchair accessible?"],
+    ["do you have high chairs", "any high chairs?"],
+    ["can I bring my own wine", "can we bring our own wine?"],
+    ["is there a dress code", "do you have a dress code?"],
+]
+REPLY = "Yes - " + "details " * 60  # ~60 tokens per answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--llm-ms", type=float, default=800.0, help="assumed latency of one LLM call")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    cache = ResponseCache()
+    lookups = []
+    for _ in range(args.questions):
+        question = rng.choice(rng.choice(PHRASINGS))
+        start = time.perf_counter()
+        reply = cache.get(question)
+        lookups.append(time.perf_counter() - start)
+        if reply is None:
+            cache.put(question, REPLY)
+
+    lookups.sort()
+    metrics = cache.metrics()
+    misses = metrics["misses"]
+    print(f"{args.questions} questions from {sum(map(len, PHRASINGS))} phrasings of {len(PHRASINGS)} questions")
+    print(f"exact hits {metrics['exact_hits']}, semantic hits {metrics['semantic_hits']}, misses {misses} "
+          f"(hit rate {metrics['hit_rate']:.1%})")
+    print(f"lookup p50 {lookups[len(lookups) // 2] * 1e6:.1f} us, p99 {lookups[int(len(lookups) * 0.99)] * 1e6:.1f} us")
+    print(f"LLM calls {args.questions} -> {misses}; ~{(args.questions - misses) * len(REPLY.split())} "
+          f"completion tokens and ~{(args.questions - misses) * args.llm_ms / 1000:.0f}s of generation saved")
+
+
+if __name__ == "__main__":
+    main()
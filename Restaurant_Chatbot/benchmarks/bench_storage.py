@@ -0,0 +1,76 @@
+"""Orders-per-second benchmark for the RestaurantDatabase storage profiles.
+
+Each worker thread places orders the way place_order_flow does (create_order, a few
+add_order_item calls, then update_order_status) against a fresh database file.
+
+    python benchmarks/bench_storage.py --threads 8 --orders 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import (RestaurantDatabase, ConnectionPool, DEFAULT_STORAGE_PROFILE,  # noqa: E402
+                      LEGACY_STORAGE_PROFILE)
+
+
+def place_orders(db, customer_id, orders, lines, batched):
+    for _ in range(orders):
+        if batched:
+            with db.transaction():
+                place_order(db, customer_id, lines)
+        else:
+            place_order(db, customer_id, lines)
+
+
+def place_order(db, customer_id, lines):
+    order_id = db.create_order(customer_id)
+    for menu_item_id in range(1, lines + 1):
+        db.add_order_item(order_id, menu_item_id, 1, 9.99)
+    db.update_order_status(order_id, 'confirmed')
+
+
+def run(profile, batched, threads, orders, lines):
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, "bench.db"), profile=profile)
+        db = RestaurantDatabase(pool.db_name, pool=pool)
+        customer_ids = [db.add_customer(f"Bench {i}", phone=f"555{i:07d}") for i in range(threads)]
+
+        workers = [threading.Thread(target=place_orders, args=(db, customer_ids[i], orders, lines, batched))
+                   for i in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        pool.close_all()
+    return threads * orders / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--orders", type=int, default=100, help="orders per thread")
+    parser.add_argument("--lines", type=int, default=3, help="order lines per order")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("rollback journal, commit per call", LEGACY_STORAGE_PROFILE, False),
+        ("WAL profile, commit per call", DEFAULT_STORAGE_PROFILE, False),
+        ("WAL profile, one commit per order", DEFAULT_STORAGE_PROFILE, True),
+    ]
+    print(f"{args.threads} threads x {args.orders} orders x {args.lines} lines")
+    baseline = None
+    for label, profile, batched in scenarios:
+        rate = run(profile, batched, args.threads, args.orders, args.lines)
+        baseline = baseline or rate
+        print(f"{label:<40} {rate:10.1f} orders/s  ({rate / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Time to first token vs. time to full reply for an LLM-answered turn, against a fake chat model.
+
+The fake model sleeps --token-ms before each token to stand in for generation speed, so no API
+key or network is needed.
+
+    python benchmarks/bench_streaming.py --tokens 200 --token-ms 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from langchain_core.language_models import GenericFakeChatModel  # noqa: E402
+from langchain_core.messages import AIMessage  # noqa: E402
+
+from chatbot_agent import RestaurantChatbot  # noqa: E402
+
+
+class SlowFakeChatModel(GenericFakeChatModel):
+    token_delay: float = 0.005
+
+    def _stream(self, *args, **kwargs):
+        for chunk in super()._stream(*args, **kwargs):
+            if chunk.message.content.strip():
+                time.sleep(self.token_delay)
+            yield chunk
+
+
+class SessionState(dict):
+    __getattr__ = dict.get
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+def new_session():
+    return SessionState(customer_id=None, customer_name=None, customer_phone=None, customer_email=None,
+                        current_order_id=None, current_order_items=[], reservation_details=None,
+                        awaiting_order_confirmation=False, awaiting_reservation_confirmation=False,
+                        conversation_state="INITIAL", current_intent_after_contact=None)
+
+
+def make_bot(reply, token_delay):
+    # GenericFakeChatModel streams words and the spaces between them as separate chunks
+    llm = SlowFakeChatModel(messages=iter([AIMessage(content=reply)] * 1000), token_delay=token_delay)
+    bot = RestaurantChatbot(new_session(), llm=llm)
+    for text in ["hello", "Alice", "555-123-4567", "alice@example.com"]:
+        bot.process_user_input(text)
+    return bot
+
+
+def time_sync(bot, question):
+    start = time.perf_counter()
+    first = None
+    for _ in bot.stream_user_input(question):
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def time_async(bot, question):
+    start = time.perf_counter()
+    first = None
+    async for _ in bot.astream_user_input(question):
+        first = first or time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=200)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    reply = " ".join(["word"] * args.tokens)
+    question = "do you have parking?"
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # RestaurantChatbot opens restaurant.db in the working directory
+        bot = make_bot(reply, args.token_ms / 1000)
+        start = time.perf_counter()
+        bot.process_user_input(question)
+        blocking = time.perf_counter() - start
+        sync_first, sync_total = time_sync(bot, question)
+        async_first, async_total = asyncio.run(time_async(bot, question))
+        bot.db.pool.close_all()
+        os.chdir(cwd)
+
+    print(f"{args.tokens} tokens at {args.token_ms} ms/token")
+    print(f"{'':<26}{'first token ms':>16}{'full reply ms':>15}")
+    print(f"{'process_user_input':<26}{blocking * 1000:16.1f}{blocking * 1000:15.1f}")
+    print(f"{'stream_user_input':<26}{sync_first * 1000:16.1f}{sync_total * 1000:15.1f}")
+    print(f"{'astream_user_input':<26}{async_first * 1000:16.1f}{async_total * 1000:15.1f}")
+
+
+if __name__ == "__main__":
+    main()
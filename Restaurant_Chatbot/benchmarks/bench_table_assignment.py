@@ -0,0 +1,110 @@
+"""Seated covers and latency: greedy smallest-free-table vs. TableAssigner on synthetic booking streams.
+
+Each stream is one evening of booking requests arriving in random order. "greedy" is the old flow
+(smallest single table that is free, never moves anyone), "place" runs TableAssigner.place() on
+every request as the chatbot does, and "plan" re-plans the whole evening at once as a reference.
+
+    python benchmarks/bench_table_assignment.py --tables 120 --requests 200 --streams 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from table_assignment import Booking, TableAssigner, _Schedule  # noqa: E402
+
+CAPACITIES = (2, 2, 2, 4, 4, 4, 4, 6, 8)
+PARTY_SIZES = (1, 2, 2, 2, 2, 3, 4, 4, 4, 5, 6, 6, 8, 10, 12)
+
+
+def make_tables(count, group_size, rng):
+    """(id, table_number, capacity, combine_group); every table sits in a group of group_size."""
+    return [(i, f"T{i}", rng.choice(CAPACITIES), f"zone {(i - 1) // group_size}" if group_size > 1 else None)
+            for i in range(1, count + 1)]
+
+
+def make_stream(count, rng):
+    # Evening service 17:00-23:00, starts on a 15 minute grid, peaking around 19:30
+    stream = []
+    for key in range(count):
+        start = min(max(int(rng.gauss(19.5 * 60, 75)) // 15 * 15, 17 * 60), 21 * 60)
+        stream.append(Booking(key, start, rng.choice(PARTY_SIZES)))
+    return stream
+
+
+def run_greedy(tables, stream):
+    schedule = _Schedule(table[0] for table in tables)
+    singles = sorted(tables, key=lambda table: (table[2], table[0]))
+    covers, latencies = 0, []
+    for booking in stream:
+        start = time.perf_counter()
+        for table in singles:
+            if table[2] >= booking.party_size and schedule.is_free(table[0], booking.start, booking.end):
+                schedule.occupy((table[0],), booking)
+                covers += booking.party_size
+                break
+        latencies.append(time.perf_counter() - start)
+    return covers, 0, latencies
+
+
+def run_place(tables, stream):
+    assigner = TableAssigner(tables)
+    held, covers, moves, latencies = {}, 0, 0, []
+    for booking in stream:
+        start = time.perf_counter()
+        placed = assigner.place(list(held.values()), booking)
+        latencies.append(time.perf_counter() - start)
+        if placed is None:
+            continue
+        new_tables, moved = placed
+        for key, moved_to in moved.items():
+            old = held[key]
+            held[key] = Booking(key, old.start, old.party_size, moved_to, duration=old.end - old.start)
+        held[booking.key] = Booking(booking.key, booking.start, booking.party_size, new_tables)
+        covers += booking.party_size
+        moves += len(moved)
+    return covers, moves, latencies
+
+
+def run_plan(tables, stream):
+    start = time.perf_counter()
+    plan = TableAssigner(tables).plan(stream)
+    return plan.seated_covers, 0, [time.perf_counter() - start]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tables", type=int, default=120)
+    parser.add_argument("--group-size", type=int, default=4, help="tables per combinable group; 1 disables combining")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--streams", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    tables = make_tables(args.tables, args.group_size, rng)
+    results = {"greedy": [], "place": [], "plan": []}
+    requested = 0
+    for _ in range(args.streams):
+        stream = make_stream(args.requests, rng)
+        requested += sum(booking.party_size for booking in stream)
+        for label, run in (("greedy", run_greedy), ("place", run_place), ("plan", run_plan)):
+            results[label].append(run(tables, stream))
+
+    print(f"{args.tables} tables ({sum(table[2] for table in tables)} seats, groups of {args.group_size}), "
+          f"{args.streams} streams x {args.requests} requests, {requested} covers requested")
+    for label, runs in results.items():
+        covers = sum(run[0] for run in runs)
+        moves = sum(run[1] for run in runs)
+        latencies = sorted(latency for run in runs for latency in run[2])
+        p99 = latencies[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0]
+        print(f"{label:<7} seated {covers:6d} covers ({covers / requested:6.1%})  moves {moves:5d}  "
+              f"mean {statistics.mean(latencies) * 1000:7.3f} ms  p99 {p99 * 1000:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+from langchain_groq import ChatGroq
+
+from availability import AvailabilityEngine
+from chatbot_agent import SYSTEM_PROMPT, RestaurantChatbot
+from conversation_store import PAGE_SIZE, new_session_id
+from database import RestaurantDatabase
+from menu_catalog import get_catalog
+from orders import SessionOrder
+from prompt_builder import PromptBuilder
+from response_cache import get_response_cache
+from table_assignment import TablePlanner
+
+MAX_SESSIONS = 10000  # Sessions kept in memory; the least recently active is dropped beyond this
+IDLE_TIMEOUT = 30 * 60  # Seconds without a message before a session's state is saved and dropped from memory
+TURN_POLL_SECONDS = 0.01  # How often an async turn checks whether a synchronous turn of its session is done
+
+
+class SessionState:
+    """Conversation state of one session, as the Streamlit app keeps it in st.session_state.
+
+    Attribute access like st.session_state, plus get() for the helpers that read it like a dict.
+    """
+
+    __slots__ = ("session_id", "customer_id", "customer_name", "customer_phone", "customer_email",
+                 "current_order_id", "current_order", "reservation_details", "awaiting_order_confirmation",
+                 "awaiting_reservation_confirmation", "conversation_state", "current_intent_after_contact")
+
+    def __init__(self, session_id: Optional[str] = None, customer_id: Optional[int] = None):
+        self.session_id = session_id or new_session_id()
+        self.customer_id = customer_id
+        self.customer_name = None
+        self.customer_phone = None
+        self.customer_email = None
+        self.current_order_id = None
+        self.current_order = None  # SessionOrder mirroring the pending order's items and total
+        self.reservation_details = None
+        self.awaiting_order_confirmation = False
+        self.awaiting_reservation_confirmation = False
+        self.conversation_state = "INITIAL"
+        self.current_intent_after_contact = None
+
+    def get(self, key: str, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-ready copy of the state; the pending order is kept as its lines."""
+        state = {name: getattr(self, name) for name in self.__slots__ if name != "current_order"}
+        if self.current_order is not None:
+            state["current_order"] = [[line.menu_item_id, line.name, line.quantity, line.price]
+                                      for line in self.current_order.lines.values()]
+        return state
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "SessionState":
+        session_state = cls(state["session_id"])
+        for name in cls.__slots__:
+            if name in state and name != "current_order":
+                setattr(session_state, name, state[name])
+        if state.get("current_order") is not None and session_state.current_order_id is not None:
+            session_state.current_order = SessionOrder(session_state.current_order_id)
+            for menu_item_id, name, quantity, price in state["current_order"]:
+                session_state.current_order.add(menu_item_id, name, quantity, price)
+        return session_state
+
+
+def _hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class _Session:
+    __slots__ = ("chatbot", "lock", "turn_lock", "token_hash", "last_active")
+
+    def __init__(self, chatbot: RestaurantChatbot, token_hash: Optional[str] = None):
+        self.chatbot = chatbot
+        self.lock = asyncio.Lock()  # One async turn at a time per session; other sessions are not held up
+        self.turn_lock = threading.Lock()  # Held for the whole of any turn, sync or async
+        self.token_hash = token_hash  # Hash of the API token issued with the session, if any
+        self.last_active = time.monotonic()
+
+    def busy(self) -> bool:
+        return self.lock.locked() or self.turn_lock.locked()
+
+
+class ChatEngine:
+    """Runs any number of chat sessions in one process on shared resources.
+
+    The database pool, menu catalog, table planner, LLM client, prompt builder and response cache
+    are created once. Each session only holds a SessionState, its customer and its conversation
+    store, so thousands fit in memory. Turns of one session are serialized by a per-session lock;
+    SQLite work runs in worker threads and LLM calls are awaited, so sessions proceed concurrently.
+    Sessions idle for `idle_timeout` seconds (or beyond `max_sessions`) leave memory: their
+    SessionState is saved to chat_sessions and restored, with the transcript, if the session returns.
+
+    Session ids are issued here. open_session() also issues a token for clients over the network
+    (see api.py), and authorize() checks it, so knowing a session id is not enough to use it.
+    """
+
+    def __init__(self, llm: BaseChatModel | None = None, max_sessions: int = MAX_SESSIONS,
+                 idle_timeout: float = IDLE_TIMEOUT, db: RestaurantDatabase | None = None):
+        self.db = db if db is not None else RestaurantDatabase()
+        self.catalog = get_catalog(self.db)
+        self.availability = AvailabilityEngine(self.db)
+        self.table_planner = TablePlanner(self.db, self.availability)
+
+        self.model = 'llama3-8b-8192'
+        self.temperature = 0.2
+        if llm is None:
+            self.groq_api_key = os.environ.get('GROQ_API_KEY')
+            if not self.groq_api_key:
+                raise ValueError("GROQ_API_KEY environment variable is required")
+            llm = ChatGroq(groq_api_key=self.groq_api_key, model_name=self.model,
+                           temperature=self.temperature)  # Set temperature to 0.2
+        else:
+            self.model = getattr(llm, "model_name", None) or type(llm).__name__
+            self.temperature = getattr(llm, "temperature", None)
+        # Any LangChain chat model works here, e.g. a FakeListChatModel in tests
+        self.llm = llm
+
+        self.prompt_builder = PromptBuilder(SYSTEM_PROMPT, self.catalog, self.db)
+        self.system_prompt = self.prompt_builder.system_prompt
+        self.response_cache = get_response_cache(self.model, self.system_prompt, self.temperature)
+
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()  # Least recently active first
+        self._leaving: Dict[str, _Session] = {}  # Evicted sessions whose state is being saved
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def chatbot(self, session_state) -> RestaurantChatbot:
+        """A chatbot over state the caller keeps, e.g. Streamlit's session_state."""
+        return RestaurantChatbot(session_state, engine=self)
+
+    def session(self, session_id: Optional[str] = None, customer_id: Optional[int] = None) -> RestaurantChatbot:
+        """The chatbot for `session_id`, loaded or created if it is not in memory; None issues a new id."""
+        return self._session(session_id, customer_id).chatbot
+
+    def open_session(self, customer_id: Optional[int] = None) -> Tuple[RestaurantChatbot, str]:
+        """A new session and the token a remote client must show with authorize() to use it."""
+        token = secrets.token_urlsafe(32)
+        return self._session(None, customer_id, _hash_token(token)).chatbot, token
+
+    def authorize(self, session_id: str, token: Optional[str]) -> bool:
+        """True if `token` is the one open_session() issued for `session_id`."""
+        with self._lock:
+            session = self._sessions.get(session_id) or self._leaving.get(session_id)
+        if session is not None:
+            expected = session.token_hash
+        else:
+            saved = self.db.get_chat_session(session_id)
+            expected = saved[0] if saved else None
+        return bool(token and expected) and hmac.compare_digest(_hash_token(token), expected)
+
+    def known(self, session_id: str) -> bool:
+        """True for session ids issued by this engine (or one before it on the same database)."""
+        with self._lock:
+            if session_id in self._sessions or session_id in self._leaving:
+                return True
+        return self.db.get_chat_session(session_id) is not None
+
+    def _session(self, session_id: Optional[str], customer_id: Optional[int] = None,
+                 token_hash: Optional[str] = None) -> _Session:
+        now = time.monotonic()
+        with self._lock:
+            session = self._revive(session_id, now) if session_id else None
+            if session is not None:
+                return session
+        # Loading the saved state and the conversation window reads SQLite, so do it outside the lock
+        if session_id is None:
+            state = SessionState(customer_id=customer_id)
+            while not self.db.create_chat_session(state.session_id, token_hash):
+                state = SessionState(customer_id=customer_id)
+        else:
+            saved = self.db.get_chat_session(session_id)
+            token_hash = saved[0] if saved else None
+            if saved and saved[1]:
+                state = SessionState.from_dict(json.loads(saved[1]))
+            else:
+                state = SessionState(session_id, customer_id)
+        session = _Session(self.chatbot(state), token_hash)
+        session_id = state.session_id
+        with self._lock:
+            # Another request for the same session may have won the race
+            existing = self._revive(session_id, now)
+            if existing is not None:
+                return existing
+            self._sessions[session_id] = session
+            leaving = self._evict(now)
+        self._save(leaving)
+        return session
+
+    def _revive(self, session_id: str, now: float) -> Optional[_Session]:
+        # Called with the lock held; a session still being saved comes back as it is
+        session = self._sessions.get(session_id) or self._leaving.pop(session_id, None)
+        if session is not None:
+            session.last_active = now
+            self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _evict(self, now: float) -> List[Tuple[str, _Session]]:
+        # Called with the lock held. Oldest first; a session in the middle of a turn is kept
+        leaving = []
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions and now - session.last_active < self.idle_timeout:
+                break
+            if not session.busy():
+                del self._sessions[session_id]
+                self._leaving[session_id] = session
+                leaving.append((session_id, session))
+        return leaving
+
+    def _save(self, leaving: List[Tuple[str, _Session]]):
+        """Writes the state of sessions leaving memory, then lets them go unless they came back meanwhile."""
+        if not leaving:
+            return
+        self._write_states(leaving)
+        with self._lock:
+            for session_id, session in leaving:
+                if self._leaving.get(session_id) is session:
+                    del self._leaving[session_id]
+
+    def save_sessions(self):
+        """Saves the state of every idle session in memory, e.g. before the process exits."""
+        with self._lock:
+            sessions = [(session_id, session) for session_id, session in self._sessions.items() if not session.busy()]
+        if sessions:
+            self._write_states(sessions)
+
+    def _write_states(self, sessions: List[Tuple[str, _Session]]):
+        self.db.save_chat_sessions([(session_id, json.dumps(session.chatbot.session_state.to_dict()))
+                                    for session_id, session in sessions])
+
+    def end_session(self, session_id: str) -> bool:
+        """Ends the session: its state and token are dropped, its transcript stays in SQLite."""
+        with self._lock:
+            in_memory = self._sessions.pop(session_id, None) is not None
+            self._leaving.pop(session_id, None)
+        return self.db.delete_chat_session(session_id) or in_memory
+
+    def stream(self, session_id: str, user_input: str) -> Iterator[str]:
+        """Synchronous turn, for callers without an event loop (the Streamlit app)."""
+        session = self._session(session_id)
+        with session.turn_lock:
+            yield from session.chatbot.stream_user_input(user_input)
+            session.last_active = time.monotonic()
+
+    async def astream(self, session_id: str, user_input: str) -> AsyncIterator[str]:
+        """Yields the reply to `user_input` in pieces, as RestaurantChatbot.astream_user_input does."""
+        session = await asyncio.to_thread(self._session, session_id)
+        async with session.lock:
+            # A synchronous turn of the same session holds turn_lock in a thread; wait without blocking the loop
+            while not session.turn_lock.acquire(blocking=False):
+                await asyncio.sleep(TURN_POLL_SECONDS)
+            try:
+                async for chunk in session.chatbot.astream_user_input(user_input):
+                    yield chunk
+                session.last_active = time.monotonic()
+            finally:
+                session.turn_lock.release()
+
+    async def achat(self, session_id: str, user_input: str) -> str:
+        return "".join([chunk async for chunk in self.astream(session_id, user_input)])
+
+    async def history(self, session_id: str, limit: int = PAGE_SIZE,
+                      before_id: Optional[int] = None) -> List[Tuple]:
+        """(id, role, content, created_at) of up to `limit` messages, oldest first, ending before `before_id`."""
+        return await asyncio.to_thread(self.db.get_turns, session_id, limit, before_id)
+
+    def metrics(self) -> Dict[str, float]:
+        metrics = {"sessions": len(self._sessions)}
+        metrics.update(self.prompt_builder.metrics())
+        return metrics
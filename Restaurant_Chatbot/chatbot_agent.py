@@ -1,118 +1,194 @@
-import os
 import json
+import asyncio
 import random
 import datetime
 import re
+from typing import AsyncIterator, Iterator, List
 
-from langchain.chains import LLMChain
-from langchain_core.prompts import (
-    ChatPromptTemplate,
-    HumanMessagePromptTemplate,
-    MessagesPlaceholder,
-)
-from langchain_core.messages import SystemMessage
-from langchain.chains.conversation.memory import ConversationBufferWindowMemory
-from langchain_groq import ChatGroq
-
-from database import RestaurantDatabase
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+
+from conversation_store import ConversationStore, new_session_id
+from customers import GUEST_NAME, CustomerIdentity
+from orders import SessionOrder
+from response_cache import is_self_contained
+from table_assignment import table_label
 from utils import analyze_intent, extract_reservation_details, extract_order_items, validate_phone_number, \
     validate_email
 
+# Returned by _route_user_input when the turn should be answered by the LLM (streamed by the caller)
+_LLM_FALLBACK = object()
 
-class RestaurantChatbot:
-    def __init__(self, session_state):
-        self.db = RestaurantDatabase()
-        self.groq_api_key = os.environ.get('GROQ_API_KEY')
-        if not self.groq_api_key:
-            raise ValueError("GROQ_API_KEY environment variable is required")
 
-        self.model = 'llama3-8b-8192'
-        self.groq_chat = ChatGroq(groq_api_key=self.groq_api_key, model_name=self.model,
-                                  temperature=0.2)  # Set temperature to 0.2
+class _ReservationNotCreated(Exception):
+    """Rolls back the table moves made for a reservation whose insert failed."""
+
+
+SYSTEM_PROMPT = """You are a friendly and helpful restaurant chatbot for The Culinary Hub.
+You help customers who may be:
+1. At home inquiring about the restaurant and wanting to make reservations
+2. In the restaurant wanting to place orders
+
+Your capabilities include:
+- Greeting and welcoming customers.
+- **Retrieving and explaining menu items**.
+- **Providing information about current offers and deals**. Note: Happy hour is from 4 PM to 6 PM.
+- **Filtering menu items** based on criteria (e.g., "vegetarian options", "dishes under $15").
+- **Taking food orders**: Collect items and quantities.
+- **Modifying existing orders**: Update quantity, remove items, or cancel full order (within 2 minutes of placement).
+- **Making table reservations**: Collect date, time, party size, and customer contact information (phone is required, email is optional).
+- **Modifying reservations**: Change date, time, party size, or cancel reservation (at least 2 hours prior to reservation time).
+- **Providing restaurant information**: Address, phone number, opening hours.
+- **Collecting customer feedback and ratings**.
+
+**Important Instructions for Data Retrieval:**
+You DO NOT have the menu, offers, or restaurant information hardcoded. When facts from the restaurant database are listed below, answer from them and do not invent other dishes, prices or times. For example, instead of listing the menu directly, say "Here is our current menu:" and then list it as retrieved from the database.
+
+**When asked about menu, offers, or restaurant information that is not listed below, assume you have a way to look it up.**
 
-        # Streamlit's session_state is passed directly and will hold all conversational state
+**Current User Session Information:**
+- Always ensure you collect the user's name and phone number (required for orders/reservations). Email is optional. If not known, ask for them before proceeding with tasks.
+- If a customer_id is set in the session, you can assume you are interacting with that customer.
+- If the user asks about topics unrelated to the restaurant (e.g., politics, news, personal questions), politely state that you can only assist with inquiries related to The Culinary Hub's menu, offers, orders, and reservations. Do not engage in off-topic conversations. Keep your responses concise and directly address the user's intent.
+"""
+
+
+class RestaurantChatbot:
+    """One chat session: the conversation state machine over that session's state.
+
+    The database, menu catalog, table planner, LLM and prompt builder belong to a ChatEngine and
+    are shared by every session on it; a chatbot only adds the session's customer and
+    conversation store. Created without an engine (as the Streamlit app did), it starts its own.
+    """
+
+    def __init__(self, session_state, llm: BaseChatModel | None = None, engine=None):
+        if engine is None:
+            # Imported here because chat_engine depends on this module
+            from chat_engine import ChatEngine
+            engine = ChatEngine(llm)
+        self.engine = engine
+        self.db = engine.db
+        # Menu and offers are served from a process-wide in-memory catalog
+        self.catalog = engine.catalog
+        # Table availability with seating durations and opening hours, one query per day
+        self.availability = engine.availability
+        self.table_planner = engine.table_planner
+        self.model = engine.model
+        self.temperature = engine.temperature
+        self.llm = engine.llm
+        # Compacted system prompt plus, per call, the facts the question needs and the history that fits
+        self.prompt_builder = engine.prompt_builder
+        self.system_prompt = engine.system_prompt
+        # Answers to off-script questions, shared by every session on the same model and prompt
+        self.response_cache = engine.response_cache
+        self.last_prompt_stats = None  # Token counts of the latest LLM prompt
+
+        # All conversational state lives in session_state: Streamlit's, or a chat_engine.SessionState
         self.session_state = session_state
+        # Contact details live in session state; the customers row is created on the first order or booking
+        self.customer = CustomerIdentity(self.db, session_state)
 
-        self.system_prompt = """You are a friendly and helpful restaurant chatbot for The Culinary Hub.
-        You help customers who may be:
-        1. At home inquiring about the restaurant and wanting to make reservations
-        2. In the restaurant wanting to place orders
-
-        Your capabilities include:
-        - Greeting and welcoming customers.
-        - **Retrieving and explaining menu items**.
-        - **Providing information about current offers and deals**. Note: Happy hour is from 4 PM to 6 PM.
-        - **Filtering menu items** based on criteria (e.g., "vegetarian options", "dishes under $15").
-        - **Taking food orders**: Collect items and quantities.
-        - **Modifying existing orders**: Update quantity, remove items, or cancel full order (within 2 minutes of placement).
-        - **Making table reservations**: Collect date, time, party size, and customer contact information (phone is required, email is optional).
-        - **Modifying reservations**: Change date, time, party size, or cancel reservation (at least 2 hours prior to reservation time).
-        - **Providing restaurant information**: Address, phone number, opening hours.
-        - **Collecting customer feedback and ratings**.
-
-        **Important Instructions for Data Retrieval:**
-        You DO NOT have the menu, offers, or restaurant information hardcoded. Your responses should reflect that you are querying a database or using a tool to get this information. For example, instead of listing the menu directly, say "Here is our current menu:" and then list it as retrieved from the database.
-
-        **When asked about menu, offers, or restaurant information, assume you have a way to look it up.**
-
-        **Current User Session Information:**
-        - Always ensure you collect the user's name and phone number (required for orders/reservations). Email is optional. If not known, ask for them before proceeding with tasks.
-        - If a customer_id is set in the session, you can assume you are interacting with that customer.
-        - If the user asks about topics unrelated to the restaurant (e.g., politics, news, personal questions), politely state that you can only assist with inquiries related to The Culinary Hub's menu, offers, orders, and reservations. Do not engage in off-topic conversations. Keep your responses concise and directly address the user's intent.
-        """
-
-        self.prompt = ChatPromptTemplate.from_messages(
-            [
-                SystemMessage(content=self.system_prompt),
-                MessagesPlaceholder(variable_name="chat_history"),
-                HumanMessagePromptTemplate.from_template("{input}"),
-            ]
-        )
-
-        # Memory should also be part of session state if you want it to persist across full Streamlit reruns
-        # However, ConversationBufferWindowMemory manages its own internal buffer which is typically fine
-        # for single turn processing within the same chatbot instance. If the chatbot instance
-        # itself is recreated, this memory resets.
-        # For full persistence, you'd save/load chat_history from st.session_state.
-        self.memory = ConversationBufferWindowMemory(k=5, memory_key="chat_history", return_messages=True)
-        self.conversation = LLMChain(llm=self.groq_chat, prompt=self.prompt, memory=self.memory)
+        # Every exchange is saved to SQLite under the session id; the LLM sees the last five from memory
+        if not session_state.get("session_id"):
+            session_state.session_id = new_session_id()
+        self.conversation = ConversationStore(self.db, session_state.session_id)
 
     def process_user_input(self, user_input: str) -> str:
-        # 1. Initialize customer_id and populate basic customer details from DB if not already in session
-        if self.session_state.customer_id is None:
-            self.session_state.customer_id = self.db.add_customer(name="Guest Customer", phone=None, email=None)
-            if self.session_state.customer_id is None:
-                return "I apologize, but I'm having trouble initializing your session. Please try again later."
-
-        # Always attempt to load customer details from DB into session state on each turn
-        # This ensures consistency if the DB is updated directly or across different sessions (though session_state is per user browser session)
-        customer_details = self.db.get_customer_details(self.session_state.customer_id)
-        if customer_details:
-            # Update session_state with latest customer info from DB
-            self.session_state.customer_name = customer_details[1]
-            self.session_state.customer_phone = customer_details[2]
-            self.session_state.customer_email = customer_details[3]
+        return "".join(self.stream_user_input(user_input))
+
+    def stream_user_input(self, user_input: str) -> Iterator[str]:
+        """Yields the reply in pieces: database-backed replies arrive whole, LLM replies token by token."""
+        response = self._route_user_input(user_input)
+        if response is not _LLM_FALLBACK:
+            self.conversation.append(user_input, response)
+            yield response
+            return
+        shareable = self._shareable(user_input)
+        version = self.catalog.version
+        cached = self.response_cache.get(user_input, version) if shareable else None
+        if cached is not None:
+            self.conversation.append(user_input, cached)
+            yield cached
+            return
+        chunks = []
+        for chunk in self.llm.stream(self._llm_messages(user_input, shareable)):
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        self._finish_llm_reply(user_input, "".join(chunks), shareable, version)
+
+    async def astream_user_input(self, user_input: str) -> AsyncIterator[str]:
+        """Async variant of stream_user_input; the SQLite work runs in a worker thread."""
+        response = await asyncio.to_thread(self._route_user_input, user_input)
+        if response is not _LLM_FALLBACK:
+            await asyncio.to_thread(self.conversation.append, user_input, response)
+            yield response
+            return
+        shareable = self._shareable(user_input)
+        version = self.catalog.version
+        cached = self.response_cache.get(user_input, version) if shareable else None
+        if cached is not None:
+            await asyncio.to_thread(self.conversation.append, user_input, cached)
+            yield cached
+            return
+        chunks = []
+        async for chunk in self.llm.astream(self._llm_messages(user_input, shareable)):
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        await asyncio.to_thread(self._finish_llm_reply, user_input, "".join(chunks), shareable, version)
+
+    def _shareable(self, user_input: str) -> bool:
+        # The cache is shared by every session, so only questions that stand on their own go through it;
+        # _llm_messages answers those without the session's earlier turns
+        return is_self_contained(user_input)
+
+    def _finish_llm_reply(self, user_input: str, reply: str, shareable: bool, version: int):
+        # Save the exchange once the stream is complete
+        self.conversation.append(user_input, reply)
+        if shareable and not self._mentions_contact_details(reply):
+            self.response_cache.put(user_input, reply, version)
+
+    def _mentions_contact_details(self, reply: str) -> bool:
+        # Replies that echo the customer's name, phone or email are not reusable for other customers
+        lowered = reply.lower()
+        name = self.session_state.customer_name
+        email = self.session_state.customer_email
+        phone_digits = re.sub(r"\D", "", self.session_state.customer_phone or "")
+        return bool((name and name.lower() in lowered) or (email and email.lower() in lowered)
+                    or (len(phone_digits) >= 7 and phone_digits[-7:] in re.sub(r"\D", "", reply)))
+
+    def _llm_messages(self, user_input: str, shareable: bool) -> List[BaseMessage]:
+        # The window holds earlier exchanges only; the builder appends the current message. An answer
+        # that goes into the shared cache must not depend on this customer's conversation.
+        window = () if shareable else self.conversation.window
+        messages, self.last_prompt_stats = self.prompt_builder.build(user_input, window)
+        return messages
+
+    def _route_user_input(self, user_input: str):
+        """Runs the conversation state machine; returns the reply, or _LLM_FALLBACK for the LLM to answer."""
+        # Pick up menu changes once per turn; every menu lookup below is served from memory
+        self.catalog.refresh()
+
+        # 1. Customer details come from session state (see CustomerIdentity), so no customer query here
 
         # 2. Analyze User Intent
         # Pass relevant session state data to analyze_intent if it needs context
         intent = analyze_intent(user_input, self.session_state)
 
-        # Add current user prompt to memory before processing
-        self.memory.chat_memory.add_user_message(user_input)
-
         response = ""
 
         # --- State-based Conversation Flow ---
 
         # Handles name collection
         if self.session_state.conversation_state == "AWAITING_USER_NAME":
-            return self._process_name_input(user_input, self.session_state.customer_id)
+            return self._process_name_input(user_input)
         # Handles phone collection
         elif self.session_state.conversation_state == "AWAITING_USER_PHONE":
-            return self._process_phone_input(user_input, self.session_state.customer_id)
+            return self._process_phone_input(user_input)
         # Handles email collection
         elif self.session_state.conversation_state == "AWAITING_USER_EMAIL":
-            return self._process_email_input(user_input, self.session_state.customer_id)
+            return self._process_email_input(user_input)
         # Handles reservation confirmation
         elif self.session_state.conversation_state == "AWAITING_RESERVATION_CONFIRMATION":
             if intent == "confirm_reservation":
@@ -124,6 +200,10 @@ class RestaurantChatbot:
                 return "Okay, I've cancelled the reservation confirmation process. Is there anything else I can help you with?"
             else:
                 return "I'm currently waiting for you to confirm or cancel the reservation. Please say 'yes' or 'confirm' to book, or 'no' or 'cancel' to disregard."
+        # Follow-up details (a time from the suggested slots, a date, a party size) for a pending reservation
+        elif self.session_state.conversation_state == "AWAITING_RESERVATION_DETAILS" and any(
+                value is not None for value in extract_reservation_details(user_input).values()):
+            return self.make_reservation_flow(user_input)
         # Handles order confirmation
         elif self.session_state.conversation_state == "AWAITING_ORDER_CONFIRMATION":
             if intent == "confirm_order":
@@ -131,15 +211,18 @@ class RestaurantChatbot:
             elif intent == "cancel_order":
                 self.session_state.awaiting_order_confirmation = False
                 self.session_state.current_order_id = None
-                self.session_state.current_order_items = []
+                self.session_state.current_order = None
                 self.session_state.conversation_state = "READY_FOR_TASK"
                 return "Okay, I've cancelled the order confirmation process. Is there anything else I can help you with?"
+            elif intent == "place_order":
+                # More lines for the pending order, as the summary invites
+                return self.place_order_flow(user_input)
             else:
                 return "I'm currently waiting for you to confirm or modify your order. Please say 'confirm' to finalize, or specify what you'd like to add/remove."
 
         # Initial greeting or after a task
         if self.session_state.conversation_state == "INITIAL" or self.session_state.conversation_state == "READY_FOR_TASK":
-            if self.session_state.customer_name is None or self.session_state.customer_name == "Guest Customer":
+            if self.session_state.customer_name is None or self.session_state.customer_name == GUEST_NAME:
                 self.session_state.conversation_state = "AWAITING_USER_NAME"
                 return "Hello! Welcome to The Culinary Hub. Before we proceed, could I please get your name?"
             elif self.session_state.customer_phone is None:
@@ -199,25 +282,21 @@ class RestaurantChatbot:
                 self.session_state.conversation_state = "CONCLUDING"
                 response = "Thank you for visiting The Culinary Hub! Have a wonderful day! 👋"
             else:  # General query or unhandled intent, let LLM decide
-                llm_response = self.conversation.predict(input=user_input)
-                response = llm_response
+                return _LLM_FALLBACK
         else:
             # Fallback for unexpected states
             response = "I'm sorry, I'm currently expecting some specific information from you or I'm in an unexpected state. Could you please clarify your request, or state 'start over' to reset?"
 
-        # Add chatbot's response to memory
-        self.memory.chat_memory.add_ai_message(response)
         return response
 
     # Helper methods for processing contact info inputs
-    def _process_name_input(self, user_input: str, customer_id: int) -> str:
+    def _process_name_input(self, user_input: str) -> str:
         name = user_input.strip()
         user_input_lower = name.lower()
 
         if "no thanks" in user_input_lower or "skip" in user_input_lower or "n/a" in user_input_lower:
             # If they don't give a name, keep them as "Guest Customer" and move to phone
-            # We already set them as Guest Customer on init, so no update needed unless they gave a name
-            self.session_state.customer_name = "Guest Customer"
+            self.session_state.customer_name = GUEST_NAME
             self.session_state.conversation_state = "AWAITING_USER_PHONE"
             return "No problem. Let's proceed. Could I please get your phone number? This is required for orders and reservations."
 
@@ -225,14 +304,13 @@ class RestaurantChatbot:
         if len(name) < 2 or re.fullmatch(r'\d+', name):
             return "That doesn't seem like a valid name. Could you please provide your name, or say 'no thanks' to skip?"
 
-        if self.db.update_customer(customer_id, name=name):
-            self.session_state.customer_name = name
+        if self.customer.update(name=name):
             self.session_state.conversation_state = "AWAITING_USER_PHONE"  # Next state
             return f"Thank you, {name}! Now, to assist you better, could I please get your phone number? This is required for orders and reservations."
         else:
             return "There was an error saving your name. Could you please try again?"
 
-    def _process_phone_input(self, user_input: str, customer_id: int) -> str:
+    def _process_phone_input(self, user_input: str) -> str:
         user_input_lower = user_input.lower()
         if "no" in user_input_lower and (
                 "thanks" in user_input_lower or "thank you" in user_input_lower or "skip" in user_input_lower):
@@ -242,8 +320,7 @@ class RestaurantChatbot:
         else:
             collected_phone = validate_phone_number(user_input)
             if collected_phone:
-                if self.db.update_customer(customer_id, phone=collected_phone):
-                    self.session_state.customer_phone = collected_phone  # Update session state
+                if self.customer.update(phone=collected_phone):
                     response = f"Thank you, I've noted your phone number: {collected_phone}."
 
                     # Transition to email collection state
@@ -257,11 +334,11 @@ class RestaurantChatbot:
                 self.session_state.conversation_state = "AWAITING_USER_PHONE"  # Stay in this state
                 return "That doesn't look like a valid phone number. Could you please try again (e.g., 123-456-7890), or say 'no thanks' to skip?"
 
-    def _process_email_input(self, user_input: str, customer_id: int) -> str:
+    def _process_email_input(self, user_input: str) -> str:
         user_input_lower = user_input.lower()
         if "no" in user_input_lower and (
                 "thanks" in user_input_lower or "thank you" in user_input_lower or "skip" in user_input_lower):
-            self.session_state.customer_email = None  # Explicitly set to None if refused
+            self.session_state.customer_email = ""  # Declined: "" (unlike None) stops the greeting asking again
             self.session_state.conversation_state = "READY_FOR_TASK"  # Move to ready for tasks
             # If there was a pending intent (like place_order or make_reservation) after collecting contact info,
             # activate it
@@ -279,8 +356,7 @@ class RestaurantChatbot:
             collected_email = validate_email(user_input)
             if collected_email:
                 try:
-                    if self.db.update_customer(customer_id, email=collected_email):
-                        self.session_state.customer_email = collected_email  # Update session state
+                    if self.customer.update(email=collected_email):
                         response = f"Thank you, I've noted your email: {collected_email}."
                         self.session_state.conversation_state = "READY_FOR_TASK"  # Move to ready for tasks
                         # If there was a pending intent (like place_order or make_reservation) after collecting
@@ -307,37 +383,46 @@ class RestaurantChatbot:
                 return ("That doesn't look like a valid email. Could you please try again (e.g., example@domain.com), "
                         "or say 'no thanks' to skip?")
 
+    def _customer_clash_reply(self, pending_intent: str) -> str:
+        # add_customer refused the cached details: the phone or email is registered to someone else.
+        # Collect them again, then pick the order or reservation back up.
+        self.session_state.customer_phone = None
+        self.session_state.customer_email = None
+        self.session_state.current_intent_after_contact = pending_intent
+        self.session_state.conversation_state = "AWAITING_USER_PHONE"
+        return ("That phone number or email is already registered to another customer. Could you please give "
+                "me a different phone number?")
+
     def show_menu(self, user_input: str) -> str:
-        # LLM will decide if it needs to filter or show all
-        # For now, we'll assume it means all, or extract category
-        menu_items = self.db.get_all_menu_items()
-        if menu_items:
-            response = "Here is our current menu:\n"
-            categories = {}
-            for item in menu_items:
-                name, description, price, category = item[1], item[2], item[4], item[
-                    3]  # Adjusted indexing based on database.py's get_all_menu_items
-                if category not in categories:
-                    categories[category] = []
-                categories[category].append(f"- {name}: ${price:.2f} - {description}")
-
-            for category, items in categories.items():
-                response += f"\n**{category.upper()}**\n" + "\n".join(items)
-            return response
+        # Rendered once per catalog version; a category named in the request shows just that section
+        rendered = self.catalog.rendered()
+        user_input_lower = user_input.lower()
+        for category in rendered.category_blocks:
+            if category and re.search(rf"\b{re.escape(category)}\b", user_input_lower):
+                return rendered.category(category)
+        if rendered.menu:
+            return rendered.menu
         else:
             return "I apologize, the menu is not currently available. Please check back later."
 
     def describe_menu_item(self, user_input: str) -> str:
         # This will be more robust with LLM's entity extraction in a tool call
-        menu_items = self.db.get_all_menu_items()
+        menu_items = self.catalog.all_items()
         item_name_to_find = None
         for item_id, item_name_db, _, _, _, _, _, _ in menu_items:  # Adjusted for full menu item details
             if item_name_db.lower() in user_input.lower():
                 item_name_to_find = item_name_db
                 break
 
+        if item_name_to_find is None:
+            # Fall back to fuzzy search so misspelt names ("chiken alfredo") still resolve
+            query = re.sub(r"\b(describe|tell me about|what is|what's|the|a|an)\b", " ", user_input.lower())
+            matches = self.catalog.search(query, limit=1, min_score=0.5)
+            if matches:
+                item_name_to_find = matches[0][1][1]
+
         if item_name_to_find:
-            item = self.db.get_menu_item_by_name(item_name_to_find)
+            item = self.catalog.get_by_name(item_name_to_find)
             if item:
                 _, name, description, category, price, ingredients, nutrition, how_its_made = item
                 response = f"**{name}** ({category}): ${price:.2f}\n" \
@@ -366,44 +451,16 @@ class RestaurantChatbot:
         if price_match:
             criteria['max_price'] = float(price_match.group(1))
 
-        filtered_items = self.db.get_filtered_menu(criteria)  # Make sure get_filtered_menu handles these
-        if filtered_items:
-            response = "Here are some menu items matching your criteria:\n"
-            for item in filtered_items:
-                name, description, price, category = item[1], item[2], item[4], item[3]  # Adjusted indexing
-                response += f"- {name} ({category}): ${price:.2f} - {description}\n"
+        response = self.catalog.rendered().filtered(criteria)
+        if response:
             return response
         else:
             return "I couldn't find any menu items matching your criteria. Please try different filters."
 
     def show_offers(self) -> str:
-        offers = self.db.get_offers()
-        if offers:
-            response = "Here are our current offers:\n"
-            for offer in offers:
-                name, description, discount, valid_from, valid_to, is_happy_hour = offer
-                offer_text = f"- **{name}**: {description}"
-                if discount > 0:
-                    offer_text += f" ({int(discount * 100)}% off)"
-
-                # Check happy hour validity based on current time
-                current_time = datetime.datetime.now().time()
-                try:
-                    # Convert valid_from and valid_to from string "HH:MM" to time objects
-                    from_time = datetime.datetime.strptime(valid_from, "%H:%M").time()
-                    to_time = datetime.datetime.strptime(valid_to, "%H:%M").time()
-
-                    if is_happy_hour and from_time <= current_time <= to_time:
-                        offer_text += " (Currently ON for Happy Hour! 🥳)"
-                    elif is_happy_hour:
-                        offer_text += f" (Happy Hour from {valid_from} to {valid_to})"
-                    else:  # Non-happy hour offers, show valid times if not all day
-                        if valid_from != "00:00" or valid_to != "23:59":
-                            offer_text += f" (Valid from {valid_from} to {valid_to})"
-
-                except ValueError:
-                    offer_text += " (Times unavailable)"  # Handle parsing errors
-                response += offer_text + "\n"
+        # Offer lines are pre-rendered; only the happy-hour status depends on the current time
+        response = self.catalog.rendered().offers()
+        if response:
             return response
         else:
             return "We currently don't have any special offers. Please check back soon!"
@@ -428,51 +485,64 @@ class RestaurantChatbot:
 
     def place_order_flow(self, user_input: str) -> str:
         # Use session_state for current order tracking
-        menu_items_db = self.db.get_all_menu_items()  # Get current menu items from DB
-        order_items_extracted = extract_order_items(user_input, menu_items_db)
+        # Menu names are matched against the catalog's trie, built once per menu version
+        order_items_extracted = extract_order_items(user_input, self.catalog.name_trie())
 
         # If no items detected, ask user for clarity
         if not order_items_extracted and user_input != "initiate order":  # Allow "initiate order" to start the flow
             return "I couldn't understand which items you'd like to order. Could you please specify the item names and quantities?"
 
+        # An item named in part after unrecognised words ("chiken alfredo") gets asked about, not a guessed quantity
+        unclear = [item_name for item_name, quantity in order_items_extracted if quantity is None]
+        order_items_extracted = [(item_name, quantity) for item_name, quantity in order_items_extracted
+                                 if quantity is not None]
+        if unclear and not order_items_extracted:
+            return f"Just to be sure, how many {' and how many '.join(unclear)} would you like?"
+
         # Proceed with order creation or adding to existing order
         if self.session_state.current_order_id is None:
-            self.session_state.current_order_id = self.db.create_order(self.session_state.customer_id)
+            # First persistent action of the session: the customers row is created here if needed
+            customer_id = self.customer.ensure()
+            if customer_id is None:
+                return self._customer_clash_reply("place_order")
+            self.session_state.current_order_id = self.db.create_order(customer_id)
             if self.session_state.current_order_id is None:
                 return "I apologize, I couldn't start a new order. Please try again later."
-            self.session_state.current_order_items = []  # Initialize for a new order
+            # In-session copy of the order, kept in step with order_items
+            self.session_state.current_order = SessionOrder(self.session_state.current_order_id)
+        order = self.session_state.current_order
 
-        # Add items to the order
+        # Resolve every name from the in-memory catalog, then write all lines in one statement and commit
         items_added_count = 0
         response_messages = []
+        resolved = []
+        if unclear:
+            response_messages.append(f"How many {' and how many '.join(unclear)} would you like? I've left "
+                                     f"{'them' if len(unclear) > 1 else 'it'} out for now.")
         for item_name, quantity in order_items_extracted:
-            menu_item_details = self.db.get_menu_item_by_name(item_name)
+            menu_item_details = self.catalog.resolve(item_name)
             if menu_item_details:
-                menu_item_id = menu_item_details[0]
-                price_at_order = menu_item_details[4]  # Use price from DB at time of order
-                if self.db.add_order_item(self.session_state.current_order_id, menu_item_id, quantity, price_at_order):
-                    items_added_count += 1
-                else:
-                    response_messages.append(f"There was an issue adding '{item_name}' to your order.")
+                resolved.append((menu_item_details, quantity))
             else:
                 response_messages.append(
                     f"I couldn't find '{item_name}' on the menu. Please check the spelling or ask to see the menu.")
+        if resolved:
+            # Use price from DB at time of order
+            lines = [(details[0], quantity, details[4]) for details, quantity in resolved]
+            if self.db.add_order_items(self.session_state.current_order_id, lines):
+                for details, quantity in resolved:
+                    order.add(details[0], details[1], quantity, details[4])
+                items_added_count = len(resolved)
+            else:
+                response_messages.append("There was an issue adding those items to your order.")
 
         if items_added_count == 0 and not response_messages and user_input != "initiate order":
             return "I couldn't add any items to your order. Please specify items from the menu clearly."
         elif items_added_count == 0 and user_input == "initiate order":
             return "What items would you like to order today? Please tell me the item name and quantity."
 
-        # Display current order items and ask for confirmation
-        current_order_summary = ""
-        total_amount = 0
-        order_items_to_display = self.db.get_order_items(self.session_state.current_order_id)
-        if order_items_to_display:
-            current_order_summary = "Your current order:\n"
-            for _, name, qty, price in order_items_to_display:
-                current_order_summary += f"- {qty}x {name} (${qty * price:.2f})\n"
-                total_amount += qty * price
-            current_order_summary += f"Total: ${total_amount:.2f}\n"
+        # Display current order items and ask for confirmation, straight from the session copy
+        current_order_summary = order.summary()
 
         final_response = ""
         if response_messages:
@@ -486,9 +556,9 @@ class RestaurantChatbot:
     def confirm_order_final(self, user_input: str) -> str:
         if self.session_state.awaiting_order_confirmation and self.session_state.current_order_id:
             self.db.update_order_status(self.session_state.current_order_id, 'confirmed')
-            order_details = self.db.get_order_details(self.session_state.current_order_id)
+            order_total = self.session_state.current_order.total
 
-            confirmation_message = f"Great {self.session_state.customer_name}! Your order #{self.session_state.current_order_id} has been confirmed for a total of ${order_details['total_amount']:.2f}."
+            confirmation_message = f"Great {self.session_state.customer_name}! Your order #{self.session_state.current_order_id} has been confirmed for a total of ${order_total:.2f}."
 
             contact_info_provided = False
             if self.session_state.customer_phone:
@@ -505,7 +575,7 @@ class RestaurantChatbot:
 
             # Clear order-related session state variables
             self.session_state.current_order_id = None
-            self.session_state.current_order_items = []
+            self.session_state.current_order = None
             self.session_state.awaiting_order_confirmation = False
             self.session_state.conversation_state = "READY_FOR_TASK"  # Back to general tasks
             return confirmation_message
@@ -542,6 +612,17 @@ class RestaurantChatbot:
             self.session_state.conversation_state = "AWAITING_RESERVATION_DETAILS"  # Could add this specific state if needed
             return "I can help you with a reservation! Please tell me the date, time, and how many people will be in your party."
 
+        # Date and party size but no time yet: offer the times that are still free that day
+        if reservation_date_str and party_size and not reservation_time_str:
+            free_slots = self.availability.free_slots(party_size, reservation_date_str, after=self._now_if_today(
+                reservation_date_str))
+            self.session_state.conversation_state = "AWAITING_RESERVATION_DETAILS"
+            if free_slots:
+                return (f"For {party_size} people on {reservation_date_str} we have tables at "
+                        f"{', '.join(free_slots[:8])}. What time would you like?")
+            return (f"I'm sorry, we're fully booked for {party_size} people on {reservation_date_str}. "
+                    f"Would another date work for you?")
+
         # If details are still missing after attempting extraction
         if not (reservation_date_str and reservation_time_str and party_size):
             missing_info = []
@@ -553,26 +634,16 @@ class RestaurantChatbot:
             return f"I need a bit more information for your reservation. Could you please provide the {', '.join(missing_info)}?"
 
         # If all details are extracted, proceed
-        # Check for available tables
-        available_tables = self.db.get_available_tables(party_size, reservation_date_str, reservation_time_str)
-
-        if available_tables:
-            # For simplicity, pick the first available table that fits
-            table_number = available_tables[0][0]
-            table_capacity = available_tables[0][1]
-            # Fetch table_id from table_number for the create_reservation call
-            table_id_result = self.db.cursor.execute("SELECT id FROM restaurant_tables WHERE table_number = ?",
-                                                     (table_number,)).fetchone()
-            table_id = table_id_result[0] if table_id_result else None
-
-            if table_id is None:
-                self.session_state.reservation_details = None  # Clear any partial details
-                self.session_state.conversation_state = "READY_FOR_TASK"
-                return "An internal error occurred while finding the table ID. Please try again or contact staff directly."
+        # Seat the party on the best-fitting table or tables, moving other bookings if that frees one
+        placement = self.table_planner.place(party_size, reservation_date_str, reservation_time_str)
+
+        if placement:
+            tables, _ = placement
+            table_number = table_label(tables)
+            table_capacity = sum(table[2] for table in tables)
 
             self.session_state.reservation_details.update({  # Update existing dict
-                "customer_id": self.session_state.customer_id,
-                "table_id": table_id,
+                "table_id": tables[0][0],
                 "reservation_date": reservation_date_str,
                 "reservation_time": reservation_time_str,
                 "party_size": party_size,
@@ -587,26 +658,64 @@ class RestaurantChatbot:
             self.session_state.conversation_state = "AWAITING_RESERVATION_CONFIRMATION"
             return response
         else:
+            # Suggest nearby times (within an hour) before giving up on the date
+            alternatives = self.availability.alternatives(party_size, reservation_date_str, reservation_time_str)
+            if alternatives:
+                # Keep date and party size so the customer only needs to pick a time
+                self.session_state.reservation_details.pop("time", None)
+                self.session_state.conversation_state = "AWAITING_RESERVATION_DETAILS"
+                return (f"I'm sorry, we don't have a table for {party_size} people on {reservation_date_str} at "
+                        f"{reservation_time_str}. We do have tables at {', '.join(alternatives[:4])}. "
+                        f"Would one of those work?")
+            earliest = self.availability.earliest_slot(party_size, reservation_date_str, after=reservation_time_str)
             self.session_state.reservation_details = None  # Clear any partial details
             self.session_state.conversation_state = "READY_FOR_TASK"  # Back to general tasks
+            if earliest:
+                return (f"I apologize, but we don't have any tables available for {party_size} people on "
+                        f"{reservation_date_str} around {reservation_time_str}. The next free table is on "
+                        f"{earliest[0]} at {earliest[1]}. Would you like to book that instead?")
             return f"I apologize, but we don't have any tables available for {party_size} people on {reservation_date_str} at {reservation_time_str}. Please try a different time or date."
 
+    @staticmethod
+    def _now_if_today(date_str: str) -> str | None:
+        now = datetime.datetime.now()
+        return now.strftime("%H:%M") if date_str == now.date().isoformat() else None
+
     def confirm_reservation_final(self, user_input: str) -> str:
         if self.session_state.awaiting_reservation_confirmation and self.session_state.reservation_details:
             details = self.session_state.reservation_details
-            booking_id = self.db.create_reservation(
-                details["customer_id"],
-                details["table_id"],
-                details["reservation_date"],
-                details["reservation_time"],
-                details["party_size"]
-            )
+            booking_id = None
+            details["customer_id"] = self.customer.ensure()
+            if details["customer_id"] is None:
+                self.session_state.awaiting_reservation_confirmation = False
+                return self._customer_clash_reply("make_reservation")
+            # Plan again under the write lock: tables may have been taken while the customer decided
+            try:
+                with self.db.transaction():
+                    placement = self.table_planner.place(details["party_size"], details["reservation_date"],
+                                                         details["reservation_time"])
+                    if placement and self.table_planner.apply(placement[1]):
+                        tables = placement[0]
+                        details["table_number"] = table_label(tables)
+                        booking_id = self.db.create_reservation(
+                            details["customer_id"],
+                            tables[0][0],
+                            details["reservation_date"],
+                            details["reservation_time"],
+                            details["party_size"],
+                            extra_table_ids=[table[0] for table in tables[1:]]
+                        )
+                        if booking_id is None:
+                            # Other bookings were moved to make room for this one; put them back
+                            raise _ReservationNotCreated()
+            except _ReservationNotCreated:
+                booking_id = None
 
             if booking_id:
                 confirmation_message = (
                     f"Great {self.session_state.customer_name}! Your reservation #{booking_id} for {details['party_size']} people "
                     f"on {details['reservation_date']} at {details['reservation_time']} "
-                    f"at Table {details['table_number']} has been confirmed."
+                    f"at {details['table_number']} has been confirmed."
                 )
                 contact_info_provided = False
                 if self.session_state.customer_phone:
@@ -0,0 +1,43 @@
+import uuid
+from collections import deque
+from typing import List, Optional, Tuple
+
+WINDOW_TURNS = 5  # Exchanges the LLM sees, as ConversationBufferWindowMemory(k=5) did
+PAGE_SIZE = 20  # Messages per page of history in the UI
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+class ConversationStore:
+    """One chat session's transcript: every message in SQLite, the last few in memory.
+
+    Messages are appended to conversation_turns and never rewritten, so a session picks up where it
+    left off after a restart. The LLM window is a ring buffer of the last `window_turns` exchanges
+    (loaded from the table on start), and older history is read a page at a time, so the memory a
+    session holds stays the same however long the conversation runs.
+    """
+
+    def __init__(self, db, session_id: str, window_turns: int = WINDOW_TURNS):
+        self.db = db
+        self.session_id = session_id
+        self.window: deque = deque(((role, content) for _, role, content, _ in
+                                    db.get_turns(session_id, 2 * window_turns)), maxlen=2 * window_turns)
+        self._count: Optional[int] = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.db.count_turns(self.session_id)
+        return self._count
+
+    def append(self, user_input: str, reply: str):
+        """Records one exchange: the customer's message and the bot's reply."""
+        turns = [("user", user_input), ("assistant", reply)]
+        if self.db.append_turns(self.session_id, turns) and self._count is not None:
+            self._count += len(turns)
+        self.window.extend(turns)
+
+    def recent(self, limit: int = PAGE_SIZE, before_id: Optional[int] = None) -> List[Tuple]:
+        """(id, role, content, created_at) of up to `limit` messages, oldest first, ending before `before_id`."""
+        return self.db.get_turns(self.session_id, limit, before_id)
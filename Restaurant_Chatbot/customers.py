@@ -0,0 +1,56 @@
+from typing import Optional
+
+GUEST_NAME = "Guest Customer"
+
+
+class CustomerIdentity:
+    """The session's customer, cached in session state and written to the database only when needed.
+
+    customer_name, customer_phone and customer_email in session state are the cache; nothing
+    re-reads them from the database on later turns. Until an order or reservation needs a
+    customers row (ensure()), details the customer gives stay in the session, so a visitor who
+    only browses the menu never touches the customers table. Once the row exists, update() writes
+    through to it before updating the cache.
+    """
+
+    def __init__(self, db, session_state):
+        self.db = db
+        self.session_state = session_state
+        # A session that starts with a known id (set by the host app) is loaded once
+        if self.session_state.customer_id is not None and self.session_state.customer_name is None:
+            row = self.db.get_customer_details(self.session_state.customer_id)
+            if row:
+                self._cache(row[1], row[2], row[3])
+
+    @property
+    def customer_id(self) -> Optional[int]:
+        return self.session_state.customer_id
+
+    def _cache(self, name, phone, email):
+        self.session_state.customer_name = name
+        self.session_state.customer_phone = phone
+        self.session_state.customer_email = email
+
+    def update(self, name=None, phone=None, email=None) -> bool:
+        """Records new contact details; False if the database refused them (e.g. a duplicate phone)."""
+        if self.customer_id is not None and not self.db.update_customer(self.customer_id, name=name, phone=phone,
+                                                                        email=email):
+            return False
+        if name is not None:
+            self.session_state.customer_name = name
+        if phone is not None:
+            self.session_state.customer_phone = phone
+        if email is not None:
+            self.session_state.customer_email = email
+        return True
+
+    def ensure(self) -> Optional[int]:
+        """The customers row id, creating the row from the cached details on first use.
+
+        Returns None when the row cannot be created, e.g. the phone belongs to someone else.
+        """
+        if self.customer_id is None:
+            self.session_state.customer_id = self.db.add_customer(
+                self.session_state.customer_name or GUEST_NAME, self.session_state.customer_phone or None,
+                self.session_state.customer_email or None)
+        return self.customer_id
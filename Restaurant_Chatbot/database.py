@@ -1,27 +1,349 @@
 import sqlite3
 import json
+import os
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime
 
 
+class StorageProfile:
+    """SQLite pragmas applied to every connection a pool opens."""
+
+    def __init__(self, journal_mode="WAL", synchronous="NORMAL", busy_timeout_ms=5000,
+                 mmap_size=256 * 1024 * 1024, cache_size=-64000):
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size  # Negative values are KiB, positive values are pages
+
+    def apply(self, conn):
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        # WAL is a property of the database file, so the first connection switches it for everyone
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+
+
+# WAL lets readers carry on while an order is being written, and synchronous=NORMAL only
+# fsyncs at checkpoints instead of on every commit.
+DEFAULT_STORAGE_PROFILE = StorageProfile()
+# SQLite's stock behaviour: rollback journal with an fsync per commit
+LEGACY_STORAGE_PROFILE = StorageProfile(journal_mode="DELETE", synchronous="FULL", mmap_size=0, cache_size=-2000)
+
+
+class _ThreadSlot:
+    """Per-thread handle on a pooled connection; handing it back happens when the thread ends."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.depth = 0  # Nesting level of transaction() blocks on this thread
+
+
+class ConnectionPool:
+    """Hands out one sqlite3 connection per thread for a single database file.
+
+    Connections of finished threads are parked and reused by the next thread, so short-lived
+    threads (Streamlit starts one per script run) do not open a new connection every time.
+    """
+
+    def __init__(self, db_name, max_idle=16, profile=None):
+        self.db_name = db_name
+        self.profile = profile or DEFAULT_STORAGE_PROFILE
+        self.max_idle = max_idle
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._idle = []
+        # Guards the one-off schema setup and seeding for this database file
+        self.init_lock = threading.Lock()
+        self.initialized = False
+        self._keepalive = None
+        if db_name == ":memory:":
+            # Plain :memory: would give every thread its own empty database, so share one named
+            # in-memory database instead and keep a connection open for the lifetime of the pool.
+            self._uri = f"file:restaurant_pool_{id(self)}?mode=memory&cache=shared"
+            self._keepalive = self._open()
+        else:
+            self._uri = None
+
+    def _open(self):
+        if self._uri:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        self.profile.apply(conn)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _release(self, conn):
+        # Called when the owning thread has gone away
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._lock:
+            if conn in self._connections and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _slot(self):
+        slot = getattr(self._local, "slot", None)
+        if slot is None:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._open()
+            slot = _ThreadSlot(conn)
+            weakref.finalize(slot, self._release, conn)
+            self._local.slot = slot
+        return slot
+
+    def connection(self):
+        return self._slot().conn
+
+    def cursor(self):
+        return self._slot().cursor
+
+    @contextmanager
+    def transaction(self):
+        """Runs the enclosed statements in one transaction on the calling thread's connection.
+
+        The outermost block issues BEGIN IMMEDIATE and commits once at the end; nested blocks
+        become savepoints, so a helper that opens its own transaction can be batched by a caller.
+        """
+        slot = self._slot()
+        conn = slot.conn
+        if slot.depth == 0:
+            if conn.in_transaction:
+                conn.commit()  # Flush anything left open by an implicit transaction
+            conn.execute("BEGIN IMMEDIATE")
+        else:
+            conn.execute(f"SAVEPOINT sp_{slot.depth}")
+        slot.depth += 1
+        try:
+            yield slot.cursor
+        except BaseException:
+            slot.depth -= 1
+            if slot.depth == 0:
+                conn.rollback()
+            else:
+                conn.execute(f"ROLLBACK TO sp_{slot.depth}")
+                conn.execute(f"RELEASE sp_{slot.depth}")
+            raise
+        else:
+            slot.depth -= 1
+            if slot.depth == 0:
+                conn.commit()
+            else:
+                conn.execute(f"RELEASE sp_{slot.depth}")
+
+    def close(self):
+        """Closes the calling thread's connection."""
+        slot = getattr(self._local, "slot", None)
+        if slot is not None:
+            self._local.slot = None
+            self._discard(slot.conn)
+
+    def close_all(self):
+        """Closes every connection handed out by this pool, e.g. on shutdown."""
+        with self._lock:
+            connections, self._connections, self._idle = self._connections, [], []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Versioned schema changes applied after create_tables, in order. PRAGMA user_version records the
+# last migration a database file has seen, so each one runs exactly once per file. A (report, query)
+# pair in place of a statement prints the ids the query selects, for changes made to existing rows.
+MIGRATIONS = [
+    (1, "secondary indexes for reservation, order item and customer lookups", [
+        # Older files may hold double bookings; keep the earliest one so the unique index can be built
+        ("cancelled double-booked reservations", """SELECT id FROM reservations
+           WHERE status != 'cancelled' AND id NOT IN (
+               SELECT MIN(id) FROM reservations WHERE status != 'cancelled'
+               GROUP BY table_id, reservation_date, reservation_time)
+           ORDER BY id"""),
+        """UPDATE reservations SET status = 'cancelled'
+           WHERE status != 'cancelled' AND id NOT IN (
+               SELECT MIN(id) FROM reservations WHERE status != 'cancelled'
+               GROUP BY table_id, reservation_date, reservation_time)""",
+        # A table can only hold one live booking per slot; cancelled bookings free the slot again
+        """CREATE UNIQUE INDEX IF NOT EXISTS ux_reservations_table_slot
+           ON reservations (table_id, reservation_date, reservation_time) WHERE status != 'cancelled'""",
+        "CREATE INDEX IF NOT EXISTS ix_reservations_customer ON reservations (customer_id, reservation_date, reservation_time)",
+        "CREATE INDEX IF NOT EXISTS ix_order_items_order_menu ON order_items (order_id, menu_item_id)",
+        "CREATE INDEX IF NOT EXISTS ix_customers_name ON customers (name)",
+    ]),
+    (2, "catalog version counter bumped by menu and offer changes", [
+        """CREATE TABLE IF NOT EXISTS catalog_version (
+               id INTEGER PRIMARY KEY CHECK (id = 1),
+               version INTEGER NOT NULL
+           )""",
+        "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 1)",
+    ] + [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_catalog_version AFTER {event} ON {table}
+            BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END"""
+        for table in ("menu", "offers") for event in ("INSERT", "UPDATE", "DELETE")
+    ]),
+    (3, "live reservations by date for the availability engine", [
+        """CREATE INDEX IF NOT EXISTS ix_reservations_date
+           ON reservations (reservation_date, table_id, reservation_time) WHERE status != 'cancelled'""",
+    ]),
+    (4, "combinable tables and the extra tables held by combined bookings", [
+        # Tables sharing a combine_group stand together (in id order) and can be pushed together
+        "ALTER TABLE restaurant_tables ADD COLUMN combine_group TEXT",
+        # reservations.table_id is the first table of a booking; further tables are listed here
+        """CREATE TABLE IF NOT EXISTS reservation_tables (
+               reservation_id INTEGER NOT NULL,
+               table_id INTEGER NOT NULL,
+               PRIMARY KEY (reservation_id, table_id),
+               FOREIGN KEY (reservation_id) REFERENCES reservations(id),
+               FOREIGN KEY (table_id) REFERENCES restaurant_tables(id)
+           )""",
+    ]),
+    (5, "order totals maintained by order_items triggers", [
+        # One last full recount; from here on every line change adjusts the total by its own delta
+        """UPDATE orders SET total_amount = ROUND(COALESCE(
+               (SELECT SUM(quantity * price_at_order) FROM order_items WHERE order_id = orders.id), 0), 2)""",
+        """CREATE TRIGGER IF NOT EXISTS trg_order_items_insert_total AFTER INSERT ON order_items
+           BEGIN
+               UPDATE orders SET total_amount = ROUND(COALESCE(total_amount, 0) + NEW.quantity * NEW.price_at_order, 2)
+               WHERE id = NEW.order_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_order_items_update_total
+           AFTER UPDATE OF order_id, quantity, price_at_order ON order_items
+           BEGIN
+               UPDATE orders SET total_amount = ROUND(COALESCE(total_amount, 0) - OLD.quantity * OLD.price_at_order, 2)
+               WHERE id = OLD.order_id;
+               UPDATE orders SET total_amount = ROUND(COALESCE(total_amount, 0) + NEW.quantity * NEW.price_at_order, 2)
+               WHERE id = NEW.order_id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_order_items_delete_total AFTER DELETE ON order_items
+           BEGIN
+               UPDATE orders SET total_amount = ROUND(COALESCE(total_amount, 0) - OLD.quantity * OLD.price_at_order, 2)
+               WHERE id = OLD.order_id;
+           END""",
+    ]),
+    (6, "one order_items row per order and menu item, for upserts", [
+        # Fold duplicate lines into the oldest one; the total triggers keep orders.total_amount in step
+        """UPDATE order_items SET quantity = (
+               SELECT SUM(quantity) FROM order_items AS dup
+               WHERE dup.order_id = order_items.order_id AND dup.menu_item_id = order_items.menu_item_id)
+           WHERE id IN (SELECT MIN(id) FROM order_items GROUP BY order_id, menu_item_id HAVING COUNT(*) > 1)""",
+        """DELETE FROM order_items WHERE id NOT IN (SELECT MIN(id) FROM order_items GROUP BY order_id, menu_item_id)""",
+        "DROP INDEX IF EXISTS ix_order_items_order_menu",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_order_items_order_menu ON order_items (order_id, menu_item_id)",
+    ]),
+    (7, "append-only conversation transcript per chat session", [
+        """CREATE TABLE IF NOT EXISTS conversation_turns (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               session_id TEXT NOT NULL,
+               role TEXT NOT NULL,
+               content TEXT NOT NULL,
+               created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )""",
+        "CREATE INDEX IF NOT EXISTS ix_conversation_turns_session ON conversation_turns (session_id, id)",
+    ]),
+    (8, "issued chat sessions with their API token and the state saved when they leave memory", [
+        """CREATE TABLE IF NOT EXISTS chat_sessions (
+               session_id TEXT PRIMARY KEY,
+               token_hash TEXT,
+               state TEXT,
+               updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+           )""",
+    ]),
+    (9, "restaurant info changes bump the catalog version", [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_restaurant_info_{event.lower()}_catalog_version
+            AFTER {event} ON restaurant_info
+            BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END"""
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]),
+]
+
+
+def get_pool(db_name="restaurant.db", profile=None):
+    """Returns the process-wide connection pool for a database file.
+
+    The profile only takes effect when the pool is first created.
+    """
+    key = db_name if db_name == ":memory:" else os.path.abspath(db_name)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_name, profile=profile)
+            _pools[key] = pool
+        return pool
+
+
 class RestaurantDatabase:
-    def __init__(self, db_name="restaurant.db"):
+    def __init__(self, db_name="restaurant.db", pool=None, profile=None):
         self.db_name = db_name
-        self.conn = None
-        self.cursor = None
+        # ":memory:" databases are private to the instance, files are shared across the process
+        if pool is None:
+            if db_name == ":memory:":
+                pool = ConnectionPool(db_name, profile=profile)
+            else:
+                pool = get_pool(db_name, profile=profile)
+        self.pool = pool
         self.connect()
-        self.create_tables()
-        self.populate_dummy_data()
+        if not self.pool.initialized:
+            with self.pool.init_lock:
+                if not self.pool.initialized:
+                    self.create_tables()
+                    self.migrate()
+                    self.populate_dummy_data()
+                    self.pool.initialized = True
+
+    @property
+    def conn(self):
+        return self.pool.connection()
+
+    @property
+    def cursor(self):
+        # Each thread gets its own connection and cursor, so sessions never share a cursor
+        return self.pool.cursor()
 
     def connect(self):
         try:
-            self.conn = sqlite3.connect(self.db_name, check_same_thread=False)
-            self.cursor = self.conn.cursor()
+            self.pool.connection()
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
 
     def close(self):
-        if self.conn:
-            self.conn.close()
+        self.pool.close()
+
+    def transaction(self):
+        """Context manager grouping several calls into a single commit, e.g.
+
+            with db.transaction():
+                db.add_order_item(...)
+                db.add_order_item(...)
+        """
+        return self.pool.transaction()
 
     def create_tables(self):
         try:
@@ -130,6 +452,35 @@ class RestaurantDatabase:
         except sqlite3.Error as e:
             print(f"Error creating tables: {e}")
 
+    def migrate(self):
+        """Applies any MIGRATIONS newer than the file's user_version.
+
+        A failing migration is rolled back and its error raised, so the app never runs on a
+        half-migrated schema and the next start tries again.
+        """
+        current_version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+        for version, description, statements in MIGRATIONS:
+            if version <= current_version:
+                continue
+            reports = []
+            try:
+                with self.transaction():
+                    for statement in statements:
+                        if isinstance(statement, tuple):
+                            report, query = statement
+                            ids = [row[0] for row in self.cursor.execute(query)]
+                            if ids:
+                                reports.append(f"{report}: {', '.join(map(str, ids))}")
+                            continue
+                        self.cursor.execute(statement)
+                    self.cursor.execute(f"PRAGMA user_version = {version}")
+            except sqlite3.Error as e:
+                print(f"Error applying schema migration {version}: {e}")
+                raise
+            print(f"Applied schema migration {version}: {description}")
+            for report in reports:
+                print(f"  Migration {version} {report}")
+
     def populate_dummy_data(self):
         try:
             # Check if menu is empty
@@ -194,10 +545,11 @@ class RestaurantDatabase:
             self.cursor.execute("SELECT COUNT(*) FROM restaurant_tables")
             if self.cursor.fetchone()[0] == 0:
                 tables = [
-                    ("Table 1", 2), ("Table 2", 4), ("Table 3", 6),
-                    ("Table 4", 2), ("Table 5", 4)
+                    ("Table 1", 2, "Window"), ("Table 2", 4, None), ("Table 3", 6, None),
+                    ("Table 4", 2, "Window"), ("Table 5", 4, "Window")
                 ]
-                self.cursor.executemany("INSERT INTO restaurant_tables (table_number, capacity) VALUES (?, ?)", tables)
+                self.cursor.executemany(
+                    "INSERT INTO restaurant_tables (table_number, capacity, combine_group) VALUES (?, ?, ?)", tables)
 
             self.conn.commit()
             print("Dummy data populated successfully.")
@@ -210,14 +562,27 @@ class RestaurantDatabase:
 
     def get_menu_item_by_name(self, name):
         self.cursor.execute(
-            "SELECT id, name, description, category, price, ingredients, nutrition, how_its_made FROM menu WHERE name LIKE ?",
-            ('%' + name + '%',))
+            "SELECT id, name, description, category, price, ingredients, nutrition, how_its_made FROM menu WHERE name LIKE ?"
+            " ORDER BY lower(name) = lower(?) DESC, length(name) LIMIT 1",  # Exact name first, then the closest
+            ('%' + name + '%', name))
         return self.cursor.fetchone()
 
     def get_all_menu_items(self):
         self.cursor.execute("SELECT name, description, price, category FROM menu")
         return self.cursor.fetchall()
 
+    def get_full_menu(self):
+        """Fetches every menu item with all of its columns, in the same layout as get_menu_item_by_name."""
+        self.cursor.execute(
+            "SELECT id, name, description, category, price, ingredients, nutrition, how_its_made FROM menu ORDER BY id")
+        return self.cursor.fetchall()
+
+    def get_catalog_version(self):
+        """Returns the counter that the menu and offers triggers bump on every change."""
+        self.cursor.execute("SELECT version FROM catalog_version WHERE id = 1")
+        result = self.cursor.fetchone()
+        return result[0] if result else 0
+
     def get_filtered_menu(self, criteria):
         query = "SELECT name, description, price, category FROM menu WHERE 1=1"
         params = []
@@ -240,8 +605,9 @@ class RestaurantDatabase:
 
     def get_offer_by_name(self, name):
         self.cursor.execute(
-            "SELECT name, description, discount, valid_from, valid_to, is_happy_hour FROM offers WHERE name LIKE ?",
-            ('%' + name + '%',))
+            "SELECT name, description, discount, valid_from, valid_to, is_happy_hour FROM offers WHERE name LIKE ?"
+            " ORDER BY lower(name) = lower(?) DESC, length(name) LIMIT 1",
+            ('%' + name + '%', name))
         return self.cursor.fetchone()
 
     def get_restaurant_info(self):
@@ -249,77 +615,56 @@ class RestaurantDatabase:
         return self.cursor.fetchone()
 
     def add_customer(self, name, phone=None, email=None):
-        try:
-            # Attempt to insert the customer. If it's a duplicate, it will be ignored.
-            self.cursor.execute("INSERT OR IGNORE INTO customers (name, phone, email) VALUES (?, ?, ?)",
-                                (name, phone, email))
-            self.conn.commit()
+        """Inserts a customer and returns its id.
 
-            # Now, retrieve the ID. We need to handle cases where phone/email might be None.
-            # If phone and email are both None, we'll try to find by name.
-            # Otherwise, prioritize phone or email if they exist.
-            customer_id = None
-            if phone or email:
-                self.cursor.execute("SELECT id FROM customers WHERE name = ? AND (phone = ? OR email = ?)",
+        If the phone or email is already registered under the same name, that customer is returning
+        and their id is returned instead; under another name the details clash and None is returned.
+        """
+        try:
+            with self.transaction():
+                # Guests without phone or email never clash, so they always get a row of their own
+                self.cursor.execute("INSERT OR IGNORE INTO customers (name, phone, email) VALUES (?, ?, ?)",
+                                    (name, phone, email))
+                if self.cursor.rowcount:
+                    return self.cursor.lastrowid
+                self.cursor.execute("SELECT id FROM customers WHERE name = ? AND (phone = ? OR email = ?) LIMIT 1",
                                     (name, phone, email))
                 result = self.cursor.fetchone()
-                if result:
-                    customer_id = result[0]
-
-            if customer_id is None and name:  # If not found by phone/email or if both are None, try by name alone
-                self.cursor.execute("SELECT id FROM customers WHERE name = ? ORDER BY id DESC LIMIT 1", (name,))
-                result = self.cursor.fetchone()
-                if result:
-                    customer_id = result[0]
-
-            if customer_id is None:  # Fallback if for some reason it's still not found (shouldn't happen often)
-                print(
-                    f"Warning: Could not find customer ID after add_customer for name='{name}', phone='{phone}', email='{email}'")
-                # As a last resort, if INSERT OR IGNORE just happened and lastrowid is available, use it.
-                # This is less reliable if an IGNORE occurred because lastrowid would be 0 or -1
-                # But if it's a true insert, it will give the new ID.
-                if self.cursor.lastrowid and self.cursor.lastrowid > 0:
-                    customer_id = self.cursor.lastrowid
-
-            return customer_id
+                return result[0] if result else None
         except sqlite3.Error as e:
             print(f"Error adding customer: {e}")
             return None
 
     def create_order(self, customer_id, total_amount=0.0):
         try:
-            self.cursor.execute("INSERT INTO orders (customer_id, total_amount, status) VALUES (?, ?, ?)",
-                                (customer_id, total_amount, 'pending'))
-            self.conn.commit()
-            return self.cursor.lastrowid
+            with self.transaction():
+                self.cursor.execute("INSERT INTO orders (customer_id, total_amount, status) VALUES (?, ?, ?)",
+                                    (customer_id, total_amount, 'pending'))
+                return self.cursor.lastrowid
         except sqlite3.Error as e:
             print(f"Error creating order: {e}")
             return None
 
     def add_order_item(self, order_id, menu_item_id, quantity, price_at_order):
-        try:
-            # Check if item already exists in order
-            self.cursor.execute("SELECT quantity FROM order_items WHERE order_id = ? AND menu_item_id = ?",
-                                (order_id, menu_item_id))
-            existing_quantity = self.cursor.fetchone()
+        return self.add_order_items(order_id, [(menu_item_id, quantity, price_at_order)])
 
-            if existing_quantity:
-                new_quantity = existing_quantity[0] + quantity
-                self.cursor.execute("UPDATE order_items SET quantity = ? WHERE order_id = ? AND menu_item_id = ?",
-                                    (new_quantity, order_id, menu_item_id))
-            else:
-                self.cursor.execute(
-                    "INSERT INTO order_items (order_id, menu_item_id, quantity, price_at_order) VALUES (?, ?, ?, ?)",
-                    (order_id, menu_item_id, quantity, price_at_order))
+    def add_order_items(self, order_id, lines):
+        """Adds (menu_item_id, quantity, price_at_order) lines to an order in one statement and one commit.
 
-            # Update total amount in orders table
-            self.cursor.execute(
-                "UPDATE orders SET total_amount = (SELECT SUM(quantity * price_at_order) FROM order_items WHERE order_id = ?) WHERE id = ?",
-                (order_id, order_id))
-            self.conn.commit()
+        A line for an item already on the order adds to its quantity and keeps its first price. A
+        price of None takes the item's current menu price; ids missing from the menu are skipped.
+        """
+        try:
+            with self.transaction():
+                # orders.total_amount follows through the order_items triggers (migration 5)
+                self.cursor.executemany("""
+                    INSERT INTO order_items (order_id, menu_item_id, quantity, price_at_order)
+                    SELECT ?, id, ?, COALESCE(?, price) FROM menu WHERE id = ?
+                    ON CONFLICT (order_id, menu_item_id) DO UPDATE SET quantity = quantity + excluded.quantity
+                """, [(order_id, quantity, price_at_order, menu_item_id) for menu_item_id, quantity, price_at_order in lines])
             return True
         except sqlite3.Error as e:
-            print(f"Error adding order item: {e}")
+            print(f"Error adding order items: {e}")
             return False
 
     def get_order_details(self, order_id):
@@ -354,7 +699,8 @@ class RestaurantDatabase:
             FROM order_items oi
             JOIN menu m ON oi.menu_item_id = m.id
             WHERE oi.order_id = ? AND m.name LIKE ?
-        """, (order_id, f'%{item_name}%'))
+            ORDER BY lower(m.name) = lower(?) DESC, length(m.name) LIMIT 1
+        """, (order_id, f'%{item_name}%', item_name))
         return self.cursor.fetchone()  # Returns (order_item_id, menu_item_id, name, quantity, price_at_order)
 
     def update_order_item_quantity(self, order_id, menu_item_id, new_quantity):
@@ -363,12 +709,9 @@ class RestaurantDatabase:
             if new_quantity <= 0:
                 return self.remove_order_item(order_id, menu_item_id)
 
-            self.cursor.execute("UPDATE order_items SET quantity = ? WHERE order_id = ? AND menu_item_id = ?",
-                                (new_quantity, order_id, menu_item_id))
-            self.cursor.execute(
-                "UPDATE orders SET total_amount = (SELECT SUM(quantity * price_at_order) FROM order_items WHERE order_id = ?) WHERE id = ?",
-                (order_id, order_id))
-            self.conn.commit()
+            with self.transaction():
+                self.cursor.execute("UPDATE order_items SET quantity = ? WHERE order_id = ? AND menu_item_id = ?",
+                                    (new_quantity, order_id, menu_item_id))
             return True
         except sqlite3.Error as e:
             print(f"Error updating order item quantity: {e}")
@@ -377,13 +720,9 @@ class RestaurantDatabase:
     def remove_order_item(self, order_id, menu_item_id):
         """Removes a specific item from an order."""
         try:
-            self.cursor.execute("DELETE FROM order_items WHERE order_id = ? AND menu_item_id = ?",
-                                (order_id, menu_item_id))
-            # Update total amount in orders table, handle case if no items left
-            self.cursor.execute(
-                "UPDATE orders SET total_amount = (SELECT COALESCE(SUM(quantity * price_at_order), 0) FROM order_items WHERE order_id = ?) WHERE id = ?",
-                (order_id, order_id))
-            self.conn.commit()
+            with self.transaction():
+                self.cursor.execute("DELETE FROM order_items WHERE order_id = ? AND menu_item_id = ?",
+                                    (order_id, menu_item_id))
             return True
         except sqlite3.Error as e:
             print(f"Error removing order item: {e}")
@@ -392,8 +731,8 @@ class RestaurantDatabase:
     def update_order_status(self, order_id, new_status):
         """Updates the status of an order."""
         try:
-            self.cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (new_status, order_id))
-            self.conn.commit()
+            with self.transaction():
+                self.cursor.execute("UPDATE orders SET status = ? WHERE id = ?", (new_status, order_id))
             return True
         except sqlite3.Error as e:
             print(f"Error updating order status: {e}")
@@ -404,19 +743,50 @@ class RestaurantDatabase:
             SELECT rt.table_number, rt.capacity
             FROM restaurant_tables rt
             LEFT JOIN reservations r ON rt.id = r.table_id
-            AND r.reservation_date = ? AND r.reservation_time = ?
+            AND r.reservation_date = ? AND r.reservation_time = ? AND r.status != 'cancelled'
             WHERE r.table_id IS NULL AND rt.capacity >= ?
             ORDER BY rt.capacity ASC
         """, (reservation_date, reservation_time, party_size))
         return self.cursor.fetchall()
 
-    def create_reservation(self, customer_id, table_id, reservation_date, reservation_time, party_size):
+    def get_tables(self):
+        self.cursor.execute("SELECT id, table_number, capacity FROM restaurant_tables ORDER BY capacity, id")
+        return self.cursor.fetchall()
+
+    def get_table_layout(self):
+        """(id, table_number, capacity, combine_group) of every table, in id order."""
+        self.cursor.execute("SELECT id, table_number, capacity, combine_group FROM restaurant_tables ORDER BY id")
+        return self.cursor.fetchall()
+
+    def get_reservations_for_date(self, reservation_date):
+        """All live bookings on one date as (id, table_id, reservation_time, party_size).
+
+        A booking on combined tables yields one row per table it holds.
+        """
+        self.cursor.execute("""
+            SELECT id, table_id, reservation_time, party_size FROM reservations
+            WHERE reservation_date = ? AND status != 'cancelled' AND table_id IS NOT NULL
+            UNION ALL
+            SELECT r.id, rt.table_id, r.reservation_time, r.party_size
+            FROM reservation_tables rt
+            JOIN reservations r ON r.id = rt.reservation_id
+            WHERE r.reservation_date = ? AND r.status != 'cancelled'
+            ORDER BY 2, 3
+        """, (reservation_date, reservation_date))
+        return self.cursor.fetchall()
+
+    def create_reservation(self, customer_id, table_id, reservation_date, reservation_time, party_size,
+                           extra_table_ids=()):
         try:
-            self.cursor.execute(
-                "INSERT INTO reservations (customer_id, table_id, reservation_date, reservation_time, party_size, status) VALUES (?, ?, ?, ?, ?, ?)",
-                (customer_id, table_id, reservation_date, reservation_time, party_size, 'confirmed'))
-            self.conn.commit()
-            return self.cursor.lastrowid
+            with self.transaction():
+                self.cursor.execute(
+                    "INSERT INTO reservations (customer_id, table_id, reservation_date, reservation_time, party_size, status) VALUES (?, ?, ?, ?, ?, ?)",
+                    (customer_id, table_id, reservation_date, reservation_time, party_size, 'confirmed'))
+                booking_id = self.cursor.lastrowid
+                if extra_table_ids:
+                    self.cursor.executemany("INSERT INTO reservation_tables (reservation_id, table_id) VALUES (?, ?)",
+                                            [(booking_id, extra_table_id) for extra_table_id in extra_table_ids])
+                return booking_id
         except sqlite3.IntegrityError:
             print("Error: Table already booked at this time.")
             return None
@@ -424,6 +794,24 @@ class RestaurantDatabase:
             print(f"Error creating reservation: {e}")
             return None
 
+    def reassign_tables(self, moves):
+        """Moves bookings to new tables; `moves` maps reservation id -> table ids, first one primary."""
+        try:
+            with self.transaction():
+                ids = [(reservation_id,) for reservation_id in moves]
+                # Clear first so two bookings can swap tables without tripping the unique slot index
+                self.cursor.executemany("UPDATE reservations SET table_id = NULL WHERE id = ?", ids)
+                self.cursor.executemany("DELETE FROM reservation_tables WHERE reservation_id = ?", ids)
+                self.cursor.executemany("UPDATE reservations SET table_id = ? WHERE id = ?",
+                                        [(tables[0], reservation_id) for reservation_id, tables in moves.items()])
+                self.cursor.executemany("INSERT INTO reservation_tables (reservation_id, table_id) VALUES (?, ?)",
+                                        [(reservation_id, table_id) for reservation_id, tables in moves.items()
+                                         for table_id in tables[1:]])
+            return True
+        except sqlite3.Error as e:
+            print(f"Error reassigning tables: {e}")
+            return False
+
     def get_reservation_details(self, booking_id):
         """Fetches details of a reservation."""
         self.cursor.execute("""
@@ -482,8 +870,8 @@ class RestaurantDatabase:
             query = f"UPDATE reservations SET {', '.join(updates)} WHERE id = ?"
             params.append(booking_id)
 
-            self.cursor.execute(query, tuple(params))
-            self.conn.commit()
+            with self.transaction():
+                self.cursor.execute(query, tuple(params))
             return True
         except sqlite3.Error as e:
             print(f"Error updating reservation: {e}")
@@ -492,8 +880,8 @@ class RestaurantDatabase:
     def cancel_reservation(self, booking_id):
         """Cancels a reservation."""
         try:
-            self.cursor.execute("UPDATE reservations SET status = 'cancelled' WHERE id = ?", (booking_id,))
-            self.conn.commit()
+            with self.transaction():
+                self.cursor.execute("UPDATE reservations SET status = 'cancelled' WHERE id = ?", (booking_id,))
             return True
         except sqlite3.Error as e:
             print(f"Error cancelling reservation: {e}")
@@ -501,9 +889,9 @@ class RestaurantDatabase:
 
     def store_feedback(self, customer_id, rating, comments):
         try:
-            self.cursor.execute("INSERT INTO feedback (customer_id, rating, comments) VALUES (?, ?, ?)",
-                                (customer_id, rating, comments))
-            self.conn.commit()
+            with self.transaction():
+                self.cursor.execute("INSERT INTO feedback (customer_id, rating, comments) VALUES (?, ?, ?)",
+                                    (customer_id, rating, comments))
             return True
         except sqlite3.Error as e:
             print(f"Error storing feedback: {e}")
@@ -511,7 +899,8 @@ class RestaurantDatabase:
 
     def get_menu_item_id_by_name(self, item_name):
         """Helper to get menu item ID by name."""
-        self.cursor.execute("SELECT id FROM menu WHERE name LIKE ?", (f'%{item_name}%',))
+        self.cursor.execute("SELECT id FROM menu WHERE name LIKE ? ORDER BY lower(name) = lower(?) DESC, length(name) LIMIT 1",
+                            (f'%{item_name}%', item_name))
         result = self.cursor.fetchone()
         return result[0] if result else None
 
@@ -536,8 +925,8 @@ class RestaurantDatabase:
             query = f"UPDATE customers SET {', '.join(updates)} WHERE id = ?"
             params.append(customer_id)
 
-            self.cursor.execute(query, tuple(params))
-            self.conn.commit()
+            with self.transaction():
+                self.cursor.execute(query, tuple(params))
             return True
         except sqlite3.IntegrityError as e:
             print(f"Error updating customer: Duplicate phone or email. {e}")
@@ -550,3 +939,77 @@ class RestaurantDatabase:
         """Fetches customer details by ID."""
         self.cursor.execute("SELECT id, name, phone, email FROM customers WHERE id = ?", (customer_id,))
         return self.cursor.fetchone()
+
+    def append_turns(self, session_id, turns):
+        """Appends (role, content) messages to a session's transcript in one commit; returns their ids."""
+        try:
+            with self.transaction():
+                ids = []
+                for role, content in turns:
+                    self.cursor.execute("INSERT INTO conversation_turns (session_id, role, content) VALUES (?, ?, ?)",
+                                        (session_id, role, content))
+                    ids.append(self.cursor.lastrowid)
+                return ids
+        except sqlite3.Error as e:
+            print(f"Error saving conversation: {e}")
+            return []
+
+    def get_turns(self, session_id, limit, before_id=None):
+        """Up to `limit` (id, role, content, created_at) turns of a session, oldest first, ending just
+        before `before_id` (or with the latest turn)."""
+        if before_id is None:
+            self.cursor.execute("""
+                SELECT id, role, content, created_at FROM conversation_turns
+                WHERE session_id = ? ORDER BY id DESC LIMIT ?
+            """, (session_id, limit))
+        else:
+            self.cursor.execute("""
+                SELECT id, role, content, created_at FROM conversation_turns
+                WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+            """, (session_id, before_id, limit))
+        return self.cursor.fetchall()[::-1]
+
+    def count_turns(self, session_id):
+        self.cursor.execute("SELECT COUNT(*) FROM conversation_turns WHERE session_id = ?", (session_id,))
+        return self.cursor.fetchone()[0]
+
+    def create_chat_session(self, session_id, token_hash=None):
+        """Registers a session id issued by the server; False if the id is already taken."""
+        try:
+            with self.transaction():
+                self.cursor.execute("INSERT INTO chat_sessions (session_id, token_hash) VALUES (?, ?)",
+                                    (session_id, token_hash))
+            return True
+        except sqlite3.IntegrityError:
+            return False
+        except sqlite3.Error as e:
+            print(f"Error creating chat session: {e}")
+            return False
+
+    def get_chat_session(self, session_id):
+        """(token_hash, state) of an issued session, state being the JSON saved when it left memory, or None."""
+        self.cursor.execute("SELECT token_hash, state FROM chat_sessions WHERE session_id = ?", (session_id,))
+        return self.cursor.fetchone()
+
+    def save_chat_sessions(self, states):
+        """Saves (session_id, state JSON) pairs in one commit, keeping each session's token."""
+        try:
+            with self.transaction():
+                self.cursor.executemany("""
+                    INSERT INTO chat_sessions (session_id, state) VALUES (?, ?)
+                    ON CONFLICT (session_id) DO UPDATE SET state = excluded.state, updated_at = CURRENT_TIMESTAMP
+                """, states)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error saving chat sessions: {e}")
+            return False
+
+    def delete_chat_session(self, session_id):
+        """Forgets an issued session and its saved state; its transcript stays."""
+        try:
+            with self.transaction():
+                self.cursor.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                return self.cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting chat session: {e}")
+            return False
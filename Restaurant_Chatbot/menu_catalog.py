@@ -0,0 +1,195 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from database import RestaurantDatabase
+from search_index import NameTrie, TrigramIndex
+
+
+def filter_rows(rows, criteria: Dict[str, Any]) -> List[Tuple]:
+    """In-memory equivalent of RestaurantDatabase.get_filtered_menu, over full menu rows."""
+    category = criteria.get('category', '').lower()
+    max_price = criteria.get('max_price')
+    excluded = [ingredient.lower() for ingredient in criteria.get('ingredients_exclude', [])]
+    results = []
+    for row in rows:
+        if category and category not in (row[3] or "").lower():
+            continue
+        if max_price is not None and row[4] > max_price:
+            continue
+        ingredients = (row[5] or "").lower()
+        if any(ingredient in ingredients for ingredient in excluded):
+            continue
+        results.append(row)
+    return results
+
+
+MENU_SEARCH_FIELDS = {"name": 1.0, "category": 0.6, "ingredients": 0.5, "description": 0.4}
+OFFER_SEARCH_FIELDS = {"name": 1.0, "description": 0.5}
+
+
+class CatalogSnapshot:
+    """Read-only view of the menu and offers as of one catalog version."""
+
+    def __init__(self, version: int, menu_rows: List[Tuple], offers: List[Tuple]):
+        self.version = version
+        # Menu rows use the get_menu_item_by_name layout:
+        # (id, name, description, category, price, ingredients, nutrition, how_its_made)
+        self.items = tuple(menu_rows)
+        self.offers = tuple(offers)
+        self.by_id = {row[0]: row for row in self.items}
+        self.by_name = {row[1].lower(): row for row in self.items}
+        self.by_category: Dict[str, List[Tuple]] = {}
+        for row in self.items:
+            self.by_category.setdefault((row[3] or "").lower(), []).append(row)
+        self._menu_index: Optional[TrigramIndex] = None
+        self._offer_index: Optional[TrigramIndex] = None
+        self._name_trie: Optional[NameTrie] = None
+        self._rendered = None
+
+    @property
+    def menu_index(self) -> TrigramIndex:
+        # Built on first search; a snapshot never changes, so the index never needs updating
+        if self._menu_index is None:
+            index = TrigramIndex(MENU_SEARCH_FIELDS)
+            for row in self.items:
+                index.add(row[0], name=row[1], description=row[2], category=row[3], ingredients=row[5])
+            self._menu_index = index
+        return self._menu_index
+
+    @property
+    def name_trie(self) -> NameTrie:
+        # Finds menu names inside order requests; keyed by the exact menu name
+        if self._name_trie is None:
+            self._name_trie = NameTrie.from_names((row[1], row[1]) for row in self.items)
+        return self._name_trie
+
+    @property
+    def rendered(self):
+        # Markdown for this version; imported here because menu_renderer depends on this module
+        if self._rendered is None:
+            from menu_renderer import RenderedMenu
+            self._rendered = RenderedMenu(self)
+        return self._rendered
+
+    @property
+    def offer_index(self) -> TrigramIndex:
+        if self._offer_index is None:
+            index = TrigramIndex(OFFER_SEARCH_FIELDS)
+            for position, offer in enumerate(self.offers):
+                index.add(position, name=offer[0], description=offer[1])
+            self._offer_index = index
+        return self._offer_index
+
+
+class MenuCatalog:
+    """In-memory cache of the menu and offers in front of RestaurantDatabase.
+
+    The menu is loaded once and served from dicts. refresh() compares the catalog_version counter
+    (bumped by triggers on the menu and offers tables) at most once every `check_interval` seconds
+    and reloads only when it moved, so lookups within a conversation turn run no SQL at all.
+    """
+
+    def __init__(self, db: RestaurantDatabase, check_interval: float = 1.0):
+        self.db = db
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh(force=True)
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def refresh(self, force: bool = False) -> CatalogSnapshot:
+        """Reloads the catalog if its version changed; cheap enough to call at the start of every turn."""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and not force and now - self._checked_at < self.check_interval:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not force and now - self._checked_at < self.check_interval:
+                return snapshot
+            version = self.db.get_catalog_version()
+            if snapshot is None or force or version != snapshot.version:
+                snapshot = CatalogSnapshot(version, self.db.get_full_menu(), self.db.get_offers())
+                self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def invalidate(self):
+        """Forces the next lookup to reload, e.g. after editing the menu outside of SQLite triggers."""
+        with self._lock:
+            self._snapshot = None
+
+    def all_items(self) -> Tuple[Tuple, ...]:
+        return self.snapshot.items
+
+    def get(self, menu_item_id: int) -> Optional[Tuple]:
+        return self.snapshot.by_id.get(menu_item_id)
+
+    def get_by_name(self, name: str) -> Optional[Tuple]:
+        """Exact, case-insensitive name lookup."""
+        return self.snapshot.by_name.get(name.strip().lower())
+
+    def get_by_category(self, category: str) -> List[Tuple]:
+        return list(self.snapshot.by_category.get(category.strip().lower(), []))
+
+    def categories(self) -> List[str]:
+        return [items[0][3] for items in self.snapshot.by_category.values()]
+
+    def filter_items(self, criteria: Dict[str, Any]) -> List[Tuple]:
+        """In-memory equivalent of RestaurantDatabase.get_filtered_menu, returning full menu rows."""
+        return filter_rows(self.snapshot.items, criteria)
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.3) -> List[Tuple[float, Tuple]]:
+        """Ranked fuzzy search over name, category, ingredients and description: [(score, menu row)]."""
+        snapshot = self.snapshot
+        return [(score, snapshot.by_id[menu_item_id])
+                for score, menu_item_id in snapshot.menu_index.search(query, limit, min_score)]
+
+    def resolve(self, name: str, min_score: float = 0.45) -> Optional[Tuple]:
+        """Best menu row for a possibly misspelt item name, or None if nothing is close enough."""
+        row = self.get_by_name(name)
+        if row is None:
+            matches = self.search(name, limit=1, min_score=min_score)
+            row = matches[0][1] if matches else None
+        return row
+
+    def name_trie(self) -> NameTrie:
+        """Trie over the current menu names, for extract_order_items."""
+        return self.snapshot.name_trie
+
+    def rendered(self):
+        """Pre-rendered menu, category, filter and offer responses for the current catalog version."""
+        return self.snapshot.rendered
+
+    def offers(self) -> Tuple[Tuple, ...]:
+        return self.snapshot.offers
+
+    def search_offers(self, query: str, limit: int = 3, min_score: float = 0.3) -> List[Tuple[float, Tuple]]:
+        snapshot = self.snapshot
+        return [(score, snapshot.offers[position])
+                for score, position in snapshot.offer_index.search(query, limit, min_score)]
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(db: RestaurantDatabase) -> MenuCatalog:
+    """Returns the catalog shared by every RestaurantDatabase that uses the same connection pool."""
+    with _catalogs_lock:
+        catalog = _catalogs.get(db.pool)
+        if catalog is None:
+            catalog = MenuCatalog(db)
+            _catalogs[db.pool] = catalog
+        return catalog
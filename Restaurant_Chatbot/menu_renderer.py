@@ -0,0 +1,95 @@
+import datetime
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from menu_catalog import CatalogSnapshot, filter_rows
+
+MENU_HEADER = "Here is our current menu:\n"
+FILTER_HEADER = "Here are some menu items matching your criteria:\n"
+OFFERS_HEADER = "Here are our current offers:\n"
+
+
+def _offer_block(offer: Tuple) -> Tuple[str, Optional[Tuple[datetime.time, datetime.time, str, str]]]:
+    """The offer's markdown line and, for happy hours, the window that decides its live suffix."""
+    name, description, discount, valid_from, valid_to, is_happy_hour = offer
+    offer_text = f"- **{name}**: {description}"
+    if discount > 0:
+        offer_text += f" ({int(discount * 100)}% off)"
+    try:
+        # Convert valid_from and valid_to from string "HH:MM" to time objects
+        from_time = datetime.datetime.strptime(valid_from, "%H:%M").time()
+        to_time = datetime.datetime.strptime(valid_to, "%H:%M").time()
+    except ValueError:
+        return offer_text + " (Times unavailable)\n", None  # Handle parsing errors
+    if is_happy_hour:
+        return offer_text, (from_time, to_time, valid_from, valid_to)
+    # Non-happy hour offers, show valid times if not all day
+    if valid_from != "00:00" or valid_to != "23:59":
+        offer_text += f" (Valid from {valid_from} to {valid_to})"
+    return offer_text + "\n", None
+
+
+class RenderedMenu:
+    """Markdown responses for one catalog snapshot.
+
+    Every menu line, category block and offer line is formatted once when the snapshot is first
+    rendered and joined in a single pass, so showing the menu is a lookup and a filtered list is a
+    join over precomputed lines. A new catalog version gets a new RenderedMenu.
+    """
+
+    def __init__(self, snapshot: CatalogSnapshot, max_filters: int = 256):
+        self.version = snapshot.version
+        self._snapshot = snapshot
+        self._filter_lines: Dict[int, str] = {}
+        blocks: Dict[str, Tuple[str, List[str]]] = {}
+        for row in snapshot.items:
+            item_id, name, description, category, price = row[:5]
+            self._filter_lines[item_id] = f"- {name} ({category}): ${price:.2f} - {description}\n"
+            blocks.setdefault((category or "").lower(), (category or "", []))[1].append(
+                f"- {name}: ${price:.2f} - {description}")
+        # category (lowercase) -> "**CATEGORY**" block, in menu order
+        self.category_blocks = {key: f"\n**{category.upper()}**\n" + "\n".join(lines)
+                                for key, (category, lines) in blocks.items()}
+        self.menu = MENU_HEADER + "".join(self.category_blocks.values()) if snapshot.items else None
+        self._offer_blocks = [_offer_block(offer) for offer in snapshot.offers]
+        self._filtered: "OrderedDict[Tuple, Optional[str]]" = OrderedDict()
+        self._max_filters = max_filters
+        self._lock = threading.Lock()
+
+    def category(self, category: str) -> Optional[str]:
+        block = self.category_blocks.get(category.strip().lower())
+        return MENU_HEADER + block if block else None
+
+    def filtered(self, criteria: Dict[str, Any]) -> Optional[str]:
+        """Items matching get_filtered_menu-style criteria, or None if nothing matches."""
+        key = (criteria.get('category', '').lower(), criteria.get('max_price'),
+               tuple(sorted(ingredient.lower() for ingredient in criteria.get('ingredients_exclude', []))))
+        with self._lock:
+            if key in self._filtered:
+                self._filtered.move_to_end(key)
+                return self._filtered[key]
+        rows = filter_rows(self._snapshot.items, criteria)
+        response = FILTER_HEADER + "".join(self._filter_lines[row[0]] for row in rows) if rows else None
+        with self._lock:
+            self._filtered[key] = response
+            while len(self._filtered) > self._max_filters:
+                self._filtered.popitem(last=False)
+        return response
+
+    def offers(self, now: Optional[datetime.time] = None) -> Optional[str]:
+        """Offer list; happy-hour lines say whether the offer is on at `now` (default: current time)."""
+        if not self._offer_blocks:
+            return None
+        current_time = now or datetime.datetime.now().time()
+        parts = [OFFERS_HEADER]
+        for offer_text, happy_hour in self._offer_blocks:
+            if happy_hour is None:
+                parts.append(offer_text)
+                continue
+            from_time, to_time, valid_from, valid_to = happy_hour
+            if from_time <= current_time <= to_time:
+                parts.append(offer_text + " (Currently ON for Happy Hour! 🥳)\n")
+            else:
+                parts.append(offer_text + f" (Happy Hour from {valid_from} to {valid_to})\n")
+        return "".join(parts)
@@ -0,0 +1,72 @@
+from typing import Dict, Optional
+
+
+class OrderLine:
+    __slots__ = ("menu_item_id", "name", "quantity", "price")
+
+    def __init__(self, menu_item_id: int, name: str, quantity: int, price: float):
+        self.menu_item_id = menu_item_id
+        self.name = name
+        self.quantity = quantity
+        self.price = price
+
+    @property
+    def subtotal(self) -> float:
+        return self.quantity * self.price
+
+
+def _cents(amount: float) -> int:
+    return int(round(amount * 100))
+
+
+class SessionOrder:
+    """The pending order as the customer sees it, kept in session state next to its `orders` row.
+
+    Every change the flow writes to order_items is mirrored here, and the running total is
+    adjusted by the change alone (in cents, so it never drifts), which is what the order_items
+    triggers do for orders.total_amount. The summary is rendered from memory, so showing the order
+    after each change costs no query however many lines it has.
+    """
+
+    def __init__(self, order_id: int):
+        self.order_id = order_id
+        self.lines: Dict[int, OrderLine] = {}  # menu item id -> line, in the order first added
+        self._total_cents = 0
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def total(self) -> float:
+        return self._total_cents / 100
+
+    def add(self, menu_item_id: int, name: str, quantity: int, price: float):
+        """Adds to the line for the item, as add_order_item does; the line keeps its first price."""
+        line = self.lines.get(menu_item_id)
+        if line is None:
+            self.lines[menu_item_id] = line = OrderLine(menu_item_id, name, 0, price)
+        line.quantity += quantity
+        self._total_cents += quantity * _cents(line.price)
+
+    def set_quantity(self, menu_item_id: int, quantity: int):
+        if quantity <= 0:
+            self.remove(menu_item_id)
+            return
+        line = self.lines.get(menu_item_id)
+        if line is not None:
+            self._total_cents += (quantity - line.quantity) * _cents(line.price)
+            line.quantity = quantity
+
+    def remove(self, menu_item_id: int) -> Optional[OrderLine]:
+        line = self.lines.pop(menu_item_id, None)
+        if line is not None:
+            self._total_cents -= line.quantity * _cents(line.price)
+        return line
+
+    def summary(self) -> str:
+        if not self.lines:
+            return ""
+        parts = ["Your current order:\n"]
+        parts.extend(f"- {line.quantity}x {line.name} (${line.subtotal:.2f})\n" for line in self.lines.values())
+        parts.append(f"Total: ${self.total:.2f}\n")
+        return "".join(parts)
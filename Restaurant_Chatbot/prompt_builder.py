@@ -0,0 +1,202 @@
+import re
+import textwrap
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from search_index import normalize_text
+
+HISTORY_TOKENS = 400  # Budget for earlier messages in the conversation window
+FACTS_TOKENS = 250  # Budget for menu and restaurant facts looked up for the question
+SUMMARY_TOKENS = 60  # Budget for the line standing in for messages that did not fit
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+_FACTS_HEADER = "Facts from the restaurant database:\n"
+
+# Words that make a fact relevant to the question
+HOURS_WORDS = frozenset(("open", "opening", "opens", "close", "closing", "closes", "hours", "today", "tonight",
+                         "tomorrow", "weekend", "sunday", "saturday", "when", "late", "early"))
+LOCATION_WORDS = frozenset(("address", "where", "located", "location", "directions", "find", "parking", "near"))
+CONTACT_WORDS = frozenset(("phone", "call", "number", "contact", "reach"))
+OFFER_WORDS = frozenset(("offer", "offers", "deal", "deals", "discount", "discounts", "happy", "promotion",
+                         "promotions", "special", "specials", "combo", "cheap"))
+
+
+def count_tokens(text: str) -> int:
+    """Approximate Llama 3 token count: common words are one token, long words about one per six
+    letters, numbers one per three digits and each punctuation mark one. Within ~10% on English.
+
+    The Llama 3 tokenizer is not shipped with langchain_groq, so budgets are estimates; pass the
+    tokenizer's counter as PromptBuilder(count=...) where it is available."""
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        tokens += 1 + (len(piece) - 1) // 6 if piece[0].isalpha() else 1
+    return tokens
+
+
+def compact_prompt(text: str) -> str:
+    """Drops the indentation, markdown emphasis and blank lines of a prompt written inline in code."""
+    lines = (line.strip() for line in textwrap.dedent(text).replace("**", "").splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class PromptStats:
+    __slots__ = ("system", "facts", "history", "summary", "input", "dropped")
+
+    def __init__(self, system: int, facts: int, history: int, summary: int, input: int, dropped: int):
+        self.system = system
+        self.facts = facts
+        self.history = history
+        self.summary = summary
+        self.input = input
+        self.dropped = dropped  # Window messages left out of the prompt
+
+    @property
+    def total(self) -> int:
+        return self.system + self.facts + self.history + self.summary + self.input
+
+    def __repr__(self):
+        return (f"PromptStats(total={self.total}, system={self.system}, facts={self.facts}, "
+                f"history={self.history}, summary={self.summary}, input={self.input}, dropped={self.dropped})")
+
+
+class PromptBuilder:
+    """Assembles the LLM messages for one turn within a token budget.
+
+    The system prompt is compacted and counted once. Earlier messages are added newest first until
+    `history_tokens` is used up, and the customer's part of what did not fit is squeezed into one
+    summary line. Facts the question needs (menu items it names, a category's dishes, opening
+    hours, address, phone, offers) are looked up in the menu catalog and restaurant info and added
+    to the system message, up to `facts_tokens`.
+    """
+
+    def __init__(self, system_prompt: str, catalog, db, history_tokens: int = HISTORY_TOKENS,
+                 facts_tokens: int = FACTS_TOKENS, count: Callable[[str], int] = count_tokens):
+        self.catalog = catalog
+        self.db = db
+        self.history_tokens = history_tokens
+        self.facts_tokens = facts_tokens
+        self.count = count
+        self.system_prompt = compact_prompt(system_prompt)
+        self.system_tokens = count(self.system_prompt)
+        self._system_message = SystemMessage(content=self.system_prompt)
+        self._info: Optional[Tuple] = None
+        self._info_version: Optional[int] = None  # Catalog version _info was read at
+        self._counts: Dict[str, int] = {}  # Message text -> tokens, for window messages seen again next turn
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "prompt_tokens": 0, "max_prompt_tokens": 0}
+
+    def _tokens(self, text: str) -> int:
+        with self._lock:
+            tokens = self._counts.get(text)
+        if tokens is None:
+            tokens = self.count(text)
+            with self._lock:
+                if len(self._counts) > 4096:
+                    self._counts.clear()
+                self._counts[text] = tokens
+        return tokens
+
+    def restaurant_info(self) -> Optional[Tuple]:
+        """Name, address, phone and opening hours, re-read when the catalog version moves on."""
+        version = self.catalog.version
+        if self._info_version != version:
+            info = self.db.get_restaurant_info()
+            with self._lock:
+                self._info, self._info_version = info, version
+        return self._info
+
+    def facts(self, user_input: str) -> List[str]:
+        """Fact lines relevant to the question, most specific first."""
+        words = normalize_text(user_input).split()
+        word_set = set(words)
+        facts = []
+        snapshot = self.catalog.snapshot
+        named = [snapshot.by_name[key.lower()] for _, _, key in snapshot.name_trie.scan(words)]
+        for category, rows in snapshot.by_category.items():
+            if category and (category in word_set or category + "s" in word_set):
+                named.extend(rows)
+        seen = set()
+        for row in named:
+            if row[0] not in seen:
+                seen.add(row[0])
+                facts.append(f"Menu: {row[1]} ({row[3]}) ${row[4]:.2f} - {row[2]}"
+                             + (f" Ingredients: {row[5]}." if row[5] else ""))
+        info = self.restaurant_info()
+        if info:
+            if word_set & HOURS_WORDS:
+                facts.append(f"Opening hours: {info[3]}")
+            if word_set & LOCATION_WORDS:
+                facts.append(f"Address: {info[1]}")
+            if word_set & CONTACT_WORDS:
+                facts.append(f"Phone: {info[2]}")
+        if word_set & OFFER_WORDS:
+            for name, description, discount, valid_from, valid_to, is_happy_hour in self.catalog.offers():
+                facts.append(f"Offer: {name} - {description} ({valid_from}-{valid_to})")
+        return facts
+
+    def build(self, user_input: str, window: Iterable[Tuple[str, str]]) -> Tuple[List[BaseMessage], PromptStats]:
+        """(messages for the LLM, token counts) for `user_input` after the (role, content) window."""
+        facts, facts_tokens = [], 0
+        for fact in self.facts(user_input):
+            tokens = self._tokens(fact)
+            if facts_tokens + tokens > self.facts_tokens:
+                break
+            facts.append(fact)
+            facts_tokens += tokens
+
+        window = list(window)
+        kept, history_tokens = [], 0
+        for role, content in reversed(window):
+            tokens = self._tokens(content)
+            if history_tokens + tokens > self.history_tokens:
+                break
+            kept.append((role, content))
+            history_tokens += tokens
+        kept.reverse()
+        dropped = window[:len(window) - len(kept)]
+        earlier = [content for role, content in dropped if role == "user"]
+        summary = self._summary(earlier) if earlier else ""
+        summary_tokens = self._tokens(summary) if summary else 0
+
+        system = self._system_message
+        if facts or summary:
+            extra = [self.system_prompt]
+            if facts:
+                extra.append(_FACTS_HEADER + "\n".join(facts))
+                facts_tokens += self._tokens(_FACTS_HEADER)
+            if summary:
+                extra.append(summary)
+            system = SystemMessage(content="\n".join(extra))
+        messages = [system]
+        messages.extend(HumanMessage(content=content) if role == "user" else AIMessage(content=content)
+                        for role, content in kept)
+        messages.append(HumanMessage(content=user_input))
+
+        stats = PromptStats(self.system_tokens, facts_tokens, history_tokens, summary_tokens,
+                            self._tokens(user_input), len(dropped))
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += stats.total
+            self.stats["max_prompt_tokens"] = max(self.stats["max_prompt_tokens"], stats.total)
+        return messages, stats
+
+    def _summary(self, earlier: List[str]) -> str:
+        # Newest first, so the most recent requests survive the cut
+        parts, tokens = [], self._tokens("Earlier the customer said:")
+        for content in reversed(earlier):
+            part = f' "{content.strip()}"'
+            part_tokens = self._tokens(part)
+            if tokens + part_tokens > SUMMARY_TOKENS:
+                break
+            parts.append(part)
+            tokens += part_tokens
+        return "Earlier the customer said:" + ";".join(reversed(parts)) if parts else ""
+
+    def metrics(self) -> Dict[str, float]:
+        """Calls, total and largest prompt size so far, and the average prompt size."""
+        with self._lock:
+            metrics = dict(self.stats)
+        metrics["avg_prompt_tokens"] = metrics["prompt_tokens"] / metrics["calls"] if metrics["calls"] else 0.0
+        return metrics
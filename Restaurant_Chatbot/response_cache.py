@@ -0,0 +1,227 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from search_index import STOPWORDS, normalize_text
+
+# Words that carry the shape of a question, not its subject ("do you have parking" ~ "is there parking")
+QUESTION_WORDS = STOPWORDS | frozenset((
+    "do", "does", "did", "you", "your", "have", "has", "is", "are", "was", "there", "here", "can", "could", "i",
+    "we", "me", "my", "our", "us", "it", "any", "what", "whats", "which", "how", "when", "where", "please", "s",
+    "be", "get", "tell", "about", "this", "that", "at", "if", "will", "would", "some", "y", "u", "allowed",
+    "available", "nearby", "ok", "okay", "possible", "like", "know", "want"))
+
+# Words that point back at an earlier turn ("what about the second one?", "is that vegan?")
+REFERRING_WORDS = frozenset((
+    "it", "its", "that", "this", "those", "these", "them", "they", "their", "one", "ones", "first", "second",
+    "third", "last", "same", "other", "another", "else", "also", "too", "instead", "again", "then", "yes", "no",
+    "yeah", "nope", "sure", "ok", "okay", "he", "she", "him", "her"))
+
+
+def is_self_contained(question: str) -> bool:
+    """True when a question can be answered without the turns before it, so its answer can be shared."""
+    words = normalize_text(question).split()
+    if len(words) < 3 or words[0] in ("and", "but", "so") or words[:2] in (["what", "about"], ["how", "about"]):
+        return False
+    return not REFERRING_WORDS.intersection(words)
+
+
+def content_words(text: str) -> List[str]:
+    """A question's words minus QUESTION_WORDS, with plurals folded ("any wifis?" -> ["wifi"])."""
+    words = []
+    for word in normalize_text(text).split():
+        if word in QUESTION_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+def same_subject(words: List[str], other: List[str]) -> bool:
+    """True when every content word of each question appears in the other's, spelling aside.
+
+    Words are compared against the other question's words run together, so "wi fi" matches "wifi",
+    but "vegan" never matches "vegetarian" nor "friday" "saturday", however many trigrams they share.
+    """
+    joined, other_joined = "".join(words), "".join(other)
+    return all(word in other_joined for word in words) and all(word in joined for word in other)
+
+
+def text_embedding(text: str) -> Dict[str, float]:
+    """Sparse, L2-normalised vector of character trigrams over a question's content words.
+
+    Question words are dropped, plurals folded and the remaining words joined, so "is there wifi?",
+    "do you have wi-fi" and "any wifis available" all land on the same vector.
+    """
+    words = content_words(text)
+    joined = f" {''.join(words)} " if words else ""
+    vector: Dict[str, float] = {}
+    for i in range(len(joined) - 2):
+        gram = joined[i:i + 3]
+        vector[gram] = vector.get(gram, 0.0) + 1.0
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {gram: weight / norm for gram, weight in vector.items()} if norm else {}
+
+
+class _Entry:
+    __slots__ = ("question", "response", "vector", "words", "expires_at")
+
+    def __init__(self, question: str, response: str, vector: Dict[str, float], words: List[str],
+                 expires_at: float):
+        self.question = question
+        self.response = response
+        self.vector = vector
+        self.words = words
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    """Two-tier cache of LLM answers to stand-alone questions.
+
+    The exact tier is a dict keyed by normalized question text. The semantic tier finds the stored
+    question whose embedding has the highest cosine similarity with the new one, through an
+    inverted index over embedding features, and returns its answer when the score reaches
+    `min_similarity` and both questions have the same content words (see same_subject), since
+    near-identical trigrams do not make "side street entrance" the same question as "main street
+    entrance". Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_entries` is reached.
+
+    Answers may quote the menu and offers, so get() and put() take the catalog version the answer
+    was generated against. The first put() for a newer version drops every older entry, and a
+    lookup or put for an older version than the cache holds is a miss.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 6 * 3600, min_similarity: float = 0.8,
+                 embed: Callable[[str], Dict[str, float]] = text_embedding):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self.embed = embed
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # normalized question -> entry, LRU first
+        self._postings: Dict[str, set] = {}  # embedding feature -> normalized questions
+        self._lock = threading.Lock()
+        self.version: Optional[int] = None  # Catalog version of every entry
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(question: str) -> str:
+        return normalize_text(question)
+
+    def get(self, question: str, version: Optional[int] = None) -> Optional[str]:
+        """Cached answer for the question or a close rephrasing of it, else None."""
+        key = self.key(question)
+        if not key:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            if not self._at_version(version):
+                self.stats["misses"] += 1
+                return None
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry.response
+            match = self._nearest(self.embed(question), content_words(question), now)
+            if match is not None:
+                self._entries.move_to_end(match[0])
+                self.stats["semantic_hits"] += 1
+                return match[1].response
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question: str, response: str, version: Optional[int] = None):
+        key = self.key(question)
+        if not key or not response:
+            return
+        vector = self.embed(question)
+        with self._lock:
+            if not self._at_version(version):
+                return
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+            self._entries[key] = _Entry(question, response, vector, content_words(question),
+                                        time.monotonic() + self.ttl)
+            for feature in vector:
+                self._postings.setdefault(feature, set()).add(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+
+    def metrics(self) -> Dict[str, float]:
+        """Counters plus the current size and overall hit rate."""
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics["entries"] = len(self._entries)
+        lookups = metrics["exact_hits"] + metrics["semantic_hits"] + metrics["misses"]
+        metrics["hit_rate"] = (metrics["exact_hits"] + metrics["semantic_hits"]) / lookups if lookups else 0.0
+        return metrics
+
+    def _at_version(self, version: Optional[int]) -> bool:
+        # A newer catalog version empties the cache; an older one (a reply that raced a menu edit) is stale
+        if version == self.version:
+            return True
+        if self.version is not None and (version is None or version < self.version):
+            return False
+        self._entries.clear()
+        self._postings.clear()
+        self.version = version
+        return True
+
+    def _live_entry(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._remove(key)
+            self.stats["expirations"] += 1
+            return None
+        return entry
+
+    def _nearest(self, vector: Dict[str, float], words: List[str], now: float) -> Optional[Tuple[str, _Entry]]:
+        scores: Dict[str, float] = {}
+        for feature, weight in vector.items():
+            for key in self._postings.get(feature, ()):
+                scores[key] = scores.get(key, 0.0) + weight * self._entries[key].vector[feature]
+        for key, score in sorted(scores.items(), key=lambda item: -item[1]):
+            if score < self.min_similarity:
+                break
+            if not same_subject(words, self._entries[key].words):
+                continue
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                return key, entry
+        return None
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        for feature in entry.vector:
+            keys = self._postings.get(feature)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[feature]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(model: str, system_prompt: str, temperature: float) -> ResponseCache:
+    """Returns the cache shared by every chatbot that uses the same model, prompt and temperature."""
+    cache_key = (model, system_prompt, temperature)
+    with _caches_lock:
+        cache = _caches.get(cache_key)
+        if cache is None:
+            cache = ResponseCache()
+            _caches[cache_key] = cache
+        return cache
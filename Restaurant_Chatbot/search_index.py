@@ -0,0 +1,183 @@
+import re
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+# Words that never identify a name on their own ("of" in "cup of tea")
+STOPWORDS = frozenset(("a", "an", "and", "the", "of", "with", "in", "on", "or", "to", "for", "de", "la", "le"))
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercases and collapses punctuation/whitespace so 'Mac & Cheese!' and 'mac cheese' compare equal."""
+    return _NON_WORD.sub(' ', (text or '').lower()).strip()
+
+
+def trigrams(text: Optional[str]) -> frozenset:
+    """Character trigrams of every word, padded so short words and word starts still count."""
+    grams = set()
+    for word in normalize_text(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """In-process fuzzy search over weighted text fields.
+
+    Each field keeps a posting list from trigram to documents. A query merges the posting lists
+    of its most selective trigrams to find the documents that overlap it the most, then scores
+    only those few exactly, so lookups stay well under a millisecond on catalogs with tens of
+    thousands of entries while misspelt names still resolve.
+    """
+
+    def __init__(self, field_weights: Dict[str, float], candidates: int = 32, probe_grams: int = 8):
+        self.field_weights = dict(field_weights)
+        self.candidates = candidates  # Documents scored exactly per field
+        self.probe_grams = probe_grams  # Rarest query trigrams used to find them
+        self._keys: List[Hashable] = []
+        # Per field: trigram -> doc ids, and doc id -> the field's trigram set
+        self._postings: Dict[str, Dict[str, List[int]]] = {field: {} for field in self.field_weights}
+        self._grams: Dict[str, Dict[int, frozenset]] = {field: {} for field in self.field_weights}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key: Hashable, **fields: Optional[str]):
+        doc_id = len(self._keys)
+        self._keys.append(key)
+        for field in self.field_weights:
+            grams = trigrams(fields.get(field))
+            if not grams:
+                continue
+            self._grams[field][doc_id] = grams
+            postings = self._postings[field]
+            for gram in grams:
+                postings.setdefault(gram, []).append(doc_id)
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.3) -> List[Tuple[float, Hashable]]:
+        """Returns up to `limit` (score, key) pairs, best first, with scores between 0 and 1."""
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        query_size = len(query_grams)
+        # Trigrams found in a large share of the catalog ("piz", " ch") say little about which
+        # document is meant, so candidates come from the few rarest ones only.
+        common_cutoff = max(64, len(self._keys) // 200)
+        best: Dict[int, float] = {}
+        for field, weight in self.field_weights.items():
+            # A field's similarity never exceeds 1.0 (0.5 + 0.5 for an exact match), so fields
+            # weighted below min_score cannot reach it
+            if weight < min_score:
+                continue
+            postings = self._postings[field]
+            lists = sorted((postings[gram] for gram in query_grams if gram in postings), key=len)
+            selective = [docs for docs in lists[:self.probe_grams] if len(docs) <= common_cutoff] or lists[:2]
+            overlap = Counter()
+            for docs in selective:
+                overlap.update(docs)
+            field_grams = self._grams[field]
+            for doc_id, _ in overlap.most_common(max(limit, self.candidates)):
+                common = len(query_grams & field_grams[doc_id])
+                # Blend "how much of the query is in the field" with overall similarity (Dice)
+                score = weight * (0.5 * common / query_size + common / (query_size + len(field_grams[doc_id])))
+                if score > best.get(doc_id, 0.0):
+                    best[doc_id] = score
+        results = sorted(((score, doc_id) for doc_id, score in best.items() if score >= min_score),
+                         key=lambda result: (-result[0], result[1]))
+        return [(round(min(score, 1.0), 4), self._keys[doc_id]) for score, doc_id in results[:limit]]
+
+
+def _word_variants(words: Tuple[str, ...]):
+    """The phrase plus its last word in singular/plural form ("iced teas" <-> "iced tea")."""
+    yield words
+    *head, last = words
+    if last.endswith("ies") and len(last) > 4:
+        yield (*head, last[:-3] + "y")
+    elif last.endswith(("ches", "shes", "xes", "sses")):
+        yield (*head, last[:-2])
+    elif last.endswith("s") and not last.endswith("ss") and len(last) > 3:
+        yield (*head, last[:-1])
+    elif last.endswith(("ch", "sh", "x", "s", "z")):
+        yield (*head, last + "es")
+    elif last.endswith("y") and len(last) > 2 and last[-2] not in "aeiou":
+        yield (*head, last[:-1] + "ies")
+    elif not last.isdigit():
+        yield (*head, last + "s")
+
+
+class NameTrie:
+    """Word-level trie over a set of names, for finding them inside free text.
+
+    scan() walks the words of an utterance once and returns the longest name starting at each
+    position, so its cost depends on the utterance and the longest name, not on how many names
+    there are. Besides full names, from_names() indexes singular/plural forms and any part of a
+    name that belongs to that name only ("alfredo" -> "Chicken Alfredo").
+    """
+
+    _END = None  # Terminal marker; never collides with a word
+
+    def __init__(self):
+        self._root: Dict[Optional[str], dict] = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, words: Tuple[str, ...], key: Hashable):
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        if self._END not in node:
+            self.size += 1
+        node[self._END] = key
+
+    @classmethod
+    def from_names(cls, names: Iterable[Tuple[str, Hashable]], partials: bool = True) -> "NameTrie":
+        full: Dict[Tuple[str, ...], Hashable] = {}
+        parts: Dict[Tuple[str, ...], set] = {}
+        for name, key in names:
+            words = tuple(normalize_text(name).split())
+            if not words:
+                continue
+            for variant in _word_variants(words):
+                full.setdefault(variant, key)
+            if not partials:
+                continue
+            for start in range(len(words)):
+                for end in range(start + 1, len(words) + 1):
+                    part = words[start:end]
+                    if (part == words or part[0] in STOPWORDS or part[-1] in STOPWORDS
+                            or sum(map(len, part)) < 3 or part[-1].isdigit()):
+                        continue
+                    for variant in _word_variants(part):
+                        parts.setdefault(variant, set()).add(key)
+        trie = cls()
+        for words, keys in parts.items():
+            # Ambiguous parts ("chicken" in two dishes) are left out rather than guessed
+            if len(keys) == 1 and words not in full:
+                trie.add(words, next(iter(keys)))
+        for words, key in full.items():
+            trie.add(words, key)
+        return trie
+
+    def scan(self, words: List[str]) -> List[Tuple[int, int, Hashable]]:
+        """Non-overlapping (start, end, key) word spans, leftmost first, longest name at each start."""
+        spans = []
+        position, count = 0, len(words)
+        while position < count:
+            node = self._root
+            match = None
+            cursor = position
+            while cursor < count:
+                node = node.get(words[cursor])
+                if node is None:
+                    break
+                cursor += 1
+                if self._END in node:
+                    match = (cursor, node[self._END])
+            if match:
+                spans.append((position, match[0], match[1]))
+                position = match[0]
+            else:
+                position += 1
+        return spans
@@ -0,0 +1,301 @@
+import bisect
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+from availability import seating_minutes, to_minutes
+
+# Most tables pushed together for one party
+MAX_COMBINED_TABLES = 3
+# Seatings tried per booking when the repair pass looks for one booking to move out of the way
+REPAIR_OPTIONS = 48
+
+
+class Booking:
+    """One party on one day: when it sits down, when it leaves and which tables it holds now."""
+
+    __slots__ = ("key", "start", "end", "party_size", "tables")
+
+    def __init__(self, key: Hashable, start: int, party_size: int, tables: Sequence[int] = (),
+                 duration: Optional[int] = None):
+        self.key = key
+        self.start = start
+        self.end = start + (duration if duration is not None else seating_minutes(party_size))
+        self.party_size = party_size
+        self.tables = tuple(tables)
+
+    def __repr__(self):
+        return f"Booking({self.key!r}, {self.start}-{self.end}, party of {self.party_size}, tables {self.tables})"
+
+
+class TablePlan:
+    """Tables chosen for each booking, plus the bookings that could not be seated."""
+
+    def __init__(self, assignment: Dict[Hashable, Tuple[int, ...]], unseated: List[Booking],
+                 bookings: Iterable[Booking]):
+        self.assignment = assignment
+        self.unseated = unseated
+        self._bookings = {booking.key: booking for booking in bookings}
+
+    @property
+    def seated_covers(self) -> int:
+        return sum(self._bookings[key].party_size for key in self.assignment)
+
+    def moves(self) -> Dict[Hashable, Tuple[int, ...]]:
+        """Bookings whose tables differ from the ones they hold now, with their new tables."""
+        return {key: tables for key, tables in self.assignment.items()
+                if self._bookings[key].tables and set(tables) != set(self._bookings[key].tables)}
+
+
+class _Schedule:
+    """Per-table intervals sorted by start, with the booking holding each one.
+
+    Intervals the planner adds never overlap, but existing rows may (double bookings from before
+    the unique slot index), so as in DayAvailability a running max of end times is kept per table.
+    """
+
+    def __init__(self, table_ids: Iterable[int]):
+        self._starts: Dict[int, List[int]] = {table_id: [] for table_id in table_ids}
+        self._ends: Dict[int, List[int]] = {table_id: [] for table_id in self._starts}
+        self._max_ends: Dict[int, List[int]] = {table_id: [] for table_id in self._starts}
+        self._keys: Dict[int, List[Hashable]] = {table_id: [] for table_id in self._starts}
+
+    def is_free(self, table_id: int, start: int, end: int) -> bool:
+        starts = self._starts.get(table_id)
+        if starts is None:
+            return False
+        # Intervals starting before `end`; the latest-ending of them must end by `start`
+        index = bisect.bisect_left(starts, end)
+        return index == 0 or self._max_ends[table_id][index - 1] <= start
+
+    def conflicts(self, table_id: int, start: int, end: int) -> List[Hashable]:
+        ends, max_ends = self._ends[table_id], self._max_ends[table_id]
+        index = bisect.bisect_left(self._starts[table_id], end)
+        keys = []
+        while index > 0 and max_ends[index - 1] > start:
+            index -= 1
+            if ends[index] > start:
+                keys.append(self._keys[table_id][index])
+        return keys
+
+    def occupy(self, tables: Tuple[int, ...], booking: Booking):
+        for table_id in tables:
+            index = bisect.bisect_left(self._starts[table_id], booking.start)
+            self._starts[table_id].insert(index, booking.start)
+            self._ends[table_id].insert(index, booking.end)
+            self._keys[table_id].insert(index, booking.key)
+            self._update_max_ends(table_id, index)
+
+    def release(self, tables: Tuple[int, ...], booking: Booking):
+        for table_id in tables:
+            index = self._keys[table_id].index(booking.key)
+            del self._starts[table_id][index], self._ends[table_id][index], self._keys[table_id][index]
+            self._update_max_ends(table_id, index)
+
+    def _update_max_ends(self, table_id: int, index: int):
+        # Entries before `index` are unchanged; recompute the running max from there on
+        max_ends = self._max_ends[table_id]
+        latest = max_ends[index - 1] if index else 0
+        del max_ends[index:]
+        for end in self._ends[table_id][index:]:
+            latest = max(latest, end)
+            max_ends.append(latest)
+
+
+class TableAssigner:
+    """Seats a day's bookings on single or combined tables so that as many covers as possible sit down.
+
+    Tables are (id, table_number, capacity, combine_group). Tables sharing a combine_group stand
+    next to each other in id order and can be pushed together, up to MAX_COMBINED_TABLES at a time;
+    tables without a group are only ever used alone. plan() runs best-fit decreasing (largest
+    parties first, each on the free seating that wastes the fewest seats) followed by a repair pass
+    that seats leftover parties by moving one other booking elsewhere. place() adds a single booking,
+    trying the cheap options first so most requests need no moves at all.
+    """
+
+    def __init__(self, tables: Sequence[Tuple], max_combined: int = MAX_COMBINED_TABLES):
+        self.tables = {table[0]: table for table in tables}
+        self._capacity = {table[0]: table[2] for table in tables}
+        # Every seating as (seats, table count, table ids), best fit first
+        seatings = [(table[2], 1, (table[0],)) for table in tables]
+        groups: Dict[str, List[Tuple]] = {}
+        for table in sorted(tables, key=lambda table: table[0]):
+            if len(table) > 3 and table[3]:
+                groups.setdefault(table[3], []).append(table)
+        for members in groups.values():
+            for size in range(2, max_combined + 1):
+                for first in range(len(members) - size + 1):
+                    run = members[first:first + size]
+                    seatings.append((sum(table[2] for table in run), size, tuple(table[0] for table in run)))
+        self._seatings = sorted(seatings)
+        self._options: Dict[int, List[Tuple[int, Tuple[int, ...]]]] = {}
+
+    def options(self, party_size: int) -> List[Tuple[int, Tuple[int, ...]]]:
+        """(seats, table ids) big enough for the party, fewest spare seats first, leaving out
+        combinations that would still fit it without their smallest table."""
+        options = self._options.get(party_size)
+        if options is None:
+            options = [(seats, ids) for seats, count, ids in self._seatings
+                       if seats >= party_size and (count == 1 or seats - min(map(self._capacity.get, ids)) < party_size)]
+            self._options[party_size] = options
+        return options
+
+    def plan(self, bookings: Sequence[Booking], pinned: FrozenSet[Hashable] = frozenset()) -> TablePlan:
+        """Assigns every booking from scratch; pinned bookings keep the tables they hold."""
+        schedule = _Schedule(self._capacity)
+        assignment: Dict[Hashable, Tuple[int, ...]] = {}
+        rest = []
+        for booking in bookings:
+            if booking.key in pinned and booking.tables:
+                schedule.occupy(booking.tables, booking)
+                assignment[booking.key] = booking.tables
+            else:
+                rest.append(booking)
+        unseated = []
+        # Tables only fill up in this pass, so a (party size, start, end) that found nothing once never will
+        full = set()
+        for booking in sorted(rest, key=lambda booking: (-booking.party_size, booking.start - booking.end, booking.start)):
+            shape = (booking.party_size, booking.start, booking.end)
+            tables = None if shape in full else self._best_seating(schedule, booking)
+            if tables:
+                schedule.occupy(tables, booking)
+                assignment[booking.key] = tables
+            else:
+                full.add(shape)
+                unseated.append(booking)
+        by_key = {booking.key: booking for booking in bookings}
+        still_unseated = []
+        failed = set()  # Shapes the repair pass could not seat since its last success
+        for booking in unseated:
+            shape = (booking.party_size, booking.start, booking.end)
+            if shape not in failed and self._repair(schedule, assignment, by_key, booking, pinned):
+                failed.clear()
+            else:
+                failed.add(shape)
+                still_unseated.append(booking)
+        return TablePlan(assignment, still_unseated, bookings)
+
+    def place(self, bookings: Sequence[Booking], new: Booking,
+              pinned: FrozenSet[Hashable] = frozenset()) -> Optional[Tuple[Tuple[int, ...], Dict[Hashable, Tuple[int, ...]]]]:
+        """(tables for `new`, moves of other bookings) that seat `new` without unseating anyone, or None.
+
+        `bookings` are the day's existing bookings with the tables they hold.
+        """
+        schedule = _Schedule(self._capacity)
+        assignment = {}
+        for booking in bookings:
+            if booking.tables:
+                schedule.occupy(booking.tables, booking)
+                assignment[booking.key] = booking.tables
+        # 1. A free seating as things stand
+        tables = self._best_seating(schedule, new)
+        if tables:
+            return tables, {}
+        # 2. Free one by moving a single booking
+        by_key = {booking.key: booking for booking in bookings}
+        by_key[new.key] = new
+        before = dict(assignment)
+        if self._repair(schedule, assignment, by_key, new, pinned):
+            moves = {key: value for key, value in assignment.items() if key != new.key and before.get(key) != value}
+            return assignment[new.key], moves
+        # 3. Re-plan the whole day and keep the result only if nobody loses their table
+        plan = self.plan(list(bookings) + [new], pinned)
+        if plan.unseated:
+            return None
+        return plan.assignment[new.key], {key: value for key, value in plan.moves().items() if key != new.key}
+
+    def _best_seating(self, schedule: _Schedule, booking: Booking) -> Optional[Tuple[int, ...]]:
+        best, best_seats = None, 0
+        start, end, is_free = booking.start, booking.end, schedule.is_free
+        for seats, tables in self.options(booking.party_size):
+            if best is not None and seats > best_seats:
+                break
+            if (is_free(tables[0], start, end) if len(tables) == 1
+                    else all(is_free(table_id, start, end) for table_id in tables)):
+                if best is None:
+                    best, best_seats = tables, seats
+                # Equally good and already held: keep the booking where it is
+                if set(tables) == set(booking.tables):
+                    return tables
+                if not booking.tables:
+                    break
+        return best
+
+    def _repair(self, schedule: _Schedule, assignment: Dict[Hashable, Tuple[int, ...]],
+                by_key: Dict[Hashable, Booking], booking: Booking, pinned: FrozenSet[Hashable]) -> bool:
+        """Seats `booking` by moving exactly one conflicting, unpinned booking to another free seating."""
+        for _, tables in self.options(booking.party_size)[:REPAIR_OPTIONS]:
+            blocking = set()
+            for table_id in tables:
+                blocking.update(schedule.conflicts(table_id, booking.start, booking.end))
+                if len(blocking) > 1:
+                    break
+            if len(blocking) != 1:
+                continue
+            other = by_key[blocking.pop()]
+            if other.key in pinned:
+                continue
+            held = assignment[other.key]
+            schedule.release(held, other)
+            schedule.occupy(tables, booking)
+            moved_to = self._best_seating(schedule, Booking(other.key, other.start, other.party_size,
+                                                            duration=other.end - other.start))
+            if moved_to:
+                schedule.occupy(moved_to, other)
+                assignment[other.key] = moved_to
+                assignment[booking.key] = tables
+                return True
+            schedule.release(tables, booking)
+            schedule.occupy(held, other)
+        return False
+
+
+class TablePlanner:
+    """Database-backed TableAssigner: loads a day's tables and bookings and writes back moves."""
+
+    def __init__(self, db, availability, max_combined: int = MAX_COMBINED_TABLES):
+        self.db = db
+        self.availability = availability
+        self.max_combined = max_combined
+        self._assigner: Optional[TableAssigner] = None
+        self._layout: Optional[Tuple] = None
+
+    def assigner(self) -> TableAssigner:
+        layout = tuple(self.db.get_table_layout())
+        if layout != self._layout:
+            self._assigner = TableAssigner(layout, self.max_combined)
+            self._layout = layout
+        return self._assigner
+
+    def bookings(self, date: str) -> List[Booking]:
+        tables: Dict[int, List[int]] = {}
+        rows = {}
+        for reservation_id, table_id, reservation_time, party_size in self.db.get_reservations_for_date(date):
+            tables.setdefault(reservation_id, []).append(table_id)
+            rows[reservation_id] = (reservation_time, party_size)
+        return [Booking(reservation_id, to_minutes(reservation_time), party_size, tables[reservation_id])
+                for reservation_id, (reservation_time, party_size) in rows.items()]
+
+    def place(self, party_size: int, date: str, time: str) -> Optional[Tuple[List[Tuple], Dict[int, Tuple[int, ...]]]]:
+        """([(id, table_number, capacity), ...] for the new party, moves of existing bookings), or None."""
+        start = to_minutes(time)
+        hours = self.availability.hours_for(date)
+        # Like DayAvailability.is_open: a seating starting before closing may run past it
+        if hours is not None and not hours[0] <= start < hours[1]:
+            return None
+        assigner = self.assigner()
+        placed = assigner.place(self.bookings(date), Booking(None, start, party_size))
+        if placed is None:
+            return None
+        tables, moves = placed
+        return [assigner.tables[table_id][:3] for table_id in tables], moves
+
+    def replan(self, date: str, pinned: FrozenSet[int] = frozenset()) -> TablePlan:
+        """Best assignment for all of a day's bookings; apply it with apply(plan.moves())."""
+        return self.assigner().plan(self.bookings(date), pinned)
+
+    def apply(self, moves: Dict[int, Tuple[int, ...]]) -> bool:
+        return self.db.reassign_tables(moves) if moves else True
+
+
+def table_label(tables: Sequence[Tuple]) -> str:
+    """'Table 2' or 'Table 2 + Table 5' for (id, table_number, capacity) rows."""
+    return " + ".join(table[1] for table in tables)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# The chatbot modules import each other as top-level modules, as when run from Restaurant_Chatbot/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+from langchain_core.language_models import FakeListChatModel  # noqa: E402
+
+from chat_engine import ChatEngine  # noqa: E402
+from database import RestaurantDatabase  # noqa: E402
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    """Builds ChatEngines on one fresh seeded database file, each with the fake chat model it is given."""
+    db = RestaurantDatabase(str(tmp_path / "restaurant.db"))
+    engines = []
+
+    def make_engine(llm, **kwargs):
+        engines.append(ChatEngine(llm, db=db, **kwargs))
+        return engines[-1]
+
+    yield make_engine
+    for engine in engines:
+        engine.response_cache.clear()  # Shared by every engine on the same model and prompt
+    db.pool.close_all()
+
+
+@pytest.fixture
+def engine(make_engine):
+    """A ChatEngine with a fake chat model instead of Groq."""
+    return make_engine(FakeListChatModel(responses=["We are happy to help with that."]))
+
+
+@pytest.fixture
+def introduce():
+    """Takes a chatbot through the greeting and contact questions, as a new customer does."""
+    def introduce(chatbot, name="Ann", phone="555-111-2222"):
+        for message in ("hello", name, phone, "no thanks"):
+            chatbot.process_user_input(message)
+        return chatbot
+    return introduce
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+
+
+@pytest.fixture
+def client(engine):
+    api.app.state.engine = engine  # Outside the lifespan, which would build a ChatEngine on Groq
+    return TestClient(api.app)
+
+
+def test_sessions_need_their_token(client):
+    session = client.post("/sessions").json()
+    url = f"/sessions/{session['session_id']}/messages"
+    auth = {"Authorization": f"Bearer {session['token']}"}
+
+    assert client.post(url, json={"message": "hello"}, headers=auth).status_code == 200
+    assert [turn["role"] for turn in client.get(url, headers=auth).json()] == ["user", "assistant"]
+
+    assert client.get(url).status_code == 404
+    assert client.get(url, headers={"Authorization": "Bearer guessed"}).status_code == 404
+    assert client.post(url, json={"message": "hello"}).status_code == 404
+
+
+def test_client_chosen_session_ids_are_rejected(client):
+    auth = {"Authorization": "Bearer anything"}
+
+    assert client.post("/sessions/my-own-id/messages", json={"message": "hello"}, headers=auth).status_code == 404
+    assert client.get("/sessions/my-own-id/messages", headers=auth).status_code == 404
+
+
+def test_ended_session_is_gone(client):
+    session = client.post("/sessions").json()
+    url = f"/sessions/{session['session_id']}"
+    auth = {"Authorization": f"Bearer {session['token']}"}
+
+    assert client.delete(url, headers=auth).status_code == 204
+    assert client.get(f"{url}/messages", headers=auth).status_code == 404
@@ -0,0 +1,47 @@
+from availability import DayAvailability, to_minutes
+
+TABLES = [(1, "T1", 2), (2, "T2", 4)]
+HOURS = (to_minutes("11:00"), to_minutes("22:00"))
+
+
+def test_a_seating_may_run_past_closing_time():
+    day = DayAvailability("2026-11-02", TABLES, [], HOURS)
+
+    # A party of four keeps its table for two hours, until 23:30
+    assert day.free_tables(4, to_minutes("21:30")) == [(2, "T2", 4)]
+    assert day.free_slots(4, after=to_minutes("21:00")) == [to_minutes("21:00"), to_minutes("21:30")]
+    # No one sits down at or after closing, or before opening
+    assert day.free_tables(2, to_minutes("22:00")) == []
+    assert day.free_tables(2, to_minutes("10:30")) == []
+
+
+def test_late_bookings_still_block_their_tables():
+    day = DayAvailability("2026-11-02", TABLES, [(7, 2, "21:30", 4)], HOURS)
+
+    assert day.free_tables(4, to_minutes("21:00")) == []
+    assert day.free_tables(2, to_minutes("21:00")) == [(1, "T1", 2)]
+
+
+def test_a_large_party_can_sit_at_combined_tables():
+    # (id, table_number, capacity, combine_group): the three window tables seat eight together
+    layout = [(1, "T1", 2, "window"), (2, "T2", 4, None), (3, "T3", 6, None), (4, "T4", 2, "window"),
+              (5, "T5", 4, "window")]
+    day = DayAvailability("2026-11-02", layout, [], HOURS)
+
+    assert day.free_tables(8, to_minutes("19:00")) == []
+    assert day.free_seatings(8, to_minutes("19:00")) == [(1, 4, 5)]
+    assert to_minutes("19:00") in day.free_slots(8)
+
+    # Any one of them booked splits the window group
+    day = DayAvailability("2026-11-02", layout, [(7, 4, "18:00", 2)], HOURS)
+    assert not day.can_seat(8, to_minutes("19:00"))
+    assert day.can_seat(8, to_minutes("19:30"))
+
+
+def test_engine_offers_the_slots_the_planner_can_book_for_a_large_party(engine):
+    slots = engine.availability.free_slots(8, "2026-11-02")
+
+    assert slots
+    assert engine.availability.earliest_slot(8, "2026-11-02") == ("2026-11-02", slots[0])
+    tables, moves = engine.table_planner.place(8, "2026-11-02", slots[0])
+    assert len(tables) > 1 and moves == {}
@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+QUESTION = "can I bring my dog to the restaurant?"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Streams each reply in `replies` as the given chunks; a chunk that is an exception is raised there."""
+
+    replies: list
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content = "".join(chunk.message.content for chunk in self._stream(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        reply = self.replies[self.calls % len(self.replies)]
+        self.calls += 1
+        for chunk in reply:
+            if isinstance(chunk, Exception):
+                raise chunk
+            if isinstance(chunk, str):
+                chunk = AIMessageChunk(content=chunk)
+            yield ChatGenerationChunk(message=chunk)
+
+
+def transcript(engine, chatbot):
+    return [(role, content) for _, role, content, _ in engine.db.get_turns(chatbot.session_state.session_id, 100)]
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_llm_reply_is_streamed_in_pieces(engine, introduce):
+    chatbot = introduce(engine.session())
+
+    chunks = list(chatbot.stream_user_input(QUESTION))
+
+    assert "".join(chunks) == "We are happy to help with that."
+    assert len(chunks) > 1  # The fake model streams one character at a time
+    assert transcript(engine, chatbot)[-2:] == [("user", QUESTION), ("assistant", "We are happy to help with that.")]
+
+
+def test_astream_yields_the_same_pieces(engine, introduce):
+    chatbot = introduce(engine.session())
+    session_id = chatbot.session_state.session_id
+
+    chunks = asyncio.run(collect(engine.astream(session_id, QUESTION)))
+
+    assert "".join(chunks) == "We are happy to help with that."
+    assert len(chunks) > 1
+    assert transcript(engine, chatbot)[-1] == ("assistant", "We are happy to help with that.")
+
+
+def test_database_replies_do_not_call_the_model(make_engine, introduce):
+    llm = ScriptedChatModel(replies=[[RuntimeError("the model should not be called")]])
+    chatbot = introduce(make_engine(llm).session())
+
+    chunks = list(chatbot.stream_user_input("show me the menu"))
+
+    assert len(chunks) == 1 and "Margherita Pizza" in chunks[0]
+    assert llm.calls == 0
+
+
+def test_tool_call_chunks_are_not_shown_or_saved(make_engine, introduce):
+    tool_call = AIMessageChunk(content="", tool_call_chunks=[
+        {"name": "check_availability", "args": '{"party_size": 4}', "id": "call_1", "index": 0}])
+    engine = make_engine(ScriptedChatModel(replies=[[tool_call, "Dogs are ", "welcome on the terrace."]]))
+    chatbot = introduce(engine.session())
+
+    chunks = list(chatbot.stream_user_input(QUESTION))
+
+    assert chunks == ["Dogs are ", "welcome on the terrace."]
+    assert transcript(engine, chatbot)[-1] == ("assistant", "Dogs are welcome on the terrace.")
+
+
+def test_failed_stream_saves_nothing_and_the_session_carries_on(make_engine, introduce):
+    llm = ScriptedChatModel(replies=[["Dogs are ", ConnectionError("connection reset")], ["Yes, on the terrace."]])
+    engine = make_engine(llm)
+    chatbot = introduce(engine.session())
+    before = transcript(engine, chatbot)
+
+    chunks = []
+    with pytest.raises(ConnectionError):
+        for chunk in chatbot.stream_user_input(QUESTION):
+            chunks.append(chunk)
+
+    assert chunks == ["Dogs are "]
+    assert transcript(engine, chatbot) == before  # No half reply in the transcript
+    assert engine.response_cache.get(QUESTION, engine.catalog.version) is None
+    assert chatbot.process_user_input(QUESTION) == "Yes, on the terrace."
+
+
+def test_failed_astream_releases_the_session_lock(make_engine, introduce):
+    engine = make_engine(ScriptedChatModel(replies=[[ConnectionError("connection reset")], ["Yes, on the terrace."]]))
+    session_id = introduce(engine.session()).session_state.session_id
+
+    async def turns():
+        with pytest.raises(ConnectionError):
+            await engine.achat(session_id, QUESTION)
+        # A held lock would make this turn wait forever
+        return await asyncio.wait_for(engine.achat(session_id, QUESTION), timeout=5)
+
+    assert asyncio.run(turns()) == "Yes, on the terrace."
+
+
+def test_evicted_session_state_is_saved_and_restored(make_engine, introduce):
+    engine = make_engine(ScriptedChatModel(replies=[["Sure."]]), max_sessions=1)
+    chatbot = introduce(engine.session())
+    chatbot.process_user_input("I want to order 2 margherita pizzas")
+    state = chatbot.session_state
+    session_id, order = state.session_id, state.current_order.summary()
+
+    engine.session()  # Over max_sessions: the first session leaves memory
+    assert len(engine) == 1
+    restored = engine.session(session_id)
+
+    assert restored is not chatbot
+    assert restored.session_state.customer_name == "Ann"
+    assert restored.session_state.conversation_state == state.conversation_state
+    assert restored.session_state.current_order.summary() == order
+    assert restored.conversation.window == chatbot.conversation.window
+
+
+def test_stream_holds_the_session_for_the_whole_turn(make_engine, introduce):
+    engine = make_engine(ScriptedChatModel(replies=[["Dogs are ", "welcome."]]), max_sessions=1)
+    session_id = introduce(engine.session()).session_state.session_id
+    session = engine._session(session_id)
+
+    chunks = engine.stream(session_id, QUESTION)
+    assert next(chunks) == "Dogs are "
+    assert session.turn_lock.locked()
+    engine.session()  # A busy session is not evicted
+    assert engine._session(session_id) is session
+
+    assert list(chunks) == ["welcome."]
+    assert not session.turn_lock.locked()
+
+
+def test_session_tokens(engine):
+    chatbot, token = engine.open_session()
+    session_id = chatbot.session_state.session_id
+
+    assert engine.authorize(session_id, token)
+    assert not engine.authorize(session_id, "not-the-token")
+    assert not engine.authorize(session_id, None)
+    assert not engine.authorize("made-up-id", token)
+    # Sessions the host opened in-process have no token and cannot be reached with one
+    assert not engine.authorize(engine.session().session_state.session_id, token)
+
+    assert engine.end_session(session_id)
+    assert not engine.authorize(session_id, token)
+    assert not engine.known(session_id)
+
+
+def test_sessions_saved_at_shutdown_resume_on_a_new_engine(make_engine, introduce):
+    engine = make_engine(ScriptedChatModel(replies=[["Sure."]]))
+    session_id = introduce(engine.session()).session_state.session_id
+    engine.save_sessions()
+
+    restarted = make_engine(ScriptedChatModel(replies=[["Sure."]]))
+
+    assert restarted.known(session_id)
+    assert restarted.session(session_id).session_state.customer_phone == "5551112222"
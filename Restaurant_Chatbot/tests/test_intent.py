@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from utils import INTENT_CLASSIFIER, analyze_intent
+
+UTTERANCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "utterances.txt")
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("yes", "general_query"),
+    ("Menu?", "show_menu"),
+    ("  hello!", "greet"),
+    ("Alice", "general_query"),
+    ("MENU!!", "show_menu"),
+    ("this", "general_query"),  # "hi" only as a whole word
+])
+def test_one_word_messages(text, intent):
+    assert analyze_intent(text, {}) == intent
+
+
+def test_memoized_short_inputs_classify_like_the_first_time():
+    with open(UTTERANCES, encoding="utf-8") as f:
+        utterances = [line.strip() for line in f if line.strip()]
+    states = [{}, {"awaiting_order_confirmation": True}, {"awaiting_reservation_confirmation": True},
+              {"conversation_state": "AWAITING_USER_PHONE"}]
+    INTENT_CLASSIFIER._match_short.cache_clear()
+    first = [analyze_intent(text, state) for state in states for text in utterances]
+
+    assert [analyze_intent(text, state) for state in states for text in utterances] == first
+    assert INTENT_CLASSIFIER._match_short.cache_info().hits > 0
@@ -0,0 +1,92 @@
+import sqlite3
+
+import pytest
+
+import database
+from database import MIGRATIONS, ConnectionPool, RestaurantDatabase
+
+
+@pytest.fixture
+def unmigrated_db():
+    """A database with the tables as create_tables makes them and user_version 0, nothing seeded."""
+    pool = ConnectionPool(":memory:")
+    pool.initialized = True  # Skip create_tables/migrate/populate_dummy_data in the constructor
+    db = RestaurantDatabase(":memory:", pool=pool)
+    db.create_tables()
+    yield db
+    pool.close_all()
+
+
+def seed(db):
+    with db.transaction():
+        db.cursor.execute("INSERT INTO customers (id, name, phone) VALUES (1, 'Ann', '5550001111'), "
+                          "(2, 'Bob', '5550002222')")
+        db.cursor.execute("INSERT INTO restaurant_tables (id, table_number, capacity) VALUES (1, 'T1', 4), "
+                          "(2, 'T2', 2)")
+        db.cursor.executemany(
+            "INSERT INTO reservations (id, customer_id, table_id, reservation_date, reservation_time, party_size, "
+            "status) VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                (1, 1, 1, "2026-11-02", "19:00", 4, "confirmed"),
+                (2, 2, 1, "2026-11-02", "19:00", 2, "confirmed"),  # Double booking of table 1
+                (3, 2, 1, "2026-11-02", "19:00", 3, "confirmed"),  # And another
+                (4, 1, 1, "2026-11-02", "19:00", 2, "cancelled"),  # Already cancelled
+                (5, 1, 2, "2026-11-02", "19:00", 2, "confirmed"),  # Other table, same slot
+                (6, 2, 1, "2026-11-02", "21:00", 2, "confirmed"),  # Same table, other slot
+            ])
+        db.cursor.execute("INSERT INTO menu (id, name, category, price) VALUES (1, 'Espresso', 'Drinks', 3.5), "
+                          "(2, 'Iced Tea', 'Drinks', 3.0)")
+        db.cursor.execute("INSERT INTO orders (id, customer_id, total_amount, status) VALUES (1, 1, 0, 'pending')")
+        db.cursor.executemany(
+            "INSERT INTO order_items (order_id, menu_item_id, quantity, price_at_order) VALUES (?, ?, ?, ?)",
+            [(1, 1, 1, 3.5), (1, 1, 2, 3.5), (1, 2, 1, 3.0)])  # Espresso on two lines
+
+
+def test_migrations_from_version_0(unmigrated_db, capsys):
+    db = unmigrated_db
+    seed(db)
+    assert db.cursor.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    db.migrate()
+
+    assert db.cursor.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+    statuses = dict(db.cursor.execute("SELECT id, status FROM reservations"))
+    assert statuses == {1: "confirmed", 2: "cancelled", 3: "cancelled", 4: "cancelled", 5: "confirmed",
+                        6: "confirmed"}
+    output = capsys.readouterr().out
+    assert "Migration 1 cancelled double-booked reservations: 2, 3\n" in output
+    for version, description, _ in MIGRATIONS:
+        assert f"Applied schema migration {version}: {description}" in output
+
+    # The partial unique index now holds: a second live booking of a taken slot is rejected
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.transaction():
+            db.cursor.execute("INSERT INTO reservations (customer_id, table_id, reservation_date, reservation_time, "
+                              "party_size) VALUES (2, 1, '2026-11-02', '19:00', 2)")
+
+    # Duplicate order lines folded into one, and the total recounted
+    assert [line[1:] for line in db.get_order_items(1)] == [("Espresso", 3, 3.5), ("Iced Tea", 1, 3.0)]
+    assert db.cursor.execute("SELECT total_amount FROM orders WHERE id = 1").fetchone()[0] == pytest.approx(13.5)
+    assert db.get_catalog_version() == 1
+
+
+def test_migrations_run_once(unmigrated_db, capsys):
+    db = unmigrated_db
+    db.migrate()
+    capsys.readouterr()
+    db.migrate()
+    assert capsys.readouterr().out == ""
+    assert db.cursor.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+
+
+def test_failed_migration_is_rolled_back_and_raised(monkeypatch):
+    broken = (MIGRATIONS[-1][0] + 1, "broken", ["CREATE TABLE extra (id INTEGER)", "SELECT * FROM no_such_table"])
+    monkeypatch.setattr(database, "MIGRATIONS", MIGRATIONS + [broken])
+    pool = ConnectionPool(":memory:")
+    with pytest.raises(sqlite3.OperationalError):
+        RestaurantDatabase(":memory:", pool=pool)
+
+    # Earlier migrations stay applied; the broken one left nothing behind and will run again next time
+    assert not pool.initialized
+    assert pool.cursor().execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+    assert pool.cursor().execute("SELECT name FROM sqlite_master WHERE name = 'extra'").fetchone() is None
+    pool.close_all()
@@ -0,0 +1,31 @@
+import threading
+
+
+def test_restaurant_info_follows_the_catalog_version(engine):
+    builder = engine.prompt_builder
+    assert "Opening hours: " in " ".join(builder.facts("what are your opening hours?"))
+
+    version = engine.catalog.version
+    with engine.db.transaction():
+        engine.db.cursor.execute("UPDATE restaurant_info SET opening_hours = 'Closed for renovation'")
+    engine.catalog.refresh(force=True)
+
+    assert engine.catalog.version > version
+    assert "Opening hours: Closed for renovation" in builder.facts("what are your opening hours?")
+
+
+def test_token_counts_are_shared_between_threads(engine):
+    builder = engine.prompt_builder
+    texts = [f"Menu: dish number {i}" for i in range(500)]
+
+    def count():
+        for text in texts:
+            builder._tokens(text)
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(builder._counts[text] == builder.count(text) for text in texts)
@@ -0,0 +1,38 @@
+from chat_engine import SessionState
+
+DATE = "2026-11-02"
+
+
+def pending_reservation(engine, party_size):
+    state = SessionState()
+    state.customer_name = "Ann"
+    state.customer_phone = "5550001111"
+    state.reservation_details = {"party_size": party_size, "reservation_date": DATE, "reservation_time": "19:00"}
+    state.awaiting_reservation_confirmation = True
+    return engine.chatbot(state)
+
+
+def test_failed_insert_puts_moved_bookings_back(engine, monkeypatch):
+    db = engine.db
+    customer_id = db.add_customer("Bob", "5550002222")
+    couple = db.create_reservation(customer_id, 3, DATE, "19:00", 2)
+    # The planner seats the new party at Table 3 after moving the couple to Table 1
+    monkeypatch.setattr(engine.table_planner, "place", lambda *args: ([(3, "Table 3", 6)], {couple: (1,)}))
+    monkeypatch.setattr(db, "create_reservation", lambda *args, **kwargs: None)
+
+    reply = pending_reservation(engine, 6).confirm_reservation_final("yes")
+
+    assert reply.startswith("I'm sorry, I couldn't finalize your reservation")
+    assert db.get_reservations_for_date(DATE) == [(couple, 3, "19:00", 2)]
+
+
+def test_confirmed_reservation_keeps_the_moves(engine, monkeypatch):
+    db = engine.db
+    customer_id = db.add_customer("Bob", "5550002222")
+    couple = db.create_reservation(customer_id, 3, DATE, "19:00", 2)
+    monkeypatch.setattr(engine.table_planner, "place", lambda *args: ([(3, "Table 3", 6)], {couple: (1,)}))
+
+    reply = pending_reservation(engine, 6).confirm_reservation_final("yes")
+
+    assert "at Table 3 has been confirmed" in reply
+    assert sorted(row[:2] for row in db.get_reservations_for_date(DATE)) == [(couple, 1), (couple + 1, 3)]
@@ -0,0 +1,38 @@
+import pytest
+
+from response_cache import ResponseCache
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("where is the main street entrance", "where is the side street entrance"),
+    ("are you open on friday", "are you open on saturday"),
+    ("do you have vegetarian dishes", "do you have vegan dishes"),
+])
+def test_similar_spelling_is_not_the_same_question(cached, asked):
+    cache = ResponseCache()
+    cache.put(cached, "answer")
+
+    assert cache.get(asked) is None
+    assert cache.get(cached) == "answer"
+
+
+def test_rephrasings_hit_the_semantic_tier():
+    cache = ResponseCache()
+    cache.put("is there wifi?", "Yes, free wifi.")
+
+    assert cache.get("do you have wi-fi") == "Yes, free wifi."
+    assert cache.get("any wifis available") == "Yes, free wifi."
+    assert cache.metrics()["semantic_hits"] == 2
+
+
+def test_second_customer_gets_the_cached_answer(engine, introduce):
+    question = "is there parking near the restaurant?"
+    before = engine.response_cache.metrics()  # The cache is shared with other engines on the same model
+    answer = introduce(engine.session()).process_user_input(question)
+
+    second = introduce(engine.session(), "Bob", "555-333-4444")
+
+    assert second.process_user_input(question) == answer
+    # Contact details filled both windows, yet only the first question went to the model
+    after = engine.response_cache.metrics()
+    assert (after["exact_hits"] - before["exact_hits"], after["misses"] - before["misses"]) == (1, 1)
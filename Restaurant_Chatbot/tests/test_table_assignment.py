@@ -0,0 +1,92 @@
+from table_assignment import Booking, TableAssigner
+
+SEVEN_PM = 19 * 60
+
+
+def booking(key, party_size, tables=(), start=SEVEN_PM, duration=90):
+    return Booking(key, start, party_size, tables, duration=duration)
+
+
+def test_plan_combines_grouped_tables_for_a_large_party():
+    # (id, table_number, capacity, combine_group): 1-3 stand together, 4 is on its own
+    assigner = TableAssigner([(1, "T1", 4, "window"), (2, "T2", 4, "window"), (3, "T3", 2, "window"),
+                              (4, "T4", 6, None)])
+    plan = assigner.plan([booking("big", 8), booking("six", 6)])
+
+    assert plan.unseated == []
+    assert plan.assignment == {"big": (1, 2), "six": (4,)}
+    assert plan.seated_covers == 14
+
+
+def test_options_leave_out_combinations_with_a_spare_table():
+    assigner = TableAssigner([(1, "T1", 4, "window"), (2, "T2", 4, "window"), (3, "T3", 2, "window")])
+
+    assert assigner.options(6) == [(6, (2, 3)), (8, (1, 2))]
+    assert (10, (1, 2, 3)) not in assigner.options(6)  # Fits without T3
+    assert assigner.options(4)[0] == (4, (1,))
+
+
+def test_place_moves_one_booking_to_free_a_seating():
+    assigner = TableAssigner([(1, "T1", 2, None), (2, "T2", 4, None)])
+    existing = [booking("couple", 2, tables=(2,))]
+
+    assert assigner.place(existing, booking(None, 4)) == ((2,), {"couple": (1,)})
+
+
+def test_plan_repair_moves_one_booking():
+    assigner = TableAssigner([(1, "T1", 2, None), (2, "T2", 2, None)])
+    # Both keep the table they hold, which leaves no table free for the whole of the late drink
+    early = booking("early", 2, tables=(1,), start=17 * 60, duration=90)  # 17:00-18:30
+    late = booking("late", 2, tables=(2,), start=18 * 60 + 45, duration=90)  # 18:45-20:15
+    drink = booking("drink", 2, start=18 * 60 + 15, duration=45)  # 18:15-19:00
+    plan = assigner.plan([early, late, drink])
+
+    assert plan.unseated == []
+    # The repair pass moves just the early booking, in front of the late one on T2
+    assert plan.assignment == {"early": (2,), "late": (2,), "drink": (1,)}
+    assert plan.moves() == {"early": (2,)}
+
+    pinned = assigner.plan([early, late, drink], pinned=frozenset({"early", "late"}))
+    assert pinned.assignment == {"early": (1,), "late": (2,)}
+    assert [unseated.key for unseated in pinned.unseated] == ["drink"]
+
+
+def test_pinned_bookings_never_move():
+    assigner = TableAssigner([(1, "T1", 2, None), (2, "T2", 4, None)])
+    existing = [booking("couple", 2, tables=(2,))]
+
+    # Moving the couple to T1 would seat the party of four, but the couple is pinned
+    assert assigner.place(existing, booking(None, 4), pinned=frozenset({"couple"})) is None
+
+    plan = assigner.plan(existing + [booking("four", 4)], pinned=frozenset({"couple"}))
+    assert plan.assignment == {"couple": (2,)}
+    assert [unseated.key for unseated in plan.unseated] == ["four"]
+
+
+def test_place_returns_none_instead_of_unseating_someone():
+    assigner = TableAssigner([(1, "T1", 4, None)])
+    existing = [booking("couple", 2, tables=(1,))]
+
+    # A fresh plan would give the only table to the bigger party and leave the couple out
+    assert [unseated.key for unseated in assigner.plan(existing + [booking(None, 4)]).unseated] == ["couple"]
+    assert assigner.place(existing, booking(None, 4)) is None
+
+
+def test_place_needs_no_moves_when_a_seating_is_free():
+    assigner = TableAssigner([(1, "T1", 2, None), (2, "T2", 4, None)])
+    existing = [booking("couple", 2, tables=(1,)), booking("after", 4, tables=(2,), start=SEVEN_PM + 90)]
+
+    # T2 is free until the next booking sits down at 20:30
+    assert assigner.place(existing, booking(None, 3)) == ((2,), {})
+    assert assigner.place(existing, booking(None, 3, duration=91)) is None
+
+
+def test_overlapping_legacy_bookings_still_block_their_table():
+    assigner = TableAssigner([(1, "T1", 4, None)])
+    # Double booking from before the unique slot index: a long 18:00 party and a short one at 18:30
+    existing = [booking("long", 4, tables=(1,), start=18 * 60, duration=180),
+                booking("short", 2, tables=(1,), start=18 * 60 + 30, duration=30)]
+
+    # 20:00 falls after the short booking but inside the long one
+    assert assigner.place(existing, booking(None, 2, start=20 * 60, duration=60)) is None
+    assert assigner.place(existing, booking(None, 2, start=21 * 60, duration=60)) == ((1,), {})
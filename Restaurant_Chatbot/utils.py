@@ -1,97 +1,344 @@
 import re
 import datetime
-from typing import Dict, Any, List, Tuple
+import functools
+from typing import Dict, Any, List, Optional, Tuple
+
+from search_index import STOPWORDS, NameTrie, normalize_text
+
+
+# Words for intent matching: keeps "i'm"/"don't" whole and "$" on its own so "under $15" matches "under $"
+_INTENT_WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|\$")
+# Characters around a one-word message that never take part in a phrase match
+_EDGE_PUNCTUATION = " \t\r\n.,!?;:\"()-"
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(_INTENT_WORD_PATTERN.findall(text.lower().replace("\u2019", "'")))
+
+
+class PhraseMatcher:
+    """Finds every known phrase in a text, matching whole words only.
+
+    All phrases are compiled into one regex shaped like a character trie (phrases sharing a
+    prefix share a branch), so a text is scanned once whatever the number of keywords, and
+    "hi" no longer fires inside "this" or "chicken". Phrases are reported in normalize_phrase()
+    form, together with the shorter known phrases they contain ("cancel my order" -> "order").
+    """
+
+    def __init__(self, phrases):
+        phrases = sorted({normalize_phrase(phrase) for phrase in phrases})
+        self.implied = {phrase: frozenset(other for other in phrases if f" {other} " in f" {phrase} ")
+                        for phrase in phrases}
+        # Python's re tries alternatives one by one, so common prefixes are factored out:
+        # "cancel", "cancel my order", "cancel my reservation" -> cancel(?:[\s-]+my[\s-]+(?:...)|)
+        trie: Dict[str, Any] = {}
+        for phrase in phrases:
+            node = trie
+            for char in phrase:
+                node = node.setdefault(char, {})
+            node[""] = phrase
+        self._pattern = re.compile(r"(?<![\w'])" + self._trie_pattern(trie))
+
+    @classmethod
+    def _trie_pattern(cls, node) -> str:
+        alternatives = [(r"[\s-]+" if char == " " else re.escape(char)) + cls._trie_pattern(child)
+                        for char, child in sorted(node.items()) if char]
+        if "" in node:
+            # Longer phrases are tried first; ending here needs a word boundary after word characters
+            alternatives.append(r"(?![\w'])" if node[""][-1].isalnum() else "")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    def matches(self, text_lower: str) -> List[str]:
+        """The phrases that occur in the text, in normalize_phrase() form, without those they contain."""
+        implied = self.implied
+        word = text_lower.strip(_EDGE_PUNCTUATION)
+        if word.isalpha():
+            # A one-word message ("yes", "menu?", "Alice") can only be a phrase as a whole: skip the scan
+            return [word] if word in implied else []
+        if "\u2019" in text_lower:
+            text_lower = text_lower.replace("\u2019", "'")
+        return [match if match in implied else normalize_phrase(match) for match in self._pattern.findall(text_lower)]
+
+    def find(self, text_lower: str) -> set:
+        found = set()
+        for phrase in self.matches(text_lower):
+            found.update(self.implied[phrase])
+        return found
+
+
+# Menu words that turn "tell me about ..." into a menu item question
+_MENU_KEYWORDS = ("pizza", "pizzas", "burger", "burgers", "pasta", "salad", "salads", "soup", "sushi", "sandwich",
+                  "sandwiches", "steak", "chicken", "fries", "coke", "water")
+_CONTACT_STATES = ("AWAITING_USER_PHONE", "AWAITING_USER_EMAIL", "AWAITING_USER_NAME")
+
+
+def _awaiting(flag):
+    return lambda found, text, state: bool(state.get(flag))
+
+
+def _when_describing(found, text, state):
+    return any(keyword in found for keyword in _MENU_KEYWORDS)
+
+
+# (priority, intent, trigger phrases, extra condition). The lowest priority number whose phrases
+# appear (and whose condition holds) wins, mirroring the order of the original if/elif cascade.
+# Phrases that contain a broader keyword ("cancel my order" vs "order") rank above it.
+INTENT_RULES = [
+    (10, "greet", ("hello", "hi", "hey"), None),
+    (20, "farewell", ("bye", "goodbye", "see you"), None),
+    (30, "show_menu", ("menu",), None),
+    (40, "show_offers", ("offers", "offer", "deals", "deal", "special", "specials", "happy hour"), None),
+    (50, "describe_menu_item", ("describe", "tell me about", "what is"), _when_describing),
+    (51, "general_query", ("describe", "tell me about", "what is"), None),
+    (60, "filter_menu", ("filter", "vegetarian", "vegan", "gluten-free", "gluten free", "under $", "price", "prices"),
+     None),
+    (70, "confirm_order", ("confirm", "yes", "place order"), _awaiting("awaiting_order_confirmation")),
+    (71, "cancel_order", ("cancel",), _awaiting("awaiting_order_confirmation")),
+    (72, "cancel_order", ("no",),
+     lambda found, text, state: state.get("awaiting_order_confirmation") and "order" in found),
+    (80, "modify_order", ("change my order", "modify order", "modify my order", "remove from order",
+                          "remove from my order", "cancel my order"), None),
+    (81, "place_order", ("order", "orders", "ordering", "i want to order", "add to my order", "get me", "buy"),
+     None),
+    (90, "confirm_reservation", ("confirm", "yes", "book it"), _awaiting("awaiting_reservation_confirmation")),
+    (91, "cancel_reservation", ("cancel",), _awaiting("awaiting_reservation_confirmation")),
+    (92, "cancel_reservation", ("no",),
+     lambda found, text, state: state.get("awaiting_reservation_confirmation") and "reservation" in found),
+    (100, "modify_reservation", ("modify reservation", "modify my reservation", "change reservation",
+                                 "change my reservation", "cancel my reservation"), None),
+    (101, "make_reservation", ("reservation", "reservations", "book a table", "reserve a table"), None),
+    (110, "get_address", ("address", "location", "where are you"), None),
+    (120, "get_phone", ("phone", "contact number", "call"), None),
+    (130, "get_hours", ("hours", "open", "opening", "opens", "close", "closing", "closes"), None),
+    (140, "give_feedback", ("feedback", "rate your service", "comments"), None),
+    # Contact details (priority 150/151) are detected with validate_phone_number/validate_email
+    (160, "provide_name", ("my name is", "i'm"), None),
+    (161, "provide_name", ("i am",), lambda found, text, state: len(text.split()) < 5),
+    (170, "refuse_info", ("no thanks", "no thank you", "skip", "don't want to provide"), None),
+    (171, "refuse_info", ("no",), lambda found, text, state: state.get("conversation_state") in _CONTACT_STATES),
+]
+_CONTACT_PRIORITY = 150
+_DIGITS_PATTERN = re.compile(r'\d')
+# Messages up to this long have their phrase matches memoized: "yes", "no thanks" and "show me the menu"
+# recur in every session, so most short turns skip the scan
+SHORT_INPUT_CHARS = 40
+SHORT_INPUT_CACHE = 4096
+
+
+class IntentClassifier:
+    """Keyword intent classifier compiled once from INTENT_RULES."""
+
+    def __init__(self, rules, extra_phrases=()):
+        self.rules = [(priority, intent, tuple(normalize_phrase(phrase) for phrase in phrases), condition)
+                      for priority, intent, phrases, condition in sorted(rules, key=lambda rule: rule[0])]
+        # extra_phrases are only looked at by rule conditions (e.g. menu words for "describe")
+        phrases = {phrase for _, _, rule_phrases, _ in self.rules for phrase in rule_phrases}
+        self.matcher = PhraseMatcher(phrases.union(extra_phrases))
+        # phrase -> positions of the rules it can trigger, so only matched rules are evaluated
+        self._rules_by_phrase: Dict[str, List[int]] = {}
+        for position, (_, _, rule_phrases, _) in enumerate(self.rules):
+            for phrase in rule_phrases:
+                self._rules_by_phrase.setdefault(phrase, []).append(position)
+        # Most messages contain a single known phrase; its rules, with those of the phrases it contains, in order
+        self._candidates = {phrase: self._candidate_rules(implied)
+                            for phrase, implied in self.matcher.implied.items()}
+        self._match_short = functools.lru_cache(maxsize=SHORT_INPUT_CACHE)(self._match)
+
+    def _candidate_rules(self, found) -> Tuple[int, ...]:
+        return tuple(sorted({position for phrase in found for position in self._rules_by_phrase.get(phrase, ())}))
+
+    def _match(self, user_input: str) -> Tuple[str, frozenset, Tuple[int, ...]]:
+        """(lowercased input, phrases found, positions of the rules they can trigger); depends on the text only."""
+        user_input_lower = user_input.lower()
+        phrases = self.matcher.matches(user_input_lower)
+        if not phrases:
+            return user_input_lower, frozenset(), ()
+        if len(phrases) == 1:
+            return user_input_lower, self.matcher.implied[phrases[0]], self._candidates[phrases[0]]
+        found = frozenset().union(*map(self.matcher.implied.get, phrases))
+        return user_input_lower, found, self._candidate_rules(found)
+
+    def classify(self, user_input: str, session_state: Any = None) -> str:
+        state = session_state if session_state is not None else {}
+        match = self._match_short if len(user_input) <= SHORT_INPUT_CHARS else self._match
+        user_input_lower, found, candidates = match(user_input)
+        if not candidates:
+            # No rule can fire, so go straight to the contact details check
+            return self._contact_intent(user_input) or "general_query"
+        contact_checked = False
+        for position in candidates:
+            priority, intent, _, condition = self.rules[position]
+            if priority > _CONTACT_PRIORITY and not contact_checked:
+                contact_checked = True
+                contact_intent = self._contact_intent(user_input)
+                if contact_intent:
+                    return contact_intent
+            if condition is None or condition(found, user_input_lower, state):
+                return intent
+        if not contact_checked:
+            contact_intent = self._contact_intent(user_input)
+            if contact_intent:
+                return contact_intent
+        # Default if no specific intent is detected
+        return "general_query"
+
+    @staticmethod
+    def _contact_intent(user_input: str) -> str | None:
+        # Cheap pre-checks: a phone number needs at least 10 digits and an email needs an "@"
+        if (len(user_input) >= 10 and len(_DIGITS_PATTERN.findall(user_input)) >= 10
+                and validate_phone_number(user_input)):
+            return "provide_phone_number"
+        if "@" in user_input and validate_email(user_input):
+            return "provide_email"
+        return None
+
+    def classify_many(self, texts: List[str], session_state: Any = None) -> List[str]:
+        return [self.classify(text, session_state) for text in texts]
+
+
+INTENT_CLASSIFIER = IntentClassifier(INTENT_RULES, extra_phrases=_MENU_KEYWORDS)
 
 
 # Helper function to analyze user intent based on keywords
 def analyze_intent(user_input: str, session_state: Any) -> str:
+    return INTENT_CLASSIFIER.classify(user_input, session_state)
+
+
+def classify_many(texts: List[str], session_state: Any = None) -> List[str]:
+    """Classifies a batch of utterances that share one session state (e.g. a replayed transcript)."""
+    return INTENT_CLASSIFIER.classify_many(texts, session_state)
+
+
+# Compiled once at import; every extractor below shares these tables
+_PHONE_PATTERN = r'(?:\+?\d{1,3}[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?)?\d{3}[-.\s]?\d{4}'
+_EMAIL_PATTERN = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
+PHONE_REGEX = re.compile(_PHONE_PATTERN)
+EMAIL_REGEX = re.compile(_EMAIL_PATTERN)
+MONTHS = {name: number for number, name in enumerate(
+    ("january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november",
+     "december"), start=1)}
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+                "ten": 10}
+_MONTH_PATTERN = "|".join(MONTHS)
+_NUMBER_PATTERN = "|".join(NUMBER_WORDS)
+
+# One alternation for every detail a reservation turn can carry. Alternatives are tried in this
+# order at each position and matched text is consumed, so "4 people" is never also read as a time
+# and "25th december" never as a party size. re does not index alternatives by their first
+# character, so they are grouped behind a cheap guard: numeric forms first, then word forms.
+DETAILS_REGEX = re.compile(rf"""
+    (?=[+(\d])(?:
+        (?P<phone>{_PHONE_PATTERN})
+      | (?P<dm_day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<dm_month>{_MONTH_PATTERN})\b
+      | (?P<oclock>\d{{1,2}})\s+o'clock(?:\s*(?P<oclock_meridiem>am|pm)\b)?
+      | (?P<party>\d+)\s+(?:people|person|pax|members|of\s+us)\b
+      | (?P<hour>\d{{1,2}})(?::(?P<minute>\d{{2}}))?\s*(?P<meridiem>am|pm)\b
+      | (?P<hour24>\d{{1,2}}):(?P<minute24>\d{{2}})\b
+    )
+  | \b(?:
+        (?P<email>{_EMAIL_PATTERN})
+      | (?P<relative>today|tomorrow)\b
+      | (?P<md_month>{_MONTH_PATTERN})\s+(?P<md_day>\d{{1,2}})(?:st|nd|rd|th)?\b
+      | half\s+past\s+(?P<half_past>\d{{1,2}})(?:\s*(?P<half_past_meridiem>am|pm)\b)?
+      | at\s+(?P<at_hour>\d{{1,2}})\b(?!:|\s+(?:people|person|pax|members|of\s+us)\b)
+      | (?<!\$)(?P<number>{_NUMBER_PATTERN}|\d+)\b
+    )
+""", re.IGNORECASE | re.VERBOSE)
+
+
+def _to_24h(hour: int, meridiem: str | None, pm_in_text: bool) -> int:
+    if meridiem is None:
+        # "half past 7" / "7 o'clock" without am/pm follow any "pm" elsewhere in the message
+        meridiem = "pm" if pm_in_text else None
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif meridiem == "am" and hour == 12:
+        hour = 0  # 12 AM is 00:00
+    return hour
+
+
+def _future_date(today: datetime.date, month: int, day: int) -> str | None:
+    year = today.year  # Assume current year
+    try:
+        # If the date is in the past for the current year, assume next year
+        if datetime.date(year, month, day) < today:
+            year += 1
+        return f"{year}-{month:02d}-{day:02d}"
+    except ValueError:  # Handles invalid day for month (e.g., Feb 30)
+        return None
+
+
+def extract_details(user_input: str, today: datetime.date | None = None) -> Dict[str, Any]:
+    """Extracts date, time, party size, phone and email from one message in a single regex pass."""
+    details = {"date": None, "time": None, "party_size": None, "phone": None, "email": None}
+    today = today or datetime.date.today()
     user_input_lower = user_input.lower()
+    pm_in_text = "pm" in user_input_lower
+    relative_date = None
+    bare_number = None
+    for match in DETAILS_REGEX.finditer(user_input):
+        kind = match.lastgroup
+        groups = match.groupdict()
+        if kind == "email":
+            details["email"] = details["email"] or match.group(0)
+        elif kind == "phone":
+            # Basic length check for validity (e.g., 10 for US, or more for international)
+            digits = "".join(filter(str.isdigit, match.group(0)))
+            if details["phone"] is None and 10 <= len(digits) <= 15:
+                details["phone"] = digits
+        elif kind == "relative":
+            relative_date = relative_date or groups["relative"].lower()
+        elif kind in ("dm_month", "md_day"):
+            if details["date"] is None:
+                if kind == "dm_month":
+                    month, day = groups["dm_month"], groups["dm_day"]
+                else:
+                    month, day = groups["md_month"], groups["md_day"]
+                details["date"] = _future_date(today, MONTHS[month.lower()], int(day))
+        elif details["time"] is None and kind in ("half_past", "half_past_meridiem"):
+            hour = _to_24h(int(groups["half_past"]), (groups["half_past_meridiem"] or "").lower() or None, pm_in_text)
+            details["time"] = f"{hour:02d}:30"
+        elif details["time"] is None and kind in ("oclock", "oclock_meridiem"):
+            hour = _to_24h(int(groups["oclock"]), (groups["oclock_meridiem"] or "").lower() or None, pm_in_text)
+            details["time"] = f"{hour:02d}:00"
+        elif details["time"] is None and kind == "meridiem":
+            hour, minute = int(groups["hour"]), int(groups["minute"] or 0)
+            if 1 <= hour <= 12 and minute < 60:
+                details["time"] = f"{_to_24h(hour, groups['meridiem'].lower(), pm_in_text):02d}:{minute:02d}"
+        elif details["time"] is None and kind == "minute24":
+            hour, minute = int(groups["hour24"]), int(groups["minute24"])
+            if hour < 24 and minute < 60:
+                details["time"] = f"{hour:02d}:{minute:02d}"
+        elif details["time"] is None and kind == "at_hour":
+            hour = int(groups["at_hour"])
+            if hour < 24:
+                details["time"] = f"{_to_24h(hour, None, pm_in_text) if hour <= 12 else hour:02d}:00"
+        elif kind == "party":
+            details["party_size"] = details["party_size"] or int(groups["party"])
+        elif kind == "number" and bare_number is None:
+            bare_number = groups["number"].lower()
+
+    # "today"/"tomorrow" win over an explicit date, as they always have
+    if relative_date == "today":
+        details["date"] = today.strftime("%Y-%m-%d")
+    elif relative_date == "tomorrow":
+        details["date"] = (today + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
 
-    # General greetings and farewells
-    if "hello" in user_input_lower or "hi" in user_input_lower or "hey" in user_input_lower:
-        return "greet"
-    elif "bye" in user_input_lower or "goodbye" in user_input_lower or "see you" in user_input_lower:
-        return "farewell"
-
-    # Menu and Offers
-    elif "menu" in user_input_lower:
-        return "show_menu"
-    elif "offers" in user_input_lower or "deals" in user_input_lower or "special" in user_input_lower or "happy hour" in user_input_lower:
-        return "show_offers"
-    elif "describe" in user_input_lower or "tell me about" in user_input_lower or "what is" in user_input_lower:
-        # Check if a menu item name is explicitly mentioned (simplified)
-        menu_keywords = ["pizza", "burger", "pasta", "salad", "soup", "sushi", "sandwich", "steak", "chicken", "fries",
-                         "coke", "water"]
-        if any(item_keyword in user_input_lower for item_keyword in menu_keywords):
-            return "describe_menu_item"
-        return "general_query"  # If no specific item, treat as general
-
-    elif "filter" in user_input_lower or "vegetarian" in user_input_lower or "vegan" in user_input_lower or "gluten-free" in user_input_lower or "under $" in user_input_lower or "price" in user_input_lower:
-        return "filter_menu"
-
-    # Ordering
-    # Check for words indicating an order, but prioritize confirmation/cancellation if those states are active
-    if session_state.get("awaiting_order_confirmation"):
-        if "confirm" in user_input_lower or "yes" in user_input_lower or "place order" in user_input_lower:
-            return "confirm_order"
-        elif "cancel" in user_input_lower or "no" in user_input_lower and "order" in user_input_lower:
-            return "cancel_order"
-
-    if "order" in user_input_lower or "i want to order" in user_input_lower or "get me" in user_input_lower or "buy" in user_input_lower:
-        return "place_order"
-    elif "add to my order" in user_input_lower or "change my order" in user_input_lower or "modify order" in user_input_lower or "remove from order" in user_input_lower or "cancel my order" in user_input_lower:
-        return "modify_order"
-
-    # Reservations
-    # Prioritize confirmation/cancellation if those states are active
-    if session_state.get("awaiting_reservation_confirmation"):
-        if "confirm" in user_input_lower or "yes" in user_input_lower or "book it" in user_input_lower:
-            return "confirm_reservation"
-        elif "cancel" in user_input_lower or "no" in user_input_lower and "reservation" in user_input_lower:
-            return "cancel_reservation"
-
-    if "reservation" in user_input_lower or "book a table" in user_input_lower or "reserve a table" in user_input_lower:
-        return "make_reservation"
-    elif "modify reservation" in user_input_lower or "change reservation" in user_input_lower or "cancel my reservation" in user_input_lower:
-        return "modify_reservation"
-
-    # Restaurant Information
-    elif "address" in user_input_lower or "location" in user_input_lower or "where are you" in user_input_lower:
-        return "get_address"
-    elif "phone" in user_input_lower or "contact number" in user_input_lower or "call" in user_input_lower:
-        return "get_phone"
-    elif "hours" in user_input_lower or "open" in user_input_lower or "close" in user_input_lower:
-        return "get_hours"
-
-    # User feedback
-    elif "feedback" in user_input_lower or "rate your service" in user_input_lower or "comments" in user_input_lower:
-        return "give_feedback"
-
-    # Contact Info Provision (proactive input, not prompted - or in response to prompt)
-    # These intents are checked broadly here, and handled specifically by _process_X_input functions
-    if validate_phone_number(user_input):
-        return "provide_phone_number"
-    if validate_email(user_input):
-        return "provide_email"
-    if "my name is" in user_input_lower or "i'm" in user_input_lower or "i am" in user_input_lower and len(
-            user_input_lower.split()) < 5:  # Simple name pattern
-        return "provide_name"
-
-    # Refusing information - moved to a more general intent
-    elif "no thanks" in user_input_lower or "no thank you" in user_input_lower or "skip" in user_input_lower or "don't want to provide" in user_input_lower or (
-            "no" in user_input_lower and session_state.get("conversation_state") in ["AWAITING_USER_PHONE",
-                                                                                     "AWAITING_USER_EMAIL",
-                                                                                     "AWAITING_USER_NAME"]):
-        return "refuse_info"
-
-    # Default if no specific intent is detected
-    return "general_query"
+    # Without "X people", the first number left over is taken as the party size
+    if details["party_size"] is None and bare_number is not None:
+        party_size = NUMBER_WORDS.get(bare_number) or int(bare_number)
+        # A large bare number without "people" is more likely something else (a price, a year)
+        if party_size <= 10 or "people" in user_input_lower:
+            details["party_size"] = party_size
+    return details
 
 
 # Helper function to validate and extract phone number
 def validate_phone_number(text: str) -> str | None:
     # Relaxed regex to capture common phone number formats (10-15 digits, with optional hyphens/spaces)
-    match = re.search(r'(\+?\d{1,3}[-.\s]?)?(\(?\d{3}\)?[-.\s]?)?(\d{3}[-.\s]?\d{4})', text)
+    match = PHONE_REGEX.search(text)
     if match:
         # Reconstruct the number to a consistent format (digits only)
         phone_number = ''.join(filter(str.isdigit, match.group(0)))
@@ -103,7 +350,7 @@ def validate_phone_number(text: str) -> str | None:
 
 # Helper function to validate and extract email address
 def validate_email(text: str) -> str | None:
-    match = re.search(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", text)
+    match = EMAIL_REGEX.search(text)
     if match:
         return match.group(0)
     return None
@@ -111,172 +358,58 @@ def validate_email(text: str) -> str | None:
 
 # Helper function to extract reservation details from user input
 def extract_reservation_details(user_input: str) -> Dict[str, Any]:
-    details = {
-        "date": None,
-        "time": None,
-        "party_size": None
-    }
-    user_input_lower = user_input.lower()
-
-    # Extract date
-    today = datetime.date.today()
-    if "today" in user_input_lower:
-        details["date"] = today.strftime("%Y-%m-%d")
-    elif "tomorrow" in user_input_lower:
-        details["date"] = (today + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
-    else:
-        # Regex for "DDth Month" or "Month DD" or "Month DDth"
-        date_match = re.search(
-            r'(\d{1,2})(?:st|nd|rd|th)?\s+(january|february|march|april|may|june|july|august|september|october|november|december)',
-            user_input_lower)
-        if date_match:
-            day = int(date_match.group(1))
-            month_name = date_match.group(2)
-            month_num = datetime.datetime.strptime(month_name, "%B").month
-            year = today.year  # Assume current year
-            # If the date is in the past for the current year, assume next year
-            try:
-                if datetime.date(year, month_num, day) < today:
-                    year += 1
-                details["date"] = f"{year}-{month_num:02d}-{day:02d}"
-            except ValueError:  # Handles invalid day for month (e.g., Feb 30)
-                details["date"] = None
-        else:
-            date_match = re.search(
-                r'(january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{1,2})(?:st|nd|rd|th)?',
-                user_input_lower)
-            if date_match:
-                month_name = date_match.group(1)
-                day = int(date_match.group(2))
-                month_num = datetime.datetime.strptime(month_name, "%B").month
-                year = today.year  # Assume current year
-                try:
-                    if datetime.date(year, month_num, day) < today:
-                        year += 1
-                    details["date"] = f"{year}-{month_num:02d}-{day:02d}"
-                except ValueError:  # Handles invalid day for month
-                    details["date"] = None
-
-    # Extract time
-    # Handles 7pm, 7:00pm, 19:00, 7 o'clock, half past 7, etc.
-    time_match = re.search(r'(\d{1,2}(:\d{2})?\s*(?:am|pm)?)|(half past \d{1,2})|(\d{1,2}\s+o\'clock)',
-                           user_input_lower)
-    if time_match:
-        time_str_raw = time_match.group(0)
-        try:
-            if "half past" in time_str_raw:
-                hour = int(re.search(r'(\d{1,2})', time_str_raw).group(1))
-                # Assuming "half past X" means X:30. Need to consider AM/PM context if present.
-                # For simplicity, if no AM/PM, assume 24-hour conversion or common meal times.
-                # Here, a simple conversion, but a full LLM parsing would be better.
-                if "pm" in user_input_lower and hour < 12: hour += 12
-                if "am" in user_input_lower and hour == 12: hour = 0  # 12 AM is 00:00
-                details["time"] = f"{hour:02d}:30"
-            elif "o'clock" in time_str_raw:
-                hour = int(re.search(r'(\d{1,2})', time_str_raw).group(1))
-                if "pm" in user_input_lower and hour < 12: hour += 12
-                if "am" in user_input_lower and hour == 12: hour = 0  # 12 AM is 00:00
-                details["time"] = f"{hour:02d}:00"
-            else:
-                # Standard H:MM AM/PM or 24-hour
-                time_str_clean = time_str_raw.replace(" ", "").replace(".", "")
-                if "am" in time_str_clean or "pm" in time_str_clean:
-                    details["time"] = datetime.datetime.strptime(time_str_clean, "%I%M%p").strftime("%H:%M")
-                elif ":" in time_str_clean:
-                    details["time"] = datetime.datetime.strptime(time_str_clean, "%H:%M").strftime("%H:%M")
-                else:  # Assume H and add :00, or HMM
-                    if len(time_str_clean) <= 2:  # e.g., "7" or "10"
-                        hour = int(time_str_clean)
-                        if "pm" in user_input_lower and hour < 12: hour += 12  # Heuristic for pm
-                        if "am" in user_input_lower and hour == 12: hour = 0  # 12 AM is 00:00
-                        details["time"] = f"{hour:02d}:00"
-                    else:  # e.g., "730"
-                        details["time"] = datetime.datetime.strptime(time_str_clean, "%H%M").strftime("%H:%M")
-        except ValueError:
-            details["time"] = None
-
-    # Extract party size
-    party_size_match = re.search(r'(\d+)\s+(people|person|pax|members|of us)\b', user_input_lower)
-    if party_size_match:
-        details["party_size"] = int(party_size_match.group(1))
-    else:
-        # Also check for single digit numbers or number words
-        num_word_map = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8,
-                        "nine": 9, "ten": 10}
-        # Look for standalone numbers/words that could imply party size
-        standalone_num_match = re.search(r'\b(one|two|three|four|five|six|seven|eight|nine|ten|\d+)\b',
-                                         user_input_lower)
-        if standalone_num_match and not any(word in standalone_num_match.group(0) for word in
-                                            ["item", "minute", "hour", "dollar", "pm",
-                                             "am"]):  # Avoid misinterpreting numbers from other contexts
-            try:
-                details["party_size"] = int(
-                    num_word_map.get(standalone_num_match.group(1), standalone_num_match.group(1)))
-                # Add a heuristic: if party size is very large (e.g., > 10) and not explicitly "X people", it might be wrong.
-                if details["party_size"] > 10 and "people" not in user_input_lower:
-                    details["party_size"] = None  # Consider it a misidentification
-            except ValueError:
-                pass
-
-    return details
+    details = extract_details(user_input)
+    return {"date": details["date"], "time": details["time"], "party_size": details["party_size"]}
+
+
+# Quantities read just before an item name ("2 x", "one of the", "a")
+_QUANTITY_FILLERS = frozenset(("x", "of", "the", "more"))
+_QUANTITY_REGEX = re.compile(r'(\d{1,3})x?')
+# Words of the request around an item, never part of its name ("i'd like", "can we get")
+_ORDER_WORDS = STOPWORDS | frozenset((
+    "i", "d", "we", "me", "us", "like", "want", "would", "order", "get", "have", "add", "please", "take", "need",
+    "can", "could", "some", "also", "plus"))
+_NAME_GAP = 2  # Unknown words looked past for a quantity, e.g. a misspelled "chiken" in "2 chiken alfredo"
+
+
+def _quantity_before(words: List[str], start: int, floor: int, partial: bool) -> Optional[int]:
+    position = start - 1
+    skipped = 0  # Unknown words passed, which may be a misspelled part of the item's name
+    while position > floor:
+        word = words[position]
+        match = _QUANTITY_REGEX.fullmatch(word)
+        if match:
+            return int(match.group(1)) or 1
+        if word in NUMBER_WORDS:
+            return NUMBER_WORDS[word]
+        if word not in _QUANTITY_FILLERS:
+            if word in _ORDER_WORDS or skipped == _NAME_GAP:
+                break
+            skipped += 1
+        position -= 1
+    # Default quantity if not specified ("a", "an" or nothing), unless words of the name may be missing
+    return None if partial and skipped else 1
 
 
 # Helper function to extract order items from user input
-def extract_order_items(user_input: str, menu_items_db: List[Tuple]) -> List[Tuple[str, int]]:
-    order_items = []
-    user_input_lower = user_input.lower()
+def extract_order_items(user_input: str, menu_items_db: List[Tuple] | NameTrie) -> List[Tuple[str, Optional[int]]]:
+    """Returns (menu item name, quantity) for every item mentioned, in the order mentioned.
 
-    # Create a mapping from lowercased menu item names to their original names
-    # Assuming menu_items_db format is (id, name, description, category, price, ...)
-    menu_name_map = {item[1].lower(): item[1] for item in menu_items_db}
-
-    # Regex to find quantities (number or word) followed by potential item names
-    # This pattern tries to be flexible and capture "X [item name]" or "[item name]"
-    # It looks for a number/word-number, optionally followed by 'x' or 'of', then potential item name
-    # Or just an item name.
-    pattern = r'(\d+|one|two|three|four|five|six|seven|eight|nine|ten)?\s*(?:x|of)?\s*([a-zA-Z\s]+?(?:pizza|burger|pasta|salad|soup|sushi|sandwich|steak|chicken|fries|coke|water|soda))'
-
-    # Broader pattern if specific menu items aren't always explicitly listed
-    # This might catch more, but also more false positives.
-    # We will iterate through potential matches and then check against menu_name_map
-    possible_items_pattern = r'(\d+|one|two|three|four|five|six|seven|eight|nine|ten)\s*(?:x|of)?\s*([\w\s-]+(?:\b|$))|\b([\w\s-]+(?:\b|$))'
-
-    matches = re.findall(possible_items_pattern, user_input_lower)
-
-    for match_group in matches:
-        qty_str = match_group[0] if match_group[0] else None  # Numeric quantity or word
-        item_name_raw = match_group[1] if match_group[1] else match_group[2]  # Item name from either group
-
-        if not item_name_raw: continue
-
-        item_name_cleaned = item_name_raw.strip()
-
-        found_menu_item = None
-        # Prioritize exact matches first, then partial matches for menu items
-        for menu_lower, original_menu_name in menu_name_map.items():
-            if menu_lower == item_name_cleaned:  # Exact match
-                found_menu_item = original_menu_name
-                break
-            elif menu_lower in item_name_cleaned:  # Substring match (e.g., "chicken" in "grilled chicken")
-                found_menu_item = original_menu_name
-                # Continue searching for a more specific match, or refine this later
-                # For now, take the first match.
-                break
-            elif item_name_cleaned in menu_lower:  # User input is part of a longer menu item (e.g., "pizza" for "Pepperoni Pizza")
-                found_menu_item = original_menu_name
-                break
-
-        if found_menu_item:
-            quantity = 1  # Default quantity if not specified
-            if qty_str:
-                if qty_str.isdigit():
-                    quantity = int(qty_str)
-                else:
-                    # Convert word numbers to int
-                    word_to_int = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
-                                   "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10}
-                    quantity = word_to_int.get(qty_str, 1)  # Default to 1 if word not recognized
-
-            order_items.append((found_menu_item, quantity))
+    The quantity is None when an item was found by part of its name after unknown words with no
+    number before them ("chiken alfredo"): those words may hide the quantity, so ask for it.
 
+    menu_items_db is either the menu rows (id, name, ...) or a NameTrie over their names; pass the
+    trie the MenuCatalog keeps per snapshot so it is not rebuilt on every turn.
+    """
+    if isinstance(menu_items_db, NameTrie):
+        name_trie = menu_items_db
+    else:
+        name_trie = NameTrie.from_names((item[1], item[1]) for item in menu_items_db)
+    words = normalize_text(user_input).split()
+    order_items = []
+    previous_end = -1
+    for start, end, item_name in name_trie.scan(words):
+        partial = end - start < len(normalize_text(item_name).split())
+        order_items.append((item_name, _quantity_before(words, start, previous_end, partial)))
+        previous_end = end - 1
     return order_items
\ No newline at end of file
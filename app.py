@@ -3,12 +3,14 @@ from typing import List
 from groq import Groq
 import streamlit as st
 from phi.assistant import Assistant
-from phi.document import Document
-from phi.document.reader.pdf import PDFReader
-from phi.document.reader.website import WebsiteReader
 from phi.utils.log import logger
 
 from assistant import get_groq_assistant  # type: ignore
+from crawler import WebsiteCrawler
+from embedding_cache import CachedEmbedder, EmbeddingCache
+from ingestion import IngestionPipeline
+from ingestion_ledger import IngestionLedger, ledger_scope
+from local_vectordb import LocalVectorDb
 client = Groq()
 
 st.set_page_config(
@@ -19,6 +21,48 @@ st.title("RAG with Llama3 on Groq")
 # st.markdown("##### :orange_heart: built using [phidata](https://github.com/phidatahq/phidata)")
 
 
+@st.cache_resource
+def get_ingestion_ledger() -> IngestionLedger:
+    # What each knowledge base already holds, by content hash; shared by all sessions and kept across restarts
+    return IngestionLedger()
+
+
+@st.cache_resource
+def get_embedding_cache() -> EmbeddingCache:
+    # Vectors already computed, per embeddings model; shared by all sessions and kept across restarts
+    return EmbeddingCache()
+
+
+@st.cache_resource
+def get_local_vector_db(collection: str, embeddings_model: str, _embedder) -> LocalVectorDb:
+    # One instance per collection, shared by all sessions: it keeps the index in memory
+    return LocalVectorDb(collection=f"{collection}_{embeddings_model}", embedder=_embedder)
+
+
+def use_local_vector_db(assistant: Assistant, embeddings_model: str) -> Assistant:
+    # Vectors in files next to the app instead of the PgVector database; no server needed
+    vector_db = assistant.knowledge_base.vector_db if assistant.knowledge_base else None
+    if vector_db is not None and not isinstance(vector_db, LocalVectorDb):
+        collection = getattr(vector_db, "collection", None) or "rag_documents"
+        assistant.knowledge_base.vector_db = get_local_vector_db(collection, embeddings_model, vector_db.embedder)
+    return assistant
+
+
+def get_assistant(llm_model: str, embeddings_model: str, vector_store: str, run_id=None) -> Assistant:
+    assistant = get_groq_assistant(llm_model=llm_model, embeddings_model=embeddings_model, run_id=run_id)
+    if vector_store == "Local":
+        assistant = use_local_vector_db(assistant, embeddings_model)
+    return use_embedding_cache(assistant)
+
+
+def use_embedding_cache(assistant: Assistant) -> Assistant:
+    # Chunks embedded before with the same model (in any document, session or run) are not sent again
+    vector_db = assistant.knowledge_base.vector_db if assistant.knowledge_base else None
+    if vector_db is not None and vector_db.embedder is not None and not isinstance(vector_db.embedder, CachedEmbedder):
+        vector_db.embedder = CachedEmbedder(embedder=vector_db.embedder, cache=get_embedding_cache())
+    return assistant
+
+
 def restart_assistant():
     st.session_state["rag_assistant"] = None
     st.session_state["rag_assistant_run_id"] = None
@@ -45,7 +89,8 @@ def main() -> None:
     embeddings_model = st.sidebar.selectbox(
         "Select Embeddings",
         options=["nomic-embed-text", "text-embedding-3-small"],
-        help="When you change the embeddings model, the documents will need to be added again.",
+        help="When you change the embeddings model, the documents will need to be added again. "
+        "Text embedded with a model before is taken from the local embedding cache.",
     )
     # Set assistant_type in session state
     if "embeddings_model" not in st.session_state:
@@ -56,11 +101,24 @@ def main() -> None:
         st.session_state["embeddings_model_updated"] = True
         restart_assistant()
 
+    # Get the vector store
+    vector_store = st.sidebar.selectbox(
+        "Select Vector Store",
+        options=["Local", "PgVector"],
+        help="Local keeps the knowledge base in files next to the app, so no database server is needed.",
+    )
+    if "vector_store" not in st.session_state:
+        st.session_state["vector_store"] = vector_store
+    # Restart the assistant if the vector store has changed
+    elif st.session_state["vector_store"] != vector_store:
+        st.session_state["vector_store"] = vector_store
+        restart_assistant()
+
     # Get the assistant
     rag_assistant: Assistant
     if "rag_assistant" not in st.session_state or st.session_state["rag_assistant"] is None:
         logger.info(f"---*--- Creating {llm_model} Assistant ---*---")
-        rag_assistant = get_groq_assistant(llm_model=llm_model, embeddings_model=embeddings_model)
+        rag_assistant = get_assistant(llm_model, embeddings_model, vector_store)
         st.session_state["rag_assistant"] = rag_assistant
     else:
         rag_assistant = st.session_state["rag_assistant"]
@@ -69,8 +127,12 @@ def main() -> None:
     try:
         st.session_state["rag_assistant_run_id"] = rag_assistant.create_run()
     except Exception:
-        st.warning("Could not create assistant, is the database running?")
-        return
+        if vector_store != "Local":
+            st.warning("Could not create assistant, is the database running?")
+            return
+        # The knowledge base does not need the database; only the run history does
+        rag_assistant.storage = None
+        st.warning("Run history is not saved, is the database running?")
 
     # Load existing messages
     assistant_chat_history = rag_assistant.memory.get_chat_history()
@@ -106,6 +168,8 @@ def main() -> None:
 
     # Load knowledge base
     if rag_assistant.knowledge_base:
+        ledger = get_ingestion_ledger()
+
         # -*- Add websites to knowledge base
         if "url_scrape_key" not in st.session_state:
             st.session_state["url_scrape_key"] = 0
@@ -118,13 +182,20 @@ def main() -> None:
             if input_url is not None:
                 alert = st.sidebar.info("Processing URLs...", icon="ℹ️")
                 if f"{input_url}_scraped" not in st.session_state:
-                    scraper = WebsiteReader(max_links=2, max_depth=1)
-                    web_documents: List[Document] = scraper.read(input_url)
-                    if web_documents:
-                        rag_assistant.knowledge_base.load_documents(web_documents, upsert=True)
-                    else:
+                    # Pages are fetched concurrently (per robots.txt) and loaded in batches as they arrive;
+                    # pages unchanged since they were last crawled (per ETag) are not embedded again
+                    progress_bar = st.sidebar.progress(0.0, text="Crawling website...")
+                    crawler = WebsiteCrawler(rag_assistant.knowledge_base, max_depth=2, max_pages=25, ledger=ledger)
+                    crawled = crawler.crawl(
+                        input_url,
+                        progress=lambda p: progress_bar.progress(
+                            p.fraction, text=f"Crawled {p.pages_done} of {p.pages_queued} pages"
+                        ),
+                    )
+                    progress_bar.empty()
+                    if not (crawled.documents_loaded or crawled.chunks_skipped or crawled.pages_unchanged):
                         st.sidebar.error("Could not read website")
-                    st.session_state[f"{input_url}_uploaded"] = True
+                    st.session_state[f"{input_url}_scraped"] = True
                 alert.empty()
 
         # Add PDFs to knowledge base
@@ -138,11 +209,18 @@ def main() -> None:
             alert = st.sidebar.info("Processing PDF...", icon="🧠")
             rag_name = uploaded_file.name.split(".")[0]
             if f"{rag_name}_uploaded" not in st.session_state:
-                reader = PDFReader()
-                rag_documents: List[Document] = reader.read(uploaded_file)
-                if rag_documents:
-                    rag_assistant.knowledge_base.load_documents(rag_documents, upsert=True)
-                else:
+                # Pages are parsed in worker processes and embedded and loaded in batches
+                progress_bar = st.sidebar.progress(0.0, text="Reading PDF...")
+                # Files and chunks already in the knowledge base (per the ledger) are not embedded again
+                pipeline = IngestionPipeline(rag_assistant.knowledge_base, ledger=ledger)
+                ingested = pipeline.read(
+                    uploaded_file,
+                    progress=lambda p: progress_bar.progress(
+                        p.fraction, text=f"Embedded {p.pages_embedded} of {p.pages_total} pages"
+                    ),
+                )
+                progress_bar.empty()
+                if not (ingested.documents_loaded or ingested.chunks_skipped or ingested.unchanged):
                     st.sidebar.error("Could not read PDF")
                 st.session_state[f"{rag_name}_uploaded"] = True
             alert.empty()
@@ -150,6 +228,7 @@ def main() -> None:
     if rag_assistant.knowledge_base and rag_assistant.knowledge_base.vector_db:
         if st.sidebar.button("Clear Knowledge Base"):
             rag_assistant.knowledge_base.vector_db.clear()
+            get_ingestion_ledger().clear(ledger_scope(rag_assistant.knowledge_base))
             st.sidebar.success("Knowledge base cleared")
 
     if rag_assistant.storage:
@@ -157,16 +236,19 @@ def main() -> None:
         new_rag_assistant_run_id = st.sidebar.selectbox("Run ID", options=rag_assistant_run_ids)
         if st.session_state["rag_assistant_run_id"] != new_rag_assistant_run_id:
             logger.info(f"---*--- Loading {llm_model} run: {new_rag_assistant_run_id} ---*---")
-            st.session_state["rag_assistant"] = get_groq_assistant(
-                llm_model=llm_model, embeddings_model=embeddings_model, run_id=new_rag_assistant_run_id
+            st.session_state["rag_assistant"] = get_assistant(
+                llm_model, embeddings_model, vector_store, run_id=new_rag_assistant_run_id
             )
             st.rerun()
 
     if st.sidebar.button("New Run"):
         restart_assistant()
 
-    if "embeddings_model_updated" in st.session_state:
-        st.sidebar.info("Please add documents again as the embeddings model has changed.")
+    if st.session_state.get("embeddings_model_updated"):
+        st.sidebar.info(
+            "Please add documents again as the embeddings model has changed. "
+            "Text already embedded with this model is loaded from the embedding cache."
+        )
         st.session_state["embeddings_model_updated"] = False
 
 
@@ -0,0 +1,159 @@
+"""URL ingestion: WebsiteReader + load_documents (what app.py did) vs. WebsiteCrawler, on a local site.
+
+FixtureSite serves a generated website from a local HTTP server: a tree of --pages pages, each
+linking to --breadth others, plus a robots.txt that disallows /private/ and a sitemap listing
+pages no page links to. Every response takes --latency-ms and carries an ETag, and conditional
+requests get 304 Not Modified. WebsiteReader runs without its 1-3 s random delay per page, which
+would otherwise dominate. The crawler then runs again with the same ledger, as a re-crawl would.
+
+    python benchmarks/bench_crawler.py --pages 100 --breadth 4 --latency-ms 50
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from phi.document.reader.website import WebsiteReader  # noqa: E402
+
+from bench_ingestion import MemoryKnowledgeBase, SlowFakeEmbedder  # noqa: E402
+from crawler import WebsiteCrawler  # noqa: E402
+from ingestion_ledger import IngestionLedger  # noqa: E402
+
+SITEMAP_ONLY = 5  # Pages listed in the sitemap but not linked from any page
+
+
+class UndelayedWebsiteReader(WebsiteReader):
+    def delay(self, min_seconds=1, max_seconds=3):
+        pass
+
+
+class FixtureSite:
+    """A website on 127.0.0.1 for crawling without the network; counts the requests it serves."""
+
+    def __init__(self, pages: int, breadth: int, latency: float = 0.0):
+        self.pages = pages
+        self.breadth = breadth
+        self.latency = latency
+        self.requests: Counter = Counter()  # Path -> requests
+        self.not_modified = 0
+        self.connections = set()  # Client (host, port) pairs, i.e. TCP connections
+        self._lock = threading.Lock()
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, so clients can reuse connections
+
+            def do_GET(self):
+                with site._lock:
+                    site.requests[self.path] += 1
+                    site.connections.add(self.client_address)
+                if site.latency:
+                    time.sleep(site.latency)
+                status, content_type, body = site.page(self.path)
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    with site._lock:
+                        site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def page(self, path: str):
+        if path == "/robots.txt":
+            return 200, "text/plain", f"User-agent: *\nDisallow: /private/\nSitemap: {self.url}sitemap.xml\n".encode()
+        if path == "/sitemap.xml":
+            locs = "".join(f"<url><loc>{self.url}extra/{i}.html</loc></url>" for i in range(SITEMAP_ONLY))
+            return 200, "application/xml", (f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/'
+                                            f'schemas/sitemap/0.9">{locs}</urlset>').encode()
+        if path.startswith(("/private/", "/extra/")):
+            number = None
+        elif path == "/":
+            number = 0
+        elif path.startswith("/page/") and path.endswith(".html") and path[6:-5].isdigit():
+            number = int(path[6:-5])
+            if number >= self.pages:
+                return 404, "text/html", b"<html><body>Not found</body></html>"
+        else:
+            return 404, "text/html", b"<html><body>Not found</body></html>"
+        children = [] if number is None else \
+            [n for n in range(number * self.breadth + 1, number * self.breadth + self.breadth + 1) if n < self.pages]
+        links = "".join(f'<a href="/page/{n}.html">Page {n}</a> ' for n in children)
+        if number == 0:
+            links += '<a href="/private/staff.html">Staff</a> <a href="/menu.pdf">Menu</a>'
+        text = " ".join(f"Section {path} paragraph {i} about dishes, opening hours and reservations."
+                        for i in range(30))
+        return 200, "text/html", f"<html><body><nav>{links}</nav><main><p>{text}</p></main></body></html>".encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--breadth", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--request-ms", type=float, default=20.0, help="fake embedding request time")
+    args = parser.parse_args()
+
+    site = FixtureSite(args.pages, args.breadth, args.latency_ms / 1000)
+    embedder = SlowFakeEmbedder(request_ms=args.request_ms)
+    limit = args.pages + SITEMAP_ONLY + 1  # And /private/staff.html, which robots.txt disallows
+    print(f"{args.pages} pages, {args.latency_ms} ms per response, {args.request_ms} ms per embedding request")
+    print(f"{'':<28}{'s':>7}{'requests':>10}{'304s':>6}{'connections':>13}{'documents':>11}")
+
+    def report(label, seconds, documents):
+        print(f"{label:<28}{seconds:7.2f}{sum(site.requests.values()):10d}{site.not_modified:6d}"
+              f"{len(site.connections):13d}{documents:11d}")
+        site.requests.clear()
+        site.connections.clear()
+        site.not_modified = 0
+
+    try:
+        knowledge_base = MemoryKnowledgeBase(embedder)
+        reader = UndelayedWebsiteReader(max_links=limit, max_depth=args.depth)
+        start = time.perf_counter()
+        knowledge_base.load_documents(reader.read(site.url), upsert=True)
+        report("WebsiteReader (no delay)", time.perf_counter() - start, len(knowledge_base.vector_db.rows))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            ledger = IngestionLedger(os.path.join(tmp, "ledger.db"))
+            knowledge_base = MemoryKnowledgeBase(embedder)
+            for label in ("WebsiteCrawler", "WebsiteCrawler re-crawl"):
+                crawler = WebsiteCrawler(knowledge_base, max_depth=args.depth, max_pages=limit, ledger=ledger)
+                status = crawler.crawl(site.url)
+                disallowed = site.requests["/private/staff.html"]
+                report(label, status.elapsed, len(knowledge_base.vector_db.rows))
+                print(f"  {status}, /private/ requests: {disallowed}")
+            ledger.close()
+    finally:
+        site.close()
+
+
+if __name__ == "__main__":
+    main()
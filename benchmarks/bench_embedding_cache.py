@@ -0,0 +1,64 @@
+"""PDF ingestion with and without the embedding cache, switching embeddings models back and forth.
+
+Builds a --pages page PDF from the bundled Restaurant_Chatbot/Test PDFs (its pages repeat, as
+boilerplate does across real documents) and ingests it into a fresh in-memory knowledge base for
+model A, then model B, then model A again, as switching models in app.py does. The fake
+embedders sleep --request-ms per request. Embedding overlaps parsing in the pipeline, so with few
+cores the time is mostly parsing; the texts sent to the embeddings model are what the cache saves.
+
+    python benchmarks/bench_embedding_cache.py --pages 200 --request-ms 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_ingestion import MemoryKnowledgeBase, SlowFakeEmbedder, build_pdf  # noqa: E402
+from embedding_cache import CachedEmbedder, EmbeddingCache  # noqa: E402
+from ingestion import IngestionPipeline  # noqa: E402
+
+
+class CountingEmbedder(SlowFakeEmbedder):
+    model: str = "fake-a"
+    texts_sent: int = 0
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.texts_sent += len(texts)
+        return super().get_embeddings(texts)
+
+
+def ingest(path: str, embedder) -> float:
+    start = time.perf_counter()
+    IngestionPipeline(MemoryKnowledgeBase(embedder), workers=1).read(path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--request-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "manual.pdf")
+        build_pdf(path, args.pages)
+        models = {name: CountingEmbedder(model=name, request_ms=args.request_ms) for name in ("fake-a", "fake-b")}
+        cache = EmbeddingCache(os.path.join(tmp, "cache"))
+        print(f"{args.pages} pages, {args.request_ms} ms per embedding request")
+        print(f"{'':<30}{'s':>7}{'texts embedded':>16}")
+        for cached in (False, True):
+            for name in ("fake-a", "fake-b", "fake-a"):
+                embedder = models[name]
+                sent = embedder.texts_sent
+                seconds = ingest(path, CachedEmbedder(embedder=embedder, cache=cache) if cached else embedder)
+                label = f"{'cache' if cached else 'no cache'}, model {name[-1].upper()}"
+                print(f"{label:<30}{seconds:7.2f}{embedder.texts_sent - sent:16d}")
+        print(f"{len(cache)} vectors cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""PDF ingestion: PDFReader + load_documents (what app.py did) vs. IngestionPipeline.
+
+Builds a --pages page PDF from the bundled Restaurant_Chatbot/Test PDFs and loads it into an
+in-memory knowledge base. The fake embedder sleeps --request-ms per request, as a remote
+embedding service would, so batching shows up the way it would against a real one.
+
+    python benchmarks/bench_ingestion.py --pages 500 --request-ms 20 --workers 1 2 4
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from phi.document import Document  # noqa: E402
+from phi.document.reader.pdf import PDFReader  # noqa: E402
+from pypdf import PdfReader, PdfWriter  # noqa: E402
+
+from ingestion import FakeEmbedder, IngestionPipeline  # noqa: E402
+
+
+class SlowFakeEmbedder(FakeEmbedder):
+    request_ms: float = 20.0
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.request_ms / 1000)
+        return [super(SlowFakeEmbedder, self).get_embedding(text) for text in texts]
+
+    def get_embedding(self, text: str) -> List[float]:
+        time.sleep(self.request_ms / 1000)
+        return super().get_embedding(text)
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+
+class MemoryVectorDb:
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.rows: Dict[str, Document] = {}
+
+    def create(self):
+        pass
+
+    def upsert_available(self) -> bool:
+        return True
+
+    def upsert(self, documents: List[Document]):
+        for document in documents:
+            document.embed(embedder=self.embedder)  # As PgVector2.upsert does
+            self.rows[document.id] = document
+
+
+class MemoryKnowledgeBase:
+    def __init__(self, embedder):
+        self.vector_db = MemoryVectorDb(embedder)
+
+    def load_documents(self, documents: List[Document], upsert: bool = False):
+        self.vector_db.create()
+        self.vector_db.upsert(documents)
+
+
+def build_pdf(path: str, pages: int):
+    sources = [page for name in sorted(glob.glob(os.path.join(ROOT, "Restaurant_Chatbot", "Test", "*.pdf")))
+               for page in PdfReader(name).pages]
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_page(sources[i % len(sources)])
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--request-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "manual.pdf")
+        build_pdf(path, args.pages)
+        embedder = SlowFakeEmbedder(request_ms=args.request_ms)
+        print(f"{args.pages} pages, {args.request_ms} ms per embedding request, {os.cpu_count()} CPUs")
+
+        knowledge_base = MemoryKnowledgeBase(embedder)
+        start = time.perf_counter()
+        with open(path, "rb") as f:
+            knowledge_base.load_documents(PDFReader().read(f), upsert=True)
+        baseline = time.perf_counter() - start
+        expected = {id: document.content for id, document in knowledge_base.vector_db.rows.items()}
+        print(f"{'PDFReader + load_documents':<32}{baseline:8.2f} s  {len(expected)} chunks")
+
+        for workers in args.workers:
+            knowledge_base = MemoryKnowledgeBase(embedder)
+            updates = []
+            with open(path, "rb") as f:
+                status = IngestionPipeline(knowledge_base, workers=workers).read(f, progress=updates.append)
+            rows = knowledge_base.vector_db.rows
+            same = {id: document.content for id, document in rows.items()} == expected
+            print(f"{f'IngestionPipeline workers={workers}':<32}{status.elapsed:8.2f} s  {len(rows)} chunks, "
+                  f"{baseline / status.elapsed:5.1f}x, {len(updates)} progress updates, "
+                  f"{'same documents' if same else 'DOCUMENTS DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
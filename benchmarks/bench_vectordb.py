@@ -0,0 +1,90 @@
+"""Top-k retrieval from LocalVectorDb: exact scan vs. the IVF index, with and without a metadata filter.
+
+Loads --rows clustered random vectors (as pre-embedded documents, so no embedder is involved),
+then times --queries searches each way and reports latency percentiles and recall@k of the IVF
+search against the exact one. Also times an incremental delete and clear().
+
+    python benchmarks/bench_vectordb.py --rows 1000000 --dims 384
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from phi.document import Document  # noqa: E402
+
+from ingestion import FakeEmbedder  # noqa: E402
+from local_vectordb import LocalVectorDb  # noqa: E402
+
+BATCH = 10_000
+
+
+def percentiles(seconds):
+    values = np.asarray(seconds) * 1000
+    return np.percentile(values, 50), np.percentile(values, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dims", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(1000, args.dims)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = LocalVectorDb("bench", embedder=FakeEmbedder(dimensions=args.dims), directory=tmp, nprobe=args.nprobe,
+                           train_threshold=args.rows + 1)
+        start = time.perf_counter()
+        for first in range(0, args.rows, BATCH):
+            count = min(BATCH, args.rows - first)
+            vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.normal(size=(count, args.dims))
+            db.upsert([Document(id=f"chunk-{first + i}", name=f"doc-{(first + i) // 100}",
+                                meta_data={"page": (first + i) % 50}, content=f"chunk {first + i}",
+                                embedding=vector.tolist()) for i, vector in enumerate(vectors)])
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        db.optimize()
+        trained = time.perf_counter() - start
+        print(f"{args.rows} rows x {args.dims} dims: upsert {loaded:.1f} s ({args.rows / loaded:,.0f} rows/s), "
+              f"IVF training {trained:.1f} s ({len(db._centroids)} lists, nprobe {args.nprobe})")
+
+        queries = (centers[rng.integers(0, len(centers), args.queries)]
+                   + 0.5 * rng.normal(size=(args.queries, args.dims))).tolist()
+        print(f"{'':<24}{'p50 ms':>9}{'p95 ms':>9}{'recall@' + str(args.k):>11}")
+        for label, filters in (("all rows", None), ("filter page=7", {"page": 7})):
+            results = {}
+            for mode in ("exact", "ivf"):
+                centroids = db._centroids
+                if mode == "exact":
+                    db._centroids = None  # As before training: a full scan
+                timings, found = [], []
+                for query in queries:
+                    start = time.perf_counter()
+                    found.append([document.id for document in db.search_vector(query, args.k, filters)])
+                    timings.append(time.perf_counter() - start)
+                db._centroids = centroids
+                results[mode] = found
+                recall = np.mean([len(set(ivf) & set(exact)) / args.k
+                                  for ivf, exact in zip(found, results["exact"])])
+                p50, p95 = percentiles(timings)
+                print(f"{f'{mode}, {label}':<24}{p50:9.2f}{p95:9.2f}{recall:11.3f}")
+
+        start = time.perf_counter()
+        deleted = db.delete_documents(filters={"name": [f"doc-{i}" for i in range(10)]})
+        print(f"delete {deleted} rows by name: {(time.perf_counter() - start) * 1000:.1f} ms")
+        start = time.perf_counter()
+        db.clear()
+        print(f"clear: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import asyncio
+import ipaddress
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
+
+import httpx
+from bs4 import BeautifulSoup
+from phi.document import Document
+from phi.document.reader.website import WebsiteReader
+from phi.utils.log import logger
+
+from ingestion import EMBED_BATCH_SIZE, PreEmbeddedDocument, embed_batch
+from ingestion_ledger import IngestionLedger, content_hash, ledger_scope
+
+USER_AGENT = "GroqRAG-Crawler/1.0"
+MAX_CONNECTIONS = 16  # Requests in flight across all hosts, and connections kept alive
+MAX_PER_HOST = 4  # Requests in flight to any one host
+MAX_SITEMAPS = 20  # Sitemap files (including those listed by a sitemap index) read per crawl
+SKIPPED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".zip", ".mp3", ".mp4",
+                      ".css", ".js", ".xml")
+
+# (ETag, Last-Modified, content hash, links) of a fetched page, recorded in the ledger once it is loaded
+PageState = Tuple[Optional[str], Optional[str], Optional[str], List[str]]
+
+
+def primary_domain(url: str) -> str:
+    """'example.com' for https://www.example.com/menu; an IP address is kept whole."""
+    host = urlparse(url).hostname or ""
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        return ".".join(host.split(".")[-2:])
+
+
+class CrawlProgress:
+    """How far one crawl has got."""
+
+    __slots__ = ("pages_queued", "pages_fetched", "pages_unchanged", "pages_disallowed", "pages_failed",
+                 "chunks_skipped", "documents_loaded", "started_at")
+
+    def __init__(self):
+        self.pages_queued = 0
+        self.pages_fetched = 0
+        self.pages_unchanged = 0  # Not modified since the last crawl (304, or the same text)
+        self.pages_disallowed = 0  # By robots.txt
+        self.pages_failed = 0
+        self.chunks_skipped = 0  # Chunks the ledger already had with the same text
+        self.documents_loaded = 0
+        self.started_at = time.perf_counter()
+
+    @property
+    def pages_done(self) -> int:
+        return self.pages_fetched + self.pages_unchanged + self.pages_disallowed + self.pages_failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def fraction(self) -> float:
+        # Pages are discovered as the crawl goes, so this can step back when new links are queued
+        return self.pages_done / self.pages_queued if self.pages_queued else 1.0
+
+    def __repr__(self):
+        return (f"CrawlProgress(pages={self.pages_done}/{self.pages_queued}, fetched={self.pages_fetched}, "
+                f"unchanged={self.pages_unchanged}, disallowed={self.pages_disallowed}, failed={self.pages_failed}, "
+                f"skipped={self.chunks_skipped}, loaded={self.documents_loaded}, elapsed={self.elapsed:.2f}s)")
+
+
+class _Host:
+    """Per-host politeness: a concurrency limit, robots.txt and its crawl delay."""
+
+    __slots__ = ("semaphore", "robots", "lock", "next_request")
+
+    def __init__(self, max_requests: int, robots: "asyncio.Task"):
+        self.semaphore = asyncio.Semaphore(max_requests)
+        self.robots = robots  # Resolves to a RobotFileParser
+        self.lock = asyncio.Lock()
+        self.next_request = 0.0
+
+
+class WebsiteCrawler:
+    """Crawls a website concurrently and loads its pages into a knowledge base in batches.
+
+    Pages are fetched by `max_connections` asyncio workers over one pooled HTTP client, at most
+    `max_per_host` at a time per host, honouring robots.txt (including Crawl-delay). Links are
+    followed breadth first up to `max_depth` levels from the start page, `max_links_per_page`
+    per page and `max_pages` in all; URLs listed in the site's sitemaps are queued as if linked
+    from the start page. Pages are extracted and chunked as WebsiteReader does, then embedded and
+    loaded `batch_size` chunks at a time while the crawl continues.
+
+    With a `ledger`, each page's ETag / Last-Modified is kept, so a re-crawl makes conditional
+    requests and pages the server reports unchanged are neither downloaded nor embedded again; the
+    links recorded for them are still followed.
+    """
+
+    def __init__(self, knowledge_base, max_depth: int = 2, max_pages: int = 50, max_links_per_page: int = 100,
+                 max_connections: int = MAX_CONNECTIONS, max_per_host: int = MAX_PER_HOST,
+                 batch_size: int = EMBED_BATCH_SIZE, timeout: float = 10.0, respect_robots: bool = True,
+                 use_sitemaps: bool = True, user_agent: str = USER_AGENT, chunk: bool = True,
+                 chunk_size: int = 3000, ledger: Optional[IngestionLedger] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.knowledge_base = knowledge_base
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.max_links_per_page = max_links_per_page
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.respect_robots = respect_robots
+        self.use_sitemaps = use_sitemaps
+        self.user_agent = user_agent
+        self.reader = WebsiteReader(chunk=chunk, chunk_size=chunk_size)  # For extraction and chunking
+        self.embedder = getattr(getattr(knowledge_base, "vector_db", None), "embedder", None)
+        if self.embedder is None:
+            raise ValueError("The knowledge base has no embedder")
+        self.ledger = ledger
+        self.scope = ledger_scope(knowledge_base) if ledger else None
+        self.transport = transport  # E.g. httpx.MockTransport in place of the network
+
+    def crawl(self, url: str, progress: Optional[Callable[[CrawlProgress], None]] = None) -> CrawlProgress:
+        """Crawls from `url`; `progress` is called on the calling thread as batches are loaded."""
+        return asyncio.run(self.acrawl(url, progress))
+
+    async def acrawl(self, url: str, progress: Optional[Callable[[CrawlProgress], None]] = None) -> CrawlProgress:
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        async with httpx.AsyncClient(headers={"User-Agent": self.user_agent}, timeout=self.timeout,
+                                     follow_redirects=True, limits=limits, transport=self.transport) as client:
+            status = await _Crawl(self, client, url).run(progress)
+        logger.info(f"Crawled {url}: {status}")
+        return status
+
+    def _store(self, documents: List[Document], pages: List[Tuple[str, PageState]]):
+        """Embeds and loads one batch, then records it in the ledger (runs in a worker thread)."""
+        if documents:
+            loaded = []
+            for start in range(0, len(documents), self.batch_size):
+                batch = documents[start:start + self.batch_size]
+                vectors = embed_batch(self.embedder, [document.content for document in batch])
+                loaded.extend(PreEmbeddedDocument(id=document.id, name=document.name, meta_data=document.meta_data,
+                                                  content=document.content, embedding=vector)
+                              for document, vector in zip(batch, vectors))
+            self.knowledge_base.load_documents(loaded, upsert=True)
+        if self.ledger is not None:
+            # Recorded only once loaded, so a failed crawl fetches these pages again next time
+            self.ledger.record_documents(self.scope, documents)
+            for url, (etag, last_modified, page_hash, links) in pages:
+                self.ledger.record_crawled_page(self.scope, url, etag, last_modified, page_hash, links)
+
+
+class _Crawl:
+    """State of one crawl: the frontier, hosts seen and pages waiting to be loaded."""
+
+    def __init__(self, crawler: WebsiteCrawler, client: httpx.AsyncClient, url: str):
+        self.crawler = crawler
+        self.client = client
+        self.start = urldefrag(url)[0]
+        self.primary_domain = primary_domain(self.start)
+        self.status = CrawlProgress()
+        self.seen: Set[str] = set()
+        self.hosts: Dict[str, _Host] = {}
+        self.frontier: "asyncio.Queue[Tuple[str, int]]" = asyncio.Queue()
+        self.pages: "asyncio.Queue" = asyncio.Queue()  # (url, documents, page state); None when done
+
+    async def run(self, progress: Optional[Callable[[CrawlProgress], None]]) -> CrawlProgress:
+        self.schedule(self.start, 1)
+        workers = [asyncio.create_task(self.work()) for _ in range(self.crawler.max_connections)]
+        loader = asyncio.create_task(self.load(progress))
+        try:
+            if self.crawler.use_sitemaps and self.crawler.max_depth > 1:
+                for url in await self.sitemap_urls():
+                    self.schedule(url, 2)
+            crawled = asyncio.create_task(self.frontier.join())
+            await asyncio.wait({crawled, loader}, return_when=asyncio.FIRST_COMPLETED)
+            if loader.done():  # Loading failed; its exception is raised below
+                crawled.cancel()
+            await self.pages.put(None)
+            await loader
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            loader.cancel()
+        return self.status
+
+    def in_scope(self, url: str) -> bool:
+        parsed = urlparse(url)
+        # The primary domain or a subdomain of it, never a domain that merely ends the same way
+        host = parsed.hostname or ""
+        return (parsed.scheme in ("http", "https")
+                and (host == self.primary_domain or host.endswith("." + self.primary_domain))
+                and not parsed.path.lower().endswith(SKIPPED_EXTENSIONS))
+
+    def schedule(self, url: str, depth: int):
+        url = urldefrag(url)[0]
+        if (url in self.seen or depth > self.crawler.max_depth or len(self.seen) >= self.crawler.max_pages
+                or not self.in_scope(url)):
+            return
+        self.seen.add(url)
+        self.status.pages_queued += 1
+        self.frontier.put_nowait((url, depth))
+
+    def host(self, url: str) -> _Host:
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        host = self.hosts.get(origin)
+        if host is None:
+            host = self.hosts[origin] = _Host(self.crawler.max_per_host, asyncio.create_task(self.robots(origin)))
+        return host
+
+    async def robots(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = await self.client.get(parser.url)
+        except httpx.HTTPError:
+            parser.allow_all = True
+            return parser
+        # As RobotFileParser.read: 401/403 means keep out, any other error means no rules
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+    async def sitemap_urls(self) -> List[str]:
+        robots = await self.host(self.start).robots
+        parsed = urlparse(self.start)
+        sitemaps = list(robots.site_maps() or [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"])
+        urls: List[str] = []
+        read = 0
+        while sitemaps and read < MAX_SITEMAPS and len(urls) < self.crawler.max_pages:
+            sitemap = sitemaps.pop(0)
+            read += 1
+            try:
+                response = await self.client.get(sitemap)
+                response.raise_for_status()
+                root = ElementTree.fromstring(response.content)
+            except (httpx.HTTPError, ElementTree.ParseError) as e:
+                logger.debug(f"Could not read sitemap {sitemap}: {e}")
+                continue
+            # <urlset> lists pages, <sitemapindex> lists further sitemaps
+            found = [element.text.strip() for element in root.iter() if element.tag.endswith("loc") and element.text]
+            (sitemaps if root.tag.endswith("sitemapindex") else urls).extend(found)
+        return urls
+
+    async def work(self):
+        while True:
+            url, depth = await self.frontier.get()
+            try:
+                await self.visit(url, depth)
+            except Exception as e:
+                self.status.pages_failed += 1
+                logger.debug(f"Failed to crawl: {url}: {e}")
+            finally:
+                self.frontier.task_done()
+
+    async def visit(self, url: str, depth: int):
+        crawler = self.crawler
+        host = self.host(url)
+        if crawler.respect_robots and not (await host.robots).can_fetch(crawler.user_agent, url):
+            self.status.pages_disallowed += 1
+            return
+        previous = crawler.ledger.crawled_page(crawler.scope, url) if crawler.ledger else None
+        headers = {}
+        if previous and previous[0]:
+            headers["If-None-Match"] = previous[0]
+        if previous and previous[1]:
+            headers["If-Modified-Since"] = previous[1]
+        async with host.semaphore:
+            delay = (await host.robots).crawl_delay(crawler.user_agent) if crawler.respect_robots else None
+            if delay:
+                async with host.lock:
+                    wait = host.next_request - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    host.next_request = time.monotonic() + float(delay)
+            response = await self.client.get(url, headers=headers)
+        if response.status_code == 304 and previous:
+            self.status.pages_unchanged += 1
+            for link in previous[3]:
+                self.schedule(link, depth + 1)
+            return
+        response.raise_for_status()
+        if "html" not in response.headers.get("content-type", "text/html"):
+            return
+
+        soup = BeautifulSoup(response.content, "html.parser")
+        links = []
+        for anchor in soup.find_all("a", href=True):
+            link = urldefrag(urljoin(str(response.url), anchor["href"]))[0]
+            if self.in_scope(link) and link not in links:
+                links.append(link)
+                if len(links) >= crawler.max_links_per_page:
+                    break
+        for link in links:
+            self.schedule(link, depth + 1)
+
+        content = crawler.reader._extract_main_content(soup)
+        page_hash = content_hash(content) if content else None
+        state = (response.headers.get("etag"), response.headers.get("last-modified"), page_hash, links)
+        if previous and page_hash == previous[2]:
+            # The server does not support validators, but the text is the same
+            self.status.pages_unchanged += 1
+            await self.pages.put((url, [], state))
+            return
+        self.status.pages_fetched += 1
+        documents = []
+        if content:
+            # As WebsiteReader.read builds them
+            page = Document(name=self.start, id=url, meta_data={"url": url}, content=content)
+            documents = crawler.reader.chunk_document(page) if crawler.reader.chunk else [page]
+        await self.pages.put((url, documents, state))
+
+    async def load(self, progress: Optional[Callable[[CrawlProgress], None]]):
+        crawler = self.crawler
+        documents: List[Document] = []
+        pages: List[Tuple[str, PageState]] = []
+        while True:
+            item = await self.pages.get()
+            if item is not None:
+                url, page_documents, state = item
+                fresh = crawler.ledger.new_documents(crawler.scope, page_documents) if crawler.ledger \
+                    else page_documents
+                self.status.chunks_skipped += len(page_documents) - len(fresh)
+                documents.extend(fresh)
+                pages.append((url, state))
+            if len(documents) >= crawler.batch_size or (item is None and pages):
+                # Embedding and loading block, so they run off the event loop while fetching continues
+                await asyncio.to_thread(crawler._store, documents, pages)
+                self.status.documents_loaded += len(documents)
+                documents, pages = [], []
+            if progress:
+                progress(self.status)
+            if item is None:
+                return
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from phi.embedder import Embedder
+from phi.utils.log import logger
+
+from ingestion import embed_batch
+
+CACHE_DIR = "embedding_cache"
+_DIGEST_SIZE = 32  # sha256
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).digest()
+
+
+class _ModelStore:
+    """Vectors of one embeddings model: a float32 matrix file and a file of row digests.
+
+    Row i of `<model>.f32` is the vector for the i-th digest in `<model>.idx`. Both files are only
+    appended to, the matrix first, so after a crash the shorter of the two says how many rows
+    are complete. Lookups read the matrix through a memory map.
+    """
+
+    def __init__(self, directory: str, model: str):
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        self.matrix_path = os.path.join(directory, f"{name}.f32")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self.meta_path = os.path.join(directory, f"{name}.json")
+        self.dimensions: Optional[int] = None
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                self.dimensions = json.load(f)["dimensions"]
+        self.rows: Dict[bytes, int] = {}  # Digest -> row offset in the matrix
+        self.count = 0  # Complete rows in both files
+        self._matrix: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        if self.dimensions:
+            self._load()
+
+    def _load(self):
+        row_bytes = 4 * self.dimensions
+        index_rows = os.path.getsize(self.index_path) // _DIGEST_SIZE if os.path.exists(self.index_path) else 0
+        matrix_rows = os.path.getsize(self.matrix_path) // row_bytes if os.path.exists(self.matrix_path) else 0
+        count = min(index_rows, matrix_rows)
+        # Drop a partly written last row, if any
+        for path, size in ((self.index_path, count * _DIGEST_SIZE), (self.matrix_path, count * row_bytes)):
+            if os.path.exists(path) and os.path.getsize(path) != size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+        self.count = count
+        if not count:
+            return
+        with open(self.index_path, "rb") as f:
+            digests = f.read()
+        for row in range(count):
+            self.rows.setdefault(digests[row * _DIGEST_SIZE:(row + 1) * _DIGEST_SIZE], row)
+
+    def _map(self) -> np.memmap:
+        # Remapped only when rows were appended since the last lookup
+        if self._matrix is None or self._matrix.shape[0] < self.count:
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r",
+                                     shape=(self.count, self.dimensions))
+        return self._matrix
+
+    def get(self, digests: Sequence[bytes]) -> List[Optional[List[float]]]:
+        with self._lock:
+            offsets = [self.rows.get(digest) for digest in digests]
+            if not any(offset is not None for offset in offsets):
+                return [None] * len(digests)
+            matrix = self._map()
+            return [matrix[offset].tolist() if offset is not None else None for offset in offsets]
+
+    def put(self, digests: Sequence[bytes], vectors: Sequence[Sequence[float]]):
+        with self._lock:
+            new = {}
+            for digest, vector in zip(digests, vectors):
+                if digest not in self.rows and digest not in new:
+                    new[digest] = vector
+            if not new:
+                return
+            matrix = np.asarray(list(new.values()), dtype=np.float32)
+            if matrix.ndim != 2:
+                logger.warning("Embedding cache: vectors of different lengths, not cached")
+                return
+            if self.dimensions is None:
+                self.dimensions = matrix.shape[1]
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dimensions": self.dimensions}, f)
+            elif matrix.shape[1] != self.dimensions:
+                logger.warning(f"Embedding cache: expected {self.dimensions} dimensions, got {matrix.shape[1]}")
+                return
+            with open(self.matrix_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self.index_path, "ab") as f:
+                f.write(b"".join(new))
+            for row, digest in enumerate(new, start=self.count):
+                self.rows[digest] = row
+            self.count += len(new)
+
+
+class EmbeddingCache:
+    """Embeddings already computed, on disk, keyed by (embeddings model, text hash).
+
+    Each model has its own append-only float32 matrix, read through a memory map, plus an index of
+    text digests giving each vector's row. Switching back to a model used before finds its vectors
+    again, and a chunk of text repeated across documents is embedded once per model.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._stores: Dict[str, _ModelStore] = {}
+        self._lock = threading.Lock()
+
+    def _store(self, model: str) -> _ModelStore:
+        with self._lock:
+            store = self._stores.get(model)
+            if store is None:
+                store = self._stores[model] = _ModelStore(self.directory, model)
+            return store
+
+    def __len__(self):
+        return sum(len(store.rows) for store in self._stores.values())
+
+    def get(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """The cached vector of each text, or None where there is none."""
+        return self._store(model).get([text_digest(text) for text in texts])
+
+    def put(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]):
+        self._store(model).put([text_digest(text) for text in texts], vectors)
+
+
+def model_key(embedder: Embedder) -> str:
+    """Cache key of an embedder: its class, model name and configured dimensions."""
+    return f"{type(embedder).__name__}-{getattr(embedder, 'model', '')}-{embedder.dimensions}"
+
+
+class CachedEmbedder(Embedder):
+    """Wraps an embedder so each text is embedded at most once per model, across runs."""
+
+    embedder: Embedder
+    cache: Any  # EmbeddingCache
+    key: str = ""
+
+    def __init__(self, **data: Any):
+        super().__init__(**data)
+        self.dimensions = self.embedder.dimensions
+        self.key = self.key or model_key(self.embedder)
+
+    @property
+    def model(self) -> Optional[str]:
+        return getattr(self.embedder, "model", None)
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get(self.key, texts)
+        missing: Dict[str, List[int]] = {}  # Text -> positions, so a text repeated in the batch is sent once
+        for position, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(texts[position], []).append(position)
+        if missing:
+            # Rounded to float32 as stored, so a text gets the same vector whether embedded now or cached
+            fresh = np.asarray(embed_batch(self.embedder, list(missing)), dtype=np.float32).tolist()
+            self.cache.put(self.key, list(missing), fresh)
+            for positions, vector in zip(missing.values(), fresh):
+                for position in positions:
+                    vectors[position] = vector
+        return vectors
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        vector = self.cache.get(self.key, [text])[0]
+        if vector is not None:
+            return vector, None
+        vector, usage = self.embedder.get_embedding_and_usage(text)
+        vector = np.asarray(vector, dtype=np.float32).tolist()
+        self.cache.put(self.key, [text], [vector])
+        return vector, usage
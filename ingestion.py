@@ -0,0 +1,366 @@
+import hashlib
+import math
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import get_context
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple, Union
+
+from phi.document import Document
+from phi.document.reader.base import Reader
+from phi.embedder import Embedder
+from phi.utils.log import logger
+
+from ingestion_ledger import IngestionLedger, content_hash, ledger_scope
+
+try:
+    from phi.embedder.openai import OpenAIEmbedder
+except ImportError:  # `openai` not installed
+    OpenAIEmbedder = None
+
+PAGES_PER_TASK = 8  # Pages a worker parses per task
+EMBED_BATCH_SIZE = 64  # Chunks per embedding request
+UPSERT_BATCH_SIZE = 512  # Documents per load_documents call
+QUEUE_SIZE = 32  # Parsed page batches waiting for the embedder, bounds memory on large files
+DELETE_BATCH_SIZE = 500  # Chunk ids per DELETE statement
+
+# (id, meta_data, content, content hash) of one chunk, as produced by a parse worker
+ChunkRow = Tuple[str, Dict[str, Any], str, str]
+
+
+class PreEmbeddedDocument(Document):
+    """Document whose embedding was computed in a batch; vector dbs call embed() again on upsert."""
+
+    def embed(self, embedder: Optional[Embedder] = None) -> None:
+        if self.embedding is None:
+            super().embed(embedder)
+
+
+class FakeEmbedder(Embedder):
+    """Deterministic hash-based vectors, for testing the pipeline without an embedding service."""
+
+    dimensions: int = 64
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return [self.get_embedding(text) for text in texts]
+
+    def get_embedding(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode()).digest()
+        vector = [digest[i % len(digest)] / 255.0 - 0.5 for i in range(self.dimensions)]
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+
+class IngestProgress:
+    """How far one PDF has got through the pipeline."""
+
+    __slots__ = ("pages_total", "pages_embedded", "chunks_embedded", "chunks_skipped", "documents_loaded",
+                 "chunks_removed", "unchanged", "started_at")
+
+    def __init__(self, pages_total: int):
+        self.pages_total = pages_total
+        self.pages_embedded = 0  # Pages whose chunks have all been embedded (or skipped)
+        self.chunks_embedded = 0
+        self.chunks_skipped = 0  # Chunks the ledger already had with the same text
+        self.documents_loaded = 0
+        self.chunks_removed = 0  # Chunks of an earlier version of the file that it no longer has
+        self.unchanged = False  # The ledger already had this exact file
+        self.started_at = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def fraction(self) -> float:
+        # Embedding is the slow stage; loading follows in batches
+        return self.pages_embedded / self.pages_total if self.pages_total else 1.0
+
+    def __repr__(self):
+        return (f"IngestProgress(pages={self.pages_embedded}/{self.pages_total}, embedded={self.chunks_embedded}, "
+                f"skipped={self.chunks_skipped}, loaded={self.documents_loaded}, removed={self.chunks_removed}, "
+                f"elapsed={self.elapsed:.2f}s)")
+
+
+# Per worker process: the file last opened, so consecutive tasks on one PDF parse its xref once
+_open_reader: Dict[Tuple[str, int, int], Any] = {}
+
+
+def _parse_pages(path: str, doc_name: str, first: int, last: int, chunk: bool, chunk_size: int) -> List[ChunkRow]:
+    """Text of pages [first, last) as PDFReader would produce it, chunked the way Reader.chunk_document does."""
+    from pypdf import PdfReader
+
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)  # A file rewritten in place is opened afresh
+    reader = _open_reader.get(key)
+    if reader is None:
+        _open_reader.clear()
+        reader = _open_reader[key] = PdfReader(path)
+    chunker = Reader(chunk_size=chunk_size)
+    rows: List[ChunkRow] = []
+    for page_number in range(first + 1, last + 1):
+        page = Document(name=doc_name, id=f"{doc_name}_{page_number}", meta_data={"page": page_number},
+                        content=reader.pages[page_number - 1].extract_text())
+        pieces = chunker.chunk_document(page) if chunk else [page]
+        rows.extend((piece.id, piece.meta_data, piece.content, content_hash(piece.content)) for piece in pieces)
+    return rows
+
+
+def embed_batch(embedder: Embedder, texts: List[str], pool: Optional[ThreadPoolExecutor] = None) -> List[List[float]]:
+    """Embeddings for `texts` in as few requests as the embedder allows."""
+    if hasattr(embedder, "get_embeddings"):
+        return embedder.get_embeddings(texts)
+    if OpenAIEmbedder is not None and isinstance(embedder, OpenAIEmbedder) and embedder.encoding_format == "float":
+        # The embeddings endpoint takes a list of inputs in one request
+        response = embedder._response(text=texts)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    # One request per text (e.g. Ollama), several in flight at a time
+    if pool is not None:
+        return list(pool.map(embedder.get_embedding, texts))
+    return [embedder.get_embedding(text) for text in texts]
+
+
+def delete_chunks(vector_db, ids: List[str]) -> bool:
+    """Deletes documents from the vector db by id; False when it offers no way to."""
+    if not ids:
+        return True
+    if hasattr(vector_db, "delete_documents"):  # LocalVectorDb
+        vector_db.delete_documents(ids=ids)
+        return True
+    table = getattr(vector_db, "table", None)
+    session = getattr(vector_db, "Session", None)
+    if table is not None and session is not None and "id" in table.c:  # PgVector2
+        with session() as sess, sess.begin():
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                sess.execute(table.delete().where(table.c.id.in_(ids[start:start + DELETE_BATCH_SIZE])))
+        return True
+    return False
+
+
+class IngestionPipeline:
+    """Loads PDFs into a knowledge base: parse in processes, embed in batches, upsert in bulk.
+
+    With a `ledger`, a file already ingested into this knowledge base is skipped outright, and of
+    an edited one only the chunks whose text changed are embedded and loaded. Chunks the earlier
+    version had and the edited one does not (e.g. of deleted pages) are then deleted.
+
+    Page ranges are parsed and chunked by a process pool, so parsing scales with cores. Parsed
+    chunks flow through a bounded queue to embedding threads that send `embed_batch_size` chunks
+    per request, and embedded documents are loaded `upsert_batch_size` at a time. `progress` is
+    called on the calling thread after every embedding batch, so a Streamlit app can update a bar.
+    """
+
+    def __init__(self, knowledge_base, workers: Optional[int] = None, embed_workers: int = 4,
+                 pages_per_task: int = PAGES_PER_TASK, embed_batch_size: int = EMBED_BATCH_SIZE,
+                 upsert_batch_size: int = UPSERT_BATCH_SIZE, queue_size: int = QUEUE_SIZE,
+                 chunk: bool = True, chunk_size: int = 3000, embedder: Optional[Embedder] = None,
+                 ledger: Optional[IngestionLedger] = None):
+        self.knowledge_base = knowledge_base
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_workers = embed_workers
+        self.pages_per_task = pages_per_task
+        self.embed_batch_size = embed_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.queue_size = queue_size
+        self.chunk = chunk
+        self.chunk_size = chunk_size
+        vector_db = getattr(knowledge_base, "vector_db", None)
+        self.embedder = embedder or getattr(vector_db, "embedder", None)
+        if self.embedder is None:
+            raise ValueError("The knowledge base has no embedder")
+        self.ledger = ledger
+        self.scope = ledger_scope(knowledge_base) if ledger else None
+
+    def read(self, pdf: Union[str, Path, IO[Any]], progress: Optional[Callable[[IngestProgress], None]] = None,
+             doc_name: Optional[str] = None) -> IngestProgress:
+        """Ingests one PDF given as a path or a file object (e.g. a Streamlit upload)."""
+        if isinstance(pdf, (str, Path)):
+            doc_name = doc_name or Path(pdf).name.split(".")[0].replace(" ", "_")
+            with open(pdf, "rb") as f:
+                file_hash = self._hash_file(f)
+            return self._read_file(str(pdf), doc_name, file_hash, progress)
+        doc_name = doc_name or getattr(pdf, "name", "pdf").split(".")[0]
+        # Workers open the file by path, so an upload is spooled to disk once instead of pickled per task
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            file_hash = self._hash_file(pdf, copy_to=f)
+            path = f.name
+        try:
+            return self._read_file(path, doc_name, file_hash, progress)
+        finally:
+            os.unlink(path)
+
+    @staticmethod
+    def _hash_file(f: IO[bytes], copy_to: Optional[IO[bytes]] = None) -> str:
+        digest = hashlib.sha256()
+        f.seek(0)
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+            if copy_to is not None:
+                copy_to.write(block)
+        return digest.hexdigest()
+
+    def _read_file(self, path: str, doc_name: str, file_hash: str,
+                   progress: Optional[Callable[[IngestProgress], None]]) -> IngestProgress:
+        from pypdf import PdfReader
+
+        if self.ledger is not None:
+            ingested_as = self.ledger.find_document(self.scope, file_hash)
+            if ingested_as is not None:
+                logger.info(f"Skipping {doc_name}: already ingested as {ingested_as}")
+                status = IngestProgress(0)
+                status.unchanged = True
+                return status
+        chunk_ids = set()
+        status = self._run(path, doc_name, len(PdfReader(path).pages), progress, chunk_ids)
+        if self.ledger is not None:
+            stale = sorted(self.ledger.document_chunks(self.scope, doc_name) - chunk_ids)
+            if stale and delete_chunks(getattr(self.knowledge_base, "vector_db", None), stale):
+                self.ledger.forget_chunks(self.scope, stale)
+                status.chunks_removed = len(stale)
+                logger.info(f"Removed {len(stale)} chunks no longer in {doc_name}")
+            elif stale:
+                logger.warning(f"{len(stale)} chunks no longer in {doc_name} stay in the vector db, "
+                               f"which cannot delete by id")
+            self.ledger.record_document(self.scope, doc_name, file_hash,
+                                        status.chunks_embedded + status.chunks_skipped)
+        return status
+
+    def _run(self, path: str, doc_name: str, page_count: int, progress: Optional[Callable[[IngestProgress], None]],
+             chunk_ids: set) -> IngestProgress:
+        status = IngestProgress(page_count)
+        logger.info(f"Ingesting {doc_name}: {page_count} pages, {self.workers} workers")
+        ranges = [(first, min(first + self.pages_per_task, page_count))
+                  for first in range(0, page_count, self.pages_per_task)]
+        parsed: "queue.Queue" = queue.Queue(maxsize=self.queue_size)  # (pages, chunk rows)
+        embedded: "queue.Queue" = queue.Queue(maxsize=self.queue_size)  # (pages, documents, hashes, skipped)
+        failures: List[BaseException] = []
+        stop = threading.Event()  # Set when a stage fails; the others then wind down
+        done = object()
+
+        def put(stage_queue, item):
+            while not stop.is_set():
+                try:
+                    stage_queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def get(stage_queue):
+            while not stop.is_set():
+                try:
+                    return stage_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return done
+
+        def produce():
+            try:
+                if len(ranges) <= 1 or self.workers == 1:
+                    for first, last in ranges:
+                        put(parsed, (last - first, _parse_pages(path, doc_name, first, last, self.chunk,
+                                                                self.chunk_size)))
+                    return
+                with ProcessPoolExecutor(min(self.workers, len(ranges)), mp_context=get_context("spawn")) as pool:
+                    pending: Dict[Any, int] = {}  # future -> pages in its range
+                    position = 0
+                    while (position < len(ranges) or pending) and not stop.is_set():
+                        # At most two tasks per worker in flight, so results never pile up in memory
+                        while position < len(ranges) and len(pending) < 2 * self.workers:
+                            first, last = ranges[position]
+                            pending[pool.submit(_parse_pages, path, doc_name, first, last, self.chunk,
+                                                self.chunk_size)] = last - first
+                            position += 1
+                        finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            put(parsed, (pending.pop(future), future.result()))
+                    for future in pending:
+                        future.cancel()
+            except BaseException as e:
+                failures.append(e)
+                stop.set()
+            finally:
+                put(parsed, done)
+
+        def embed():
+            rows: List[ChunkRow] = []
+            pages = 0  # Pages whose last chunk is in `rows`
+            try:
+                with ThreadPoolExecutor(self.embed_workers) as pool:
+                    while True:
+                        item = get(parsed)
+                        skipped = 0
+                        if item is not done:
+                            pages += item[0]
+                            fresh = item[1]
+                            chunk_ids.update(row[0] for row in fresh)
+                            if self.ledger is not None and fresh:
+                                loaded = self.ledger.unchanged(self.scope, [(row[0], row[3]) for row in fresh])
+                                fresh = [row for row in fresh if row[0] not in loaded]
+                                skipped = len(item[1]) - len(fresh)
+                            rows.extend(fresh)
+                        while len(rows) >= self.embed_batch_size or (item is done and rows):
+                            batch, rows = rows[:self.embed_batch_size], rows[self.embed_batch_size:]
+                            vectors = embed_batch(self.embedder, [row[2] for row in batch], pool)
+                            documents = [PreEmbeddedDocument(id=id, name=doc_name, meta_data=meta_data,
+                                                             content=content, embedding=vector)
+                                         for (id, meta_data, content, _), vector in zip(batch, vectors)]
+                            put(embedded, (0 if rows else pages, documents, [row[3] for row in batch], skipped))
+                            pages = pages if rows else 0
+                            skipped = 0
+                        if (pages and not rows) or skipped:
+                            # Pages without text (or already loaded) count towards progress too
+                            put(embedded, (0 if rows else pages, [], [], skipped))
+                            pages = pages if rows else 0
+                        if item is done:
+                            return
+            except BaseException as e:
+                failures.append(e)
+                stop.set()
+            finally:
+                put(embedded, done)
+
+        threads = [threading.Thread(target=produce, daemon=True), threading.Thread(target=embed, daemon=True)]
+        for thread in threads:
+            thread.start()
+        buffer: List[Document] = []
+        hashes: List[str] = []
+        try:
+            while True:
+                item = get(embedded)
+                if failures:
+                    break
+                if item is not done:
+                    status.pages_embedded += item[0]
+                    status.chunks_embedded += len(item[1])
+                    status.chunks_skipped += item[3]
+                    buffer.extend(item[1])
+                    hashes.extend(item[2])
+                if buffer and (len(buffer) >= self.upsert_batch_size or item is done):
+                    self.knowledge_base.load_documents(buffer, upsert=True)
+                    if self.ledger is not None:
+                        # Recorded only once loaded, so a failed run embeds these again next time
+                        self.ledger.record_chunks(self.scope, ((document.id, chunk_hash, doc_name)
+                                                               for document, chunk_hash in zip(buffer, hashes)))
+                    status.documents_loaded += len(buffer)
+                    buffer, hashes = [], []
+                if progress:
+                    progress(status)
+                if item is done:
+                    break
+        except BaseException as e:
+            failures.append(e)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        if failures:
+            raise failures[0]
+        logger.info(f"Ingested {doc_name}: {status}")
+        return status
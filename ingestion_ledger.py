@@ -0,0 +1,176 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from phi.document import Document
+from phi.utils.log import logger
+
+LEDGER_PATH = "ingestion_ledger.db"
+_LOOKUP_BATCH = 500  # Chunk ids per IN (...) query, under SQLite's parameter limit
+
+# (ETag, Last-Modified, content hash, links) of a crawled page
+CrawledPage = Tuple[Optional[str], Optional[str], Optional[str], List[str]]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def ledger_scope(knowledge_base) -> str:
+    """Identifies where vectors live and how they were made: vector db collection and embedding model.
+
+    Changing the embeddings model gives a new scope, so documents are embedded again for it.
+    """
+    vector_db = getattr(knowledge_base, "vector_db", None)
+    embedder = getattr(vector_db, "embedder", None)
+    embedder = getattr(embedder, "embedder", embedder)  # The embedder behind a CachedEmbedder
+    collection = getattr(vector_db, "collection", None) or getattr(vector_db, "table_name", None) or ""
+    return ":".join(str(part) for part in (type(vector_db).__name__, collection, type(embedder).__name__,
+                                           getattr(embedder, "model", ""), getattr(embedder, "dimensions", "")))
+
+
+class IngestionLedger:
+    """Persistent record of what is already in each knowledge base, by content hash.
+
+    Whole files are recorded by the hash of their bytes, so uploading the same PDF again (under any
+    name, in any session, after a restart) skips it without parsing. Chunks are recorded by id and
+    the hash of their text, so a re-uploaded document with a few edited pages only embeds the
+    chunks whose text changed, and the document each belongs to, so the chunks an edit removed
+    can be deleted. Entries are scoped by ledger_scope() and dropped with clear().
+    """
+
+    def __init__(self, path: str = LEDGER_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingested_documents (
+                    scope TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    ingested_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (scope, name)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ingested_documents_hash "
+                               "ON ingested_documents (scope, content_hash)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingested_chunks (
+                    scope TEXT NOT NULL,
+                    chunk_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    document TEXT,
+                    PRIMARY KEY (scope, chunk_id)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ingested_chunks_document "
+                               "ON ingested_chunks (scope, document)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawled_pages (
+                    scope TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    content_hash TEXT,
+                    links TEXT NOT NULL DEFAULT '[]',
+                    crawled_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (scope, url)
+                ) WITHOUT ROWID
+            """)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def find_document(self, scope: str, file_hash: str) -> Optional[str]:
+        """Name under which a file with these exact bytes was ingested, if it was."""
+        with self._lock:
+            row = self._conn.execute("SELECT name FROM ingested_documents WHERE scope = ? AND content_hash = ? "
+                                     "LIMIT 1", (scope, file_hash)).fetchone()
+        return row[0] if row else None
+
+    def record_document(self, scope: str, name: str, file_hash: str, chunk_count: int):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO ingested_documents (scope, name, content_hash, chunk_count) VALUES (?, ?, ?, ?)
+                ON CONFLICT (scope, name) DO UPDATE SET content_hash = excluded.content_hash,
+                    chunk_count = excluded.chunk_count, ingested_at = CURRENT_TIMESTAMP
+            """, (scope, name, file_hash, chunk_count))
+
+    def unchanged(self, scope: str, chunks: Sequence[Tuple[str, str]]) -> set:
+        """Ids among (chunk id, content hash) pairs whose text is already loaded under that id."""
+        found = set()
+        with self._lock:
+            for start in range(0, len(chunks), _LOOKUP_BATCH):
+                batch = dict(chunks[start:start + _LOOKUP_BATCH])
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(f"SELECT chunk_id, content_hash FROM ingested_chunks "
+                                          f"WHERE scope = ? AND chunk_id IN ({placeholders})", (scope, *batch))
+                found.update(chunk_id for chunk_id, stored_hash in rows if batch[chunk_id] == stored_hash)
+        return found
+
+    def record_chunks(self, scope: str, chunks: Iterable[Tuple[str, str, Optional[str]]]):
+        """Marks (chunk id, content hash, document name) as loaded."""
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                INSERT INTO ingested_chunks (scope, chunk_id, content_hash, document) VALUES (?, ?, ?, ?)
+                ON CONFLICT (scope, chunk_id) DO UPDATE SET content_hash = excluded.content_hash,
+                    document = excluded.document
+            """, ((scope, chunk_id, chunk_hash, document) for chunk_id, chunk_hash, document in chunks))
+
+    def document_chunks(self, scope: str, document: str) -> set:
+        """Ids of the chunks loaded for a document."""
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM ingested_chunks WHERE scope = ? AND document = ?",
+                                      (scope, document))
+            return {chunk_id for chunk_id, in rows}
+
+    def forget_chunks(self, scope: str, chunk_ids: Sequence[str]):
+        """Drops chunks that were deleted from the vector db."""
+        with self._lock, self._conn:
+            for start in range(0, len(chunk_ids), _LOOKUP_BATCH):
+                batch = chunk_ids[start:start + _LOOKUP_BATCH]
+                self._conn.execute(f"DELETE FROM ingested_chunks WHERE scope = ? AND chunk_id IN "
+                                   f"({','.join('?' * len(batch))})", (scope, *batch))
+
+    def new_documents(self, scope: str, documents: List[Document]) -> List[Document]:
+        """The documents whose text is not already loaded under their id (or their text's hash)."""
+        keyed = [(document.id or content_hash(document.content), content_hash(document.content))
+                 for document in documents]
+        loaded = self.unchanged(scope, keyed)
+        return [document for document, (chunk_id, _) in zip(documents, keyed) if chunk_id not in loaded]
+
+    def record_documents(self, scope: str, documents: List[Document]):
+        self.record_chunks(scope, ((document.id or content_hash(document.content), content_hash(document.content),
+                                    document.name) for document in documents))
+
+    def crawled_page(self, scope: str, url: str) -> Optional[CrawledPage]:
+        """Validators, text hash and links of a page as last loaded, if it was."""
+        with self._lock:
+            row = self._conn.execute("SELECT etag, last_modified, content_hash, links FROM crawled_pages "
+                                     "WHERE scope = ? AND url = ?", (scope, url)).fetchone()
+        return (row[0], row[1], row[2], json.loads(row[3])) if row else None
+
+    def record_crawled_page(self, scope: str, url: str, etag: Optional[str], last_modified: Optional[str],
+                            page_hash: Optional[str], links: Sequence[str]):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO crawled_pages (scope, url, etag, last_modified, content_hash, links)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (scope, url) DO UPDATE SET etag = excluded.etag,
+                    last_modified = excluded.last_modified, content_hash = excluded.content_hash,
+                    links = excluded.links, crawled_at = CURRENT_TIMESTAMP
+            """, (scope, url, etag, last_modified, page_hash, json.dumps(list(links))))
+
+    def clear(self, scope: str):
+        """Forgets everything loaded in `scope`, e.g. after the knowledge base was cleared."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM ingested_chunks WHERE scope = ?", (scope,))
+            self._conn.execute("DELETE FROM ingested_documents WHERE scope = ?", (scope,))
+            self._conn.execute("DELETE FROM crawled_pages WHERE scope = ?", (scope,))
+        logger.info(f"Cleared ingestion ledger for {scope}")
@@ -0,0 +1,462 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from hashlib import md5
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from phi.document import Document
+from phi.embedder import Embedder
+from phi.utils.log import logger
+from phi.vectordb.base import VectorDb
+from phi.vectordb.distance import Distance
+
+from ingestion import embed_batch
+
+VECTOR_STORE_DIR = "vector_store"
+INITIAL_CAPACITY = 1024  # Rows the vector file is first sized for; it doubles as it fills
+TRAIN_THRESHOLD = 20_000  # Rows before the IVF index is trained; below it every search is exact
+EXACT_SEARCH_ROWS = 20_000  # Filtered searches matching at most this many rows are exact
+NPROBE = 16  # Inverted lists scanned per search
+KMEANS_ITERATIONS = 10
+SAMPLE_PER_LIST = 64  # Training vectors per inverted list
+SCAN_BLOCK = 65_536  # Rows per block when scanning or assigning the whole file
+_ID_BATCH = 500  # Ids per IN (...) query, under SQLite's parameter limit
+
+
+class LocalVectorDb(VectorDb):
+    """Embedded vector store: no database server, one directory per collection.
+
+    Vectors live in a float32 file read and written through a memory map (row i is document i)
+    and documents in a SQLite file beside it, with an index of their scalar meta_data values for
+    filtering. Once the
+    collection holds `train_threshold` rows an IVF index is trained with k-means: each row is
+    assigned to its nearest of ~sqrt(n) centroids, and a search scans only the `nprobe` lists
+    nearest the query. Upserts are assigned to a list as they arrive, deleted rows are reused, and
+    the index is retrained when the collection has grown fourfold (or on optimize()).
+    """
+
+    def __init__(self, collection: str, embedder: Optional[Embedder] = None, directory: str = VECTOR_STORE_DIR,
+                 distance: Distance = Distance.cosine, nprobe: int = NPROBE,
+                 train_threshold: int = TRAIN_THRESHOLD):
+        if embedder is None:
+            from phi.embedder.openai import OpenAIEmbedder
+
+            embedder = OpenAIEmbedder()
+        self.collection = collection
+        self.embedder: Embedder = embedder
+        self.distance = distance
+        self.nprobe = nprobe
+        self.train_threshold = train_threshold
+        self.path = os.path.join(directory, collection)
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._reset()
+
+    def _reset(self):
+        self.dimensions: Optional[int] = None
+        self._capacity = 0
+        self._count = 0  # Rows in use or free below this
+        self._vectors: Optional[np.memmap] = None
+        self._assignments: Optional[np.memmap] = None  # Inverted list of each row, -1 before training
+        self._alive = np.zeros(0, dtype=bool)
+        self._free: List[int] = []  # Rows of deleted documents, reused first
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: Dict[int, np.ndarray] = {}  # List -> rows, as of the last training or load
+        self._appended: Dict[int, List[int]] = {}  # List -> rows assigned since
+        self._trained_rows = 0
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def create(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            conn = sqlite3.connect(self._file("documents.db"), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS documents (
+                        row INTEGER PRIMARY KEY,
+                        id TEXT NOT NULL UNIQUE,
+                        name TEXT,
+                        meta_data TEXT NOT NULL DEFAULT '{}',
+                        content TEXT NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        usage TEXT
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_documents_name ON documents (name)")
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_documents_content_hash ON documents (content_hash)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS meta_values (
+                        key TEXT NOT NULL,
+                        value NOT NULL,
+                        row INTEGER NOT NULL,
+                        PRIMARY KEY (key, value, row)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_meta_values_row ON meta_values (row)")
+                conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._conn = conn
+            self._load()
+
+    def _load(self):
+        settings = dict(self._conn.execute("SELECT key, value FROM settings"))
+        if "dimensions" not in settings:
+            return
+        self.dimensions = int(settings["dimensions"])
+        self._trained_rows = int(settings.get("trained_rows", 0))
+        rows = np.fromiter((row for (row,) in self._conn.execute("SELECT row FROM documents")), dtype=np.int64)
+        self._count = int(rows.max()) + 1 if len(rows) else 0
+        self._grow(self._count)
+        self._alive[rows] = True
+        self._free = np.flatnonzero(~self._alive[:self._count]).tolist()
+        if os.path.exists(self._file("centroids.npy")):
+            self._centroids = np.load(self._file("centroids.npy"))
+            self._build_lists()
+        logger.debug(f"Opened {self.collection}: {len(rows)} documents")
+
+    def _map(self, name: str, dtype, width: int, capacity: int) -> np.memmap:
+        path = self._file(name)
+        size = capacity * width * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() != size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=(capacity, width) if width > 1 else (capacity,))
+
+    def _grow(self, rows: int):
+        capacity = max(self._capacity, INITIAL_CAPACITY)
+        while capacity < rows:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        for memmap in (self._vectors, self._assignments):
+            if memmap is not None:
+                memmap.flush()
+        self._vectors = self._map("vectors.f32", np.float32, self.dimensions, capacity)
+        self._assignments = self._map("lists.i32", np.int32, 1, capacity)
+        # Rows past those in the file (or past the old capacity) are unassigned
+        self._assignments[self._count if self._capacity == 0 else self._capacity:] = -1
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+        self._capacity = capacity
+
+    def doc_exists(self, document: Document) -> bool:
+        self.create()
+        cleaned_content = document.content.replace("\x00", "\ufffd")
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE content_hash = ? LIMIT 1",
+                                      (md5(cleaned_content.encode()).hexdigest(),)).fetchone() is not None
+
+    def name_exists(self, name: str) -> bool:
+        self.create()
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE name = ? LIMIT 1", (name,)).fetchone() is not None
+
+    def id_exists(self, id: str) -> bool:
+        self.create()
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents WHERE id = ?", (id,)).fetchone() is not None
+
+    def _existing_rows(self, ids: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for start in range(0, len(ids), _ID_BATCH):
+            batch = ids[start:start + _ID_BATCH]
+            found.update(self._conn.execute(f"SELECT id, row FROM documents WHERE id IN ({','.join('?' * len(batch))})",
+                                            batch))
+        return found
+
+    def insert(self, documents: List[Document]) -> None:
+        self.create()
+        with self._lock:
+            existing = self._existing_rows([document.id for document in documents if document.id])
+        self.upsert([document for document in documents if not document.id or document.id not in existing])
+
+    def upsert_available(self) -> bool:
+        return True
+
+    def upsert(self, documents: List[Document]) -> None:
+        """Adds documents, replacing any with the same id; embeds those without an embedding in batches."""
+        if not documents:
+            return
+        self.create()
+        pending = [document for document in documents if document.embedding is None]
+        if pending:
+            vectors = embed_batch(self.embedder, [document.content for document in pending])
+            for document, vector in zip(pending, vectors):
+                document.embedding = vector
+        matrix = np.asarray([document.embedding for document in documents], dtype=np.float32)
+        if self.distance == Distance.cosine:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1, norms)
+
+        rows_by_id: Dict[str, Any] = {}  # The last of several documents with one id wins
+        for position, document in enumerate(documents):
+            cleaned_content = document.content.replace("\x00", "\ufffd")
+            content_hash = md5(cleaned_content.encode()).hexdigest()
+            rows_by_id[document.id or content_hash] = (position, document, cleaned_content, content_hash)
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = matrix.shape[1]
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO settings VALUES ('dimensions', ?)",
+                                       (str(self.dimensions),))
+            elif matrix.shape[1] != self.dimensions:
+                raise ValueError(f"{self.collection} holds {self.dimensions}-dimensional vectors, "
+                                 f"got {matrix.shape[1]}")
+            existing = self._existing_rows(list(rows_by_id))
+            rows = []
+            for id in rows_by_id:
+                if id in existing:
+                    rows.append(existing[id])
+                elif self._free:
+                    rows.append(self._free.pop())
+                else:
+                    rows.append(self._count)
+                    self._count += 1
+            self._grow(self._count)
+            positions = [position for position, _, _, _ in rows_by_id.values()]
+            rows_array = np.asarray(rows, dtype=np.int64)
+            self._vectors[rows_array] = matrix[positions]
+            if self._centroids is not None:
+                lists = self._nearest_lists(matrix[positions])
+                self._assignments[rows_array] = lists
+                for row, list_id in zip(rows, lists.tolist()):
+                    self._appended.setdefault(list_id, []).append(row)
+            self._alive[rows_array] = True
+            self._vectors.flush()
+            self._assignments.flush()
+            with self._conn:
+                self._delete_meta_values([row for id, row in zip(rows_by_id, rows) if id in existing])
+                self._conn.executemany("INSERT INTO meta_values (key, value, row) VALUES (?, ?, ?)",
+                                       ((key, value, row) for row, (_, document, _, _) in zip(rows, rows_by_id.values())
+                                        for key, value in (document.meta_data or {}).items()
+                                        if isinstance(value, (str, int, float))))
+                self._conn.executemany("""
+                    INSERT INTO documents (row, id, name, meta_data, content, content_hash, usage)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET name = excluded.name, meta_data = excluded.meta_data,
+                        content = excluded.content, content_hash = excluded.content_hash, usage = excluded.usage
+                """, ((row, id, document.name, json.dumps(document.meta_data), content, content_hash,
+                       json.dumps(document.usage) if document.usage is not None else None)
+                      for row, (id, (_, document, content, content_hash)) in zip(rows, rows_by_id.items())))
+            alive = int(self._alive.sum())
+            if (self._centroids is None and alive >= self.train_threshold) or \
+                    (self._centroids is not None and alive > 4 * self._trained_rows):
+                self._train()
+
+    def delete_documents(self, ids: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Deletes the documents with these ids, or matching `filters`; returns how many."""
+        if ids is None and not filters:
+            raise ValueError("Pass the ids or filters of the documents to delete; clear() deletes all")
+        self.create()
+        with self._lock:
+            if ids is not None:
+                rows = list(self._existing_rows(list(ids)).values())
+            else:
+                rows = self._filter_rows(filters).tolist()
+            with self._conn:
+                self._delete_meta_values(rows)
+                for start in range(0, len(rows), _ID_BATCH):
+                    batch = rows[start:start + _ID_BATCH]
+                    self._conn.execute(f"DELETE FROM documents WHERE row IN ({','.join('?' * len(batch))})", batch)
+            if rows:
+                self._alive[rows] = False
+                self._free.extend(rows)
+            return len(rows)
+
+    def _delete_meta_values(self, rows: List[int]):
+        for start in range(0, len(rows), _ID_BATCH):
+            batch = rows[start:start + _ID_BATCH]
+            self._conn.execute(f"DELETE FROM meta_values WHERE row IN ({','.join('?' * len(batch))})", batch)
+
+    def _filter_rows(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Rows whose id, name or meta_data values equal those in `filters` (any of, for a list).
+
+        meta_data keys are looked up in the meta_values index, so only scalar values can be filtered on.
+        """
+        queries, params = [], []
+        for key, value in filters.items():
+            values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            placeholders = ",".join("?" * len(values))
+            if key in ("id", "name"):
+                queries.append(f"SELECT row FROM documents WHERE {key} IN ({placeholders})")
+            else:
+                queries.append(f"SELECT row FROM meta_values WHERE key = ? AND value IN ({placeholders})")
+                params.append(key)
+            params.extend(values)
+        return np.fromiter((row for (row,) in self._conn.execute(" INTERSECT ".join(queries), params)),
+                           dtype=np.int64)
+
+    def _scores(self, vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Higher is nearer
+        if self.distance == Distance.l2:
+            return 2 * (vectors @ query) - np.einsum("ij,ij->i", vectors, vectors)
+        return vectors @ query
+
+    def _nearest_lists(self, vectors: np.ndarray) -> np.ndarray:
+        # Nearest centroid by L2 (for unit vectors the same as by cosine)
+        scores = 2 * (vectors @ self._centroids.T) - (self._centroids ** 2).sum(axis=1)
+        return np.argmax(scores, axis=1).astype(np.int32)
+
+    def _top(self, query: np.ndarray, rows: Optional[np.ndarray], limit: int) -> List[int]:
+        """The `limit` nearest of `rows` (of all live rows if None), nearest first."""
+        best_rows, best_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        total = self._count if rows is None else len(rows)
+        for start in range(0, total, SCAN_BLOCK):
+            if rows is None:
+                block = np.arange(start, min(start + SCAN_BLOCK, total))
+                block = block[self._alive[block]]
+            else:
+                block = rows[start:start + SCAN_BLOCK]
+            if not len(block):
+                continue
+            scores = self._scores(self._vectors[block], query)
+            if len(block) > limit:
+                keep = np.argpartition(-scores, limit)[:limit]
+                block, scores = block[keep], scores[keep]
+            best_rows, best_scores = np.concatenate([best_rows, block]), np.concatenate([best_scores, scores])
+        order = np.argsort(-best_scores, kind="stable")[:limit]
+        return best_rows[order].tolist()
+
+    def _probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Live rows in the `nprobe` inverted lists nearest the query."""
+        centroid_scores = 2 * (self._centroids @ query) - (self._centroids ** 2).sum(axis=1)
+        nearest = np.argsort(-centroid_scores)[:nprobe]
+        parts = []
+        for list_id in nearest.tolist():
+            rows = self._lists.get(list_id, np.zeros(0, dtype=np.int64))
+            if self._appended.get(list_id):
+                rows = np.concatenate([rows, np.asarray(self._appended[list_id], dtype=np.int64)])
+            # Skip deleted rows, and rows reassigned to another list by an upsert
+            parts.append(rows[self._alive[rows] & (self._assignments[rows] == list_id)])
+        return np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        query_embedding = self.embedder.get_embedding(query)
+        if query_embedding is None:
+            logger.error(f"Error getting embedding for Query: {query}")
+            return []
+        return self.search_vector(query_embedding, limit, filters)
+
+    def search_vector(self, query_embedding: List[float], limit: int = 5,
+                      filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        """The `limit` documents nearest `query_embedding`, optionally only those matching `filters`."""
+        self.create()
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if self.distance == Distance.cosine:
+            query /= np.linalg.norm(query) or 1
+        with self._lock:
+            if self.dimensions is None or self._count == 0:
+                return []
+            allowed = self._filter_rows(filters) if filters else None
+            if allowed is not None and (self._centroids is None or len(allowed) <= EXACT_SEARCH_ROWS):
+                rows = allowed
+            elif self._centroids is None:
+                rows = None
+            else:
+                nprobe = self.nprobe
+                while True:
+                    rows = self._probe(query, nprobe)
+                    if allowed is not None:
+                        rows = rows[np.isin(rows, allowed, assume_unique=True)]
+                    # Too few candidates (a selective filter, or a sparse corner): probe more lists
+                    if len(rows) >= limit or nprobe >= len(self._centroids):
+                        break
+                    nprobe *= 4
+            top = self._top(query, rows, limit)
+            if not top:
+                return []
+            found = {row: (id, name, meta_data, content, usage) for row, id, name, meta_data, content, usage in
+                     self._conn.execute(f"SELECT row, id, name, meta_data, content, usage FROM documents "
+                                        f"WHERE row IN ({','.join('?' * len(top))})", top)}
+            return [Document(id=found[row][0], name=found[row][1], meta_data=json.loads(found[row][2]),
+                             content=found[row][3], embedder=self.embedder, embedding=self._vectors[row].tolist(),
+                             usage=json.loads(found[row][4]) if found[row][4] else None)
+                    for row in top if row in found]
+
+    def _train(self):
+        rows = np.flatnonzero(self._alive[:self._count])
+        nlist = int(np.clip(np.sqrt(len(rows)), 16, 4096))
+        if len(rows) < nlist * 4:
+            return
+        logger.info(f"Training IVF index for {self.collection}: {len(rows)} rows, {nlist} lists")
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, size=min(len(rows), nlist * SAMPLE_PER_LIST), replace=False))
+        data = np.asarray(self._vectors[sample])
+        self._centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = self._nearest_lists(data)
+            order = np.argsort(labels, kind="stable")
+            sorted_labels = labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+            present = sorted_labels[starts]
+            counts = np.diff(np.r_[starts, len(order)])
+            # Empty lists keep their centroid
+            self._centroids[present] = np.add.reduceat(data[order], starts, axis=0) / counts[:, None]
+            if self.distance == Distance.cosine:
+                self._centroids /= np.maximum(np.linalg.norm(self._centroids, axis=1, keepdims=True), 1e-12)
+        for start in range(0, self._count, SCAN_BLOCK):
+            end = min(start + SCAN_BLOCK, self._count)
+            self._assignments[start:end] = self._nearest_lists(np.asarray(self._vectors[start:end]))
+        self._assignments.flush()
+        self._build_lists()
+        np.save(self._file("centroids.tmp.npy"), self._centroids)
+        os.replace(self._file("centroids.tmp.npy"), self._file("centroids.npy"))
+        self._trained_rows = len(rows)
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO settings VALUES ('trained_rows', ?)", (str(len(rows)),))
+
+    def _build_lists(self):
+        rows = np.flatnonzero(self._alive[:self._count])
+        lists = np.asarray(self._assignments[rows])
+        order = np.argsort(lists, kind="stable")
+        rows, lists = rows[order], lists[order]
+        starts = np.flatnonzero(np.r_[True, lists[1:] != lists[:-1]]) if len(lists) else np.zeros(0, dtype=np.int64)
+        self._lists = {int(lists[start]): part for start, part in zip(starts, np.split(rows, starts[1:]))}
+        self._appended = {}
+
+    def delete(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._reset()
+            if os.path.exists(self.path):
+                logger.debug(f"Deleting collection: {self.collection}")
+                shutil.rmtree(self.path)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._file("documents.db"))
+
+    def get_count(self) -> int:
+        self.create()
+        with self._lock:
+            return int(self._alive.sum())
+
+    def optimize(self) -> None:
+        """Trains (or retrains) the IVF index on the current rows."""
+        self.create()
+        with self._lock:
+            if self.dimensions is not None:
+                self._train()
+
+    def clear(self) -> bool:
+        """Deletes every document by removing the collection's files, so it takes the same time at any size."""
+        with self._lock:
+            dimensions = self.dimensions if self._conn is not None else None
+            self.delete()
+            self.create()
+            if dimensions is not None:
+                # Same embedder, same vectors
+                with self._conn:
+                    self._conn.execute("INSERT INTO settings VALUES ('dimensions', ?)", (str(dimensions),))
+                self.dimensions = dimensions
+        return True
@@ -0,0 +1,54 @@
+import os
+import sys
+from typing import Dict, List
+
+import pytest
+from phi.document import Document
+
+# The RAG modules import each other as top-level modules, as when app.py runs from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import FakeEmbedder  # noqa: E402
+from ingestion_ledger import IngestionLedger  # noqa: E402
+
+
+class MemoryVectorDb:
+    """Just enough of a vector db for the pipelines: documents by id, upserted as PgVector2 does."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.rows: Dict[str, Document] = {}
+        self.upserted: List[str] = []  # Ids in the order they were loaded, repeats included
+
+    def create(self):
+        pass
+
+    def upsert(self, documents: List[Document]):
+        for document in documents:
+            document.embed(embedder=self.embedder)
+            self.rows[document.id] = document
+            self.upserted.append(document.id)
+
+    def delete_documents(self, ids: List[str]) -> int:
+        return sum(self.rows.pop(id, None) is not None for id in ids)
+
+
+class MemoryKnowledgeBase:
+    def __init__(self, embedder):
+        self.vector_db = MemoryVectorDb(embedder)
+
+    def load_documents(self, documents: List[Document], upsert: bool = False):
+        self.vector_db.create()
+        self.vector_db.upsert(documents)
+
+
+@pytest.fixture
+def knowledge_base():
+    return MemoryKnowledgeBase(FakeEmbedder())
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = IngestionLedger(str(tmp_path / "ledger.db"))
+    yield ledger
+    ledger.close()
@@ -0,0 +1,153 @@
+import hashlib
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import pytest
+
+from crawler import WebsiteCrawler, _Crawl, primary_domain
+
+BASE = "http://example.com"
+
+
+class Site:
+    """Serves pages to an httpx.MockTransport and logs the requests it gets."""
+
+    def __init__(self, pages: Dict[str, str], robots: str = "", files: Optional[Dict[str, Tuple[str, str]]] = None,
+                 etags: bool = True):
+        self.pages = pages  # Path -> body text and links, as HTML
+        self.robots = robots
+        self.files = files or {}  # Path -> (content type, body), e.g. sitemaps
+        self.etags = etags
+        self.requests: List[Tuple[str, float, httpx.Headers]] = []
+
+    @property
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def paths(self) -> List[str]:
+        return [path for path, _, _ in self.requests if path != "/robots.txt"]
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.requests.append((path, time.monotonic(), request.headers))
+        if path == "/robots.txt":
+            return httpx.Response(200, text=self.robots) if self.robots else httpx.Response(404)
+        if path in self.files:
+            content_type, body = self.files[path]
+            return httpx.Response(200, headers={"content-type": content_type}, text=body)
+        if path not in self.pages:
+            return httpx.Response(404, headers={"content-type": "text/html"}, text="Not found")
+        body = f"<html><body><main>{self.pages[path]}</main></body></html>"
+        headers = {"content-type": "text/html"}
+        if self.etags:
+            headers["etag"] = f'"{hashlib.sha256(body.encode()).hexdigest()[:16]}"'
+            if request.headers.get("if-none-match") == headers["etag"]:
+                return httpx.Response(304, headers=headers)
+        return httpx.Response(200, headers=headers, text=body)
+
+
+def page(text: str, *links: str) -> str:
+    return f"<p>{text} " * 5 + "".join(f'<a href="{link}">{link}</a> ' for link in links)
+
+
+def crawl(site: Site, knowledge_base, **kwargs):
+    kwargs.setdefault("use_sitemaps", False)
+    return WebsiteCrawler(knowledge_base, transport=site.transport, **kwargs).crawl(BASE + "/")
+
+
+def test_robots_disallow_is_honoured(knowledge_base):
+    site = Site({"/": page("Home", "/menu", "/private/staff"), "/menu": page("Menu"),
+                 "/private/staff": page("Staff")}, robots="User-agent: *\nDisallow: /private/\n")
+    status = crawl(site, knowledge_base)
+
+    assert sorted(site.paths()) == ["/", "/menu"]
+    assert status.pages_disallowed == 1
+    assert status.pages_fetched == 2
+    assert sorted({document.meta_data["url"] for document in knowledge_base.vector_db.rows.values()}) == \
+        [BASE + "/", BASE + "/menu"]
+
+
+def test_crawl_delay_spaces_requests_to_a_host(knowledge_base):
+    site = Site({"/": page("Home", "/a", "/b"), "/a": page("A"), "/b": page("B")},
+                robots="User-agent: *\nCrawl-delay: 1\n")
+    crawl(site, knowledge_base)
+
+    times = sorted(at for path, at, _ in site.requests if path != "/robots.txt")
+    assert len(times) == 3
+    assert all(later - earlier >= 0.95 for earlier, later in zip(times, times[1:]))
+
+
+def test_recrawl_sends_validators_and_skips_pages_not_modified(knowledge_base, ledger):
+    site = Site({"/": page("Home", "/a"), "/a": page("A", "/b"), "/b": page("B")})
+    first = crawl(site, knowledge_base, max_depth=3, ledger=ledger)
+    loaded = len(knowledge_base.vector_db.upserted)
+    assert first.pages_fetched == 3 and loaded == 3
+
+    site.requests.clear()
+    second = crawl(site, knowledge_base, max_depth=3, ledger=ledger)
+
+    # Every page answered 304, and /b was still reached through the links recorded for /a
+    assert sorted(site.paths()) == ["/", "/a", "/b"]
+    assert all(headers.get("if-none-match") for path, _, headers in site.requests if path != "/robots.txt")
+    assert second.pages_unchanged == 3 and second.pages_fetched == 0
+    assert len(knowledge_base.vector_db.upserted) == loaded
+
+
+def test_recrawl_without_validators_skips_pages_with_the_same_text(knowledge_base, ledger):
+    site = Site({"/": page("Home", "/a"), "/a": page("A")}, etags=False)
+    crawl(site, knowledge_base, ledger=ledger)
+    loaded = len(knowledge_base.vector_db.upserted)
+
+    site.pages["/a"] = page("A, now with a new dessert")
+    second = crawl(site, knowledge_base, ledger=ledger)
+
+    assert second.pages_unchanged == 1 and second.pages_fetched == 1
+    assert [knowledge_base.vector_db.rows[id].meta_data["url"] for id in knowledge_base.vector_db.upserted[loaded:]] \
+        == [BASE + "/a"]
+
+
+def test_max_depth_and_max_pages(knowledge_base):
+    # A chain / -> /1 -> /2 -> /3, plus a wide page of links
+    site = Site({"/": page("Home", "/1", "/wide"), "/1": page("One", "/2"), "/2": page("Two", "/3"),
+                 "/3": page("Three"), "/wide": page("Wide", *[f"/w{i}" for i in range(10)]),
+                 **{f"/w{i}": page(f"W{i}") for i in range(10)}})
+    crawl(site, knowledge_base, max_depth=2, max_pages=100)
+    assert "/2" not in site.paths() and "/1" in site.paths()
+
+    site.requests.clear()
+    status = crawl(site, knowledge_base, max_depth=5, max_pages=4)
+    assert len(site.paths()) == 4
+    assert status.pages_queued == 4
+
+
+def test_sitemap_index_lists_further_sitemaps(knowledge_base):
+    index = (f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+             f'<sitemap><loc>{BASE}/sitemap-pages.xml</loc></sitemap></sitemapindex>')
+    pages = (f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+             f'<url><loc>{BASE}/hidden</loc></url><url><loc>https://other.org/page</loc></url></urlset>')
+    site = Site({"/": page("Home"), "/hidden": page("Hidden")},
+                robots=f"User-agent: *\nSitemap: {BASE}/sitemap-index.xml\n",
+                files={"/sitemap-index.xml": ("application/xml", index),
+                       "/sitemap-pages.xml": ("application/xml", pages)})
+    status = crawl(site, knowledge_base, use_sitemaps=True)
+
+    assert "/hidden" in site.paths()
+    assert status.pages_fetched == 2  # The other site's page is out of scope
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("http://example.com/menu", True),
+    ("https://www.example.com/menu", True),
+    ("http://evilexample.com/menu", False),
+    ("http://example.com.evil.org/menu", False),
+    ("ftp://example.com/menu", False),
+    ("http://example.com/menu.pdf", False),
+])
+def test_in_scope_matches_the_domain_and_its_subdomains_only(knowledge_base, url, expected):
+    assert _Crawl(WebsiteCrawler(knowledge_base), None, BASE + "/").in_scope(url) == expected
+
+
+def test_primary_domain():
+    assert primary_domain("https://www.example.com/menu") == "example.com"
+    assert primary_domain("http://127.0.0.1:8000/") == "127.0.0.1"
@@ -0,0 +1,116 @@
+import glob
+import os
+
+import pytest
+from phi.document.reader.pdf import PDFReader
+from pypdf import PdfReader, PdfWriter
+
+from ingestion import IngestionPipeline
+from ingestion_ledger import content_hash, ledger_scope
+
+TEST_PDFS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          "Restaurant_Chatbot", "Test", "*.pdf")))
+
+
+@pytest.fixture(scope="module")
+def source_pages():
+    return [page for path in TEST_PDFS for page in PdfReader(path).pages]
+
+
+def write_pdf(path, pages):
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(page)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def content_hash_of(path):
+    with open(path, "rb") as f:
+        return IngestionPipeline._hash_file(f)
+
+
+def loaded(knowledge_base):
+    return {id: (document.name, document.meta_data, document.content, tuple(document.embedding))
+            for id, document in knowledge_base.vector_db.rows.items()}
+
+
+def test_documents_match_pdf_reader(knowledge_base):
+    status = IngestionPipeline(knowledge_base, workers=1).read(TEST_PDFS[0])
+
+    expected = PDFReader(chunk=True).read(TEST_PDFS[0])
+    assert [(document.id, document.meta_data, document.content) for document in expected] == \
+        [(document.id, document.meta_data, document.content) for document in knowledge_base.vector_db.rows.values()]
+    assert status.chunks_embedded == status.documents_loaded == len(expected)
+    assert status.pages_embedded == status.pages_total
+
+
+def test_process_pool_gives_the_same_documents_as_the_serial_path(tmp_path, source_pages, knowledge_base):
+    path = write_pdf(tmp_path / "menu.pdf", source_pages * 2)
+    IngestionPipeline(knowledge_base, workers=1).read(path)
+    parallel = type(knowledge_base)(knowledge_base.vector_db.embedder)  # A second MemoryKnowledgeBase
+    status = IngestionPipeline(parallel, workers=2, pages_per_task=2, embed_batch_size=3,
+                               upsert_batch_size=4).read(path)
+
+    assert status.pages_embedded == len(source_pages) * 2
+    assert loaded(parallel) == loaded(knowledge_base)
+
+
+def test_rerun_of_the_same_file_is_skipped(tmp_path, source_pages, knowledge_base, ledger):
+    path = write_pdf(tmp_path / "menu.pdf", source_pages)
+    IngestionPipeline(knowledge_base, workers=1, ledger=ledger).read(path)
+    upserted = len(knowledge_base.vector_db.upserted)
+
+    # Same bytes under another name: skipped without parsing
+    status = IngestionPipeline(knowledge_base, workers=1, ledger=ledger).read(path, doc_name="copy")
+    assert status.unchanged
+    assert len(knowledge_base.vector_db.upserted) == upserted
+    assert ledger.find_document(ledger_scope(knowledge_base), content_hash_of(path)) == "menu"
+
+
+def test_edited_file_embeds_only_changed_pages(tmp_path, source_pages, knowledge_base, ledger):
+    path = write_pdf(tmp_path / "menu.pdf", source_pages)
+    first = IngestionPipeline(knowledge_base, workers=1, ledger=ledger).read(path)
+    before = loaded(knowledge_base)
+
+    # The last page replaced by a copy of the first: only its chunks change
+    write_pdf(path, source_pages[:-1] + source_pages[:1])
+    status = IngestionPipeline(knowledge_base, workers=1, ledger=ledger).read(path)
+
+    last_page = len(source_pages)
+    changed = [id for id, (_, meta_data, _, _) in loaded(knowledge_base).items() if meta_data["page"] == last_page]
+    assert not status.unchanged
+    assert status.chunks_embedded == len(changed) and status.chunks_skipped == first.chunks_embedded - len(changed)
+    assert knowledge_base.vector_db.upserted[-len(changed):] == changed
+    after = loaded(knowledge_base)
+    assert all(after[id] == before[id] for id in before if id not in changed)
+    assert all(after[id][2] != before[id][2] for id in changed)
+
+
+def test_chunks_an_edit_removed_are_deleted(tmp_path, source_pages, knowledge_base, ledger):
+    path = write_pdf(tmp_path / "menu.pdf", source_pages)
+    IngestionPipeline(knowledge_base, workers=1, ledger=ledger).read(path)
+
+    write_pdf(path, source_pages[:2])
+    status = IngestionPipeline(knowledge_base, workers=1, ledger=ledger).read(path)
+
+    pages = {meta_data["page"] for _, meta_data, _, _ in loaded(knowledge_base).values()}
+    assert pages == {1, 2}
+    assert status.chunks_removed > 0
+    assert ledger.document_chunks(ledger_scope(knowledge_base), "menu") == set(knowledge_base.vector_db.rows)
+
+
+def test_ledger_tracks_chunks_by_id_and_hash(ledger):
+    ledger.record_chunks("scope", [("a", content_hash("apple"), "doc"), ("b", content_hash("pear"), "doc")])
+
+    assert ledger.unchanged("scope", [("a", content_hash("apple")), ("b", content_hash("plum")),
+                                      ("c", content_hash("fig"))]) == {"a"}
+    assert ledger.unchanged("other", [("a", content_hash("apple"))]) == set()
+    assert ledger.document_chunks("scope", "doc") == {"a", "b"}
+
+    ledger.record_document("scope", "doc", "filehash", 2)
+    assert ledger.find_document("scope", "filehash") == "doc"
+    ledger.clear("scope")
+    assert ledger.find_document("scope", "filehash") is None
+    assert ledger.unchanged("scope", [("a", content_hash("apple"))]) == set()